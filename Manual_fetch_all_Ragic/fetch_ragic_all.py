@@ -36,6 +36,7 @@ except Exception:
     HAS_CONFIG_LOADER = False
 
 from ragic_client import RagicClient
+from rate_limiter import create_rate_limiter
 
 
 def setup_logging(level: str = "INFO") -> None:
@@ -81,7 +82,6 @@ def fetch_full_paged(
     sheet_id: str,
     out_root: Path,
     limit: int,
-    page_sleep: float,
 ) -> Dict[str, Any]:
     """全量抓取（不使用 where），逐頁寫入 <sheet_code>/page-*.json，並合併輸出。
 
@@ -91,28 +91,15 @@ def fetch_full_paged(
     per_sheet_dir = out_root / sheet_code
     ensure_dir(per_sheet_dir)
 
-    url = f"{client.base_url}/{sheet_id}"
-
     # 續傳：從現有頁數繼續
     existing_pages = list_existing_pages(per_sheet_dir)
     page_index = len(existing_pages)  # 0-based 計數，但檔名從 1 開始
     offset = page_index * limit
+    logging.info(f"[{sheet_code}] 自 offset={offset} 開始全量抓取，limit={limit}")
 
     total_records = 0
-    while True:
-        params = {"api": "", "v": 3, "limit": limit, "offset": offset}
-        logging.info(f"[{sheet_code}] 取得頁面 offset={offset}, limit={limit}")
-
-        # 使用既有 session 與 timeout
-        r = client.session.get(url, params=params, timeout=client.timeout)
-        r.raise_for_status()
-        result = r.json()
-        data = list(result.values()) if isinstance(result, dict) else []
-
-        if not data:
-            logging.info(f"[{sheet_code}] 無更多資料，結束全量抓取")
-            break
-
+    # 逐頁串流落地：每頁抓到即寫檔，不在記憶體累積整表（請求節奏由 client 的速率限制器控制）
+    for data in client.iter_pages(sheet_id, limit=limit, offset=offset):
         page_index += 1
         page_path = per_sheet_dir / f"page-{page_index:05d}.json"
         write_json(page_path, data)
@@ -120,13 +107,7 @@ def fetch_full_paged(
         logging.info(
             f"[{sheet_code}] 寫入 {page_path.name} 筆數={len(data)}，累計={total_records}"
         )
-
-        if len(data) < limit:
-            logging.info(f"[{sheet_code}] 最後一頁（小於 limit），結束全量抓取")
-            break
-
-        offset += limit
-        time.sleep(page_sleep)
+    logging.info(f"[{sheet_code}] 無更多資料，結束全量抓取")
 
     # 合併頁檔 → 單一陣列 JSON
     combined_file = out_root / f"{sheet_code}_{sheet_name}.json"
@@ -161,6 +142,10 @@ def fetch_incremental_since(
     limit: int,
     max_pages: int,
     until_date: Optional[str] = None,
+    prefetch_pages: int = 1,
+    pagination: str = "offset",
+    strategy: str = "ragic_id_asc",
+    locate_field: Optional[str] = None,
 ) -> Dict[str, Any]:
     """增量抓取（本地過濾 + 翻頁規則），直接輸出合併檔。"""
     t0 = time.time()
@@ -183,6 +168,10 @@ def fetch_incremental_since(
         until_dt=until_dt,
         limit=limit,
         max_pages=max_pages,
+        prefetch_pages=prefetch_pages,
+        pagination=pagination,
+        strategy=strategy,
+        locate_field=locate_field,
     )
 
     combined_file = out_root / f"{sheet_code}_{sheet_name}.json"
@@ -347,7 +336,13 @@ def main() -> None:
     parser.add_argument("--limit", type=int, default=1000, help="每頁筆數（小表）")
     parser.add_argument("--large-limit", type=int, default=10000, help="每頁筆數（大表）")
     parser.add_argument("--max-pages", type=int, default=50, help="增量模式：最多頁數")
-    parser.add_argument("--page-sleep", type=float, default=0.8, help="全量模式：每頁間隔秒數")
+    parser.add_argument("--prefetch-pages", type=int, default=1, help="增量模式：同時預抓的分頁數")
+    parser.add_argument("--pagination", choices=["offset", "keyset"], default="offset", help="增量模式分頁方式（keyset：以最後 _ragicId 續抓）")
+    parser.add_argument("--strategy", choices=["ragic_id_asc", "modified_desc"], default="ragic_id_asc", help="增量模式掃描策略（modified_desc：依最後修改欄位遞減，早於 since 即停止）")
+    parser.add_argument("--locate-field", default=None, help="增量模式：以此建立時間欄位二分搜尋起始 offset（例如 建檔日期）")
+    parser.add_argument("--rps", type=float, default=2.0, help="Ragic 每秒請求數上限（token bucket）")
+    parser.add_argument("--burst", type=int, default=2, help="Ragic 突發請求數（token bucket 容量）")
+    parser.add_argument("--page-sleep", type=float, default=None, help="（舊參數）每頁間隔秒數，若指定則換算為 --rps=1/page-sleep")
     parser.add_argument(
         "--large-sheets",
         type=str,
@@ -383,7 +378,9 @@ def main() -> None:
     account = configs[0]["ragic_account"]
 
     # 使用較寬鬆的 timeout/retry，以涵蓋大表
-    client = RagicClient(api_key=api_key, account=account, timeout=60, max_retries=5)
+    rps = (1.0 / args.page_sleep) if args.page_sleep else args.rps
+    rate_limiter = create_rate_limiter(rate_per_second=rps, burst=args.burst)
+    client = RagicClient(api_key=api_key, account=account, timeout=60, max_retries=5, pool_maxsize=args.prefetch_pages, rate_limiter=rate_limiter)
     if not client.test_connection():
         logging.warning("Ragic 連線測試失敗，仍嘗試抓取（可能為 401/403/404）")
 
@@ -423,7 +420,6 @@ def main() -> None:
                     sheet_id=sheet_id,
                     out_root=batch_dir,
                     limit=per_limit,
-                    page_sleep=args.page_sleep,
                 )
             else:
                 stats = fetch_incremental_since(
@@ -437,6 +433,10 @@ def main() -> None:
                     limit=per_limit,
                     max_pages=args.max_pages,
                     until_date=args.until_date,
+                    prefetch_pages=args.prefetch_pages,
+                    pagination=args.pagination,
+                    strategy=args.strategy,
+                    locate_field=args.locate_field,
                 )
 
             manifest["sheets"][sheet_code] = {
@@ -0,0 +1,295 @@
+# -*- coding: utf-8 -*-
+"""Ragic API 非同步資料獲取模組（asyncio + httpx，共用連線池）"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import List, Dict, Any, Optional, Tuple, Deque
+from datetime import datetime
+
+from ragic_client import RagicClient
+from ragic_paging import IncrementalPagePlanner, ModifiedDescPlanner, StartOffsetLocator, _IncrementalPageFilter
+from rate_limiter import TokenBucketRateLimiter, parse_retry_after
+from page_size_controller import AdaptivePageSizeController
+
+try:
+    import httpx
+    HAS_HTTPX = True
+except ImportError:
+    HAS_HTTPX = False
+
+
+class AsyncRagicClient:
+    """
+    Ragic API 非同步客戶端
+
+    介面與 RagicClient 相同（fetch_data / fetch_since_local_paged / test_connection），
+    但方法皆為 coroutine。所有請求共用同一個 httpx.AsyncClient 連線池，
+    並以 max_concurrency 作為全域同時請求上限（跨表單共用）。
+    """
+
+    # 沿用同步客戶端的日期解析，確保兩者過濾結果一致
+    _parse_dt = RagicClient._parse_dt
+
+    def __init__(self, api_key: str, account: str, timeout: int = 30, max_retries: int = 3, max_concurrency: int = 4, rate_limiter: Optional[TokenBucketRateLimiter] = None):
+        """
+        初始化 Ragic 非同步客戶端
+
+        Args:
+            api_key: Ragic API 金鑰（Base64 編碼）
+            account: Ragic 帳戶名稱
+            timeout: 請求逾時時間（秒）
+            max_retries: API 請求失敗時的最大重試次數
+            max_concurrency: 全域同時請求上限（亦為連線池大小）
+            rate_limiter: 共用的速率限制器（可與同步客戶端共用同一實例）
+        """
+        if not HAS_HTTPX:
+            raise ImportError("AsyncRagicClient 需要 httpx 套件（pip install httpx）")
+        if not api_key or not account:
+            raise ValueError("API Key 或 Account 不可為空")
+
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.base_url = f'https://ap6.ragic.com/{account}'
+
+        self.client = httpx.AsyncClient(
+            headers={'Authorization': f'Basic {api_key}'},
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=self.max_concurrency, max_keepalive_connections=self.max_concurrency),
+        )
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self.rate_limiter = rate_limiter or TokenBucketRateLimiter()
+
+    async def _get(self, url: str, params: Optional[Dict[str, Any]] = None) -> "httpx.Response":
+        """在全域同時請求上限與速率限制內發出 GET；429 / Retry-After 與逾時 / 連線錯誤的重試、round_trip_seconds 同 RagicClient._request"""
+        for attempt in range(self.max_retries + 1):
+            await self.rate_limiter.acquire_async()
+            try:
+                async with self._semaphore:
+                    t0 = time.monotonic()
+                    response = await self.client.get(url, params=params)
+                    response.round_trip_seconds = time.monotonic() - t0
+            except httpx.TransportError as e:
+                if attempt == self.max_retries:
+                    raise
+                logging.warning(f"Ragic 請求失敗（{url}）：{e}，{2 ** attempt} 秒後重試（第 {attempt + 1} 次）")
+                await asyncio.sleep(2 ** attempt)
+                continue
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            throttled = response.status_code == 429 or (response.status_code == 503 and retry_after is not None)
+            if not throttled or attempt == self.max_retries:
+                return response
+            delay = retry_after if retry_after is not None else float(2 ** attempt)
+            logging.warning(f"Ragic 回應 {response.status_code}（{url}），{delay:.1f} 秒後重試（第 {attempt + 1} 次）")
+            self.rate_limiter.penalize(delay)
+        return response
+
+    async def fetch_data(self, sheet_id: str, last_sync_time: Optional[str] = None, limit: int = 1000, max_pages: Optional[int] = None, where_field: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        從 Ragic API 取得資料（自動處理分頁和重試），語意同 RagicClient.fetch_data
+
+        Args:
+            sheet_id: 表單 ID（例如：'forms8/5'）
+            last_sync_time: 最後同步時間，Ragic 格式 (yyyy/MM/dd HH:mm:ss)
+            limit: 每頁資料筆數，預設 1000
+
+        Returns:
+            List[Dict]: 資料列表
+        """
+        all_data: List[Dict[str, Any]] = []
+        offset = 0
+        pages = 0
+        url = f'{self.base_url}/{sheet_id}'
+
+        while True:
+            if max_pages is not None and pages >= max_pages:
+                return all_data
+            params = {'api': '', 'v': 3, 'limit': limit, 'offset': offset}
+            if last_sync_time:
+                field = where_field or '_ragicModified'
+                params['where'] = f'{field},gt,{last_sync_time}'
+
+            # 重試由 _get 處理
+            try:
+                response = await self._get(url, params=params)
+                response.raise_for_status()
+                result = response.json()
+            except httpx.TransportError as e:
+                raise Exception(f"API 請求失敗（已重試 {self.max_retries} 次）: {e}")
+            except httpx.HTTPStatusError as e:
+                if e.response.status_code == 401:
+                    raise Exception("API 認證失敗")
+                elif e.response.status_code == 404:
+                    raise Exception(f"找不到表單: {sheet_id}")
+                raise Exception(f"HTTP 錯誤 ({e.response.status_code})")
+
+            data = list(result.values()) if isinstance(result, dict) and result else []
+            if not data:
+                return all_data
+
+            all_data.extend(data)
+            logging.info(f"[{sheet_id}] 取得 {len(data)} 筆，總計 {len(all_data)} 筆")
+
+            if len(data) < limit:
+                return all_data
+
+            pages += 1
+            offset += limit
+
+    async def _get_page_once(self, url: str, params: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], float, int]:
+        """抓取單頁原始資料（重試由 _get 處理），回傳 (資料, HTTP 往返秒數, 回應位元組數)，失敗則拋出例外。"""
+        r = await self._get(url, params=params)
+        r.raise_for_status()
+        result = r.json()
+        elapsed = r.round_trip_seconds
+        data = list(result.values()) if isinstance(result, dict) else []
+        return data, elapsed, len(r.content or b'')
+
+    async def locate_start_offset(self, sheet_id: str, since_dt: datetime, field_name: str, slack: int = 0, max_probes: int = 64) -> int:
+        """二分搜尋增量起始 offset，語意同 RagicClient.locate_start_offset"""
+        url = f'{self.base_url}/{sheet_id}'
+        locator = StartOffsetLocator(self._parse_dt, since_dt, field_name, max_probes=max_probes)
+        try:
+            offset = locator.next_offset()
+            while offset is not None:
+                data, _, _ = await self._get_page_once(url, locator.probe_params(offset))
+                locator.feed(offset, data)
+                offset = locator.next_offset()
+        except Exception as e:
+            logging.warning(f"[locate_start_offset] {sheet_id} 探測失敗，改由 offset 0 開始：{e}")
+            return 0
+
+        start = locator.start_offset(slack)
+        logging.info(f"[locate_start_offset] {sheet_id} 以 {field_name} 定位起始 offset={start}（{locator.probes} 次探測）")
+        return start
+
+    async def _fetch_modified_desc(
+        self,
+        sheet_id: str,
+        since_dt: datetime,
+        last_modified_field_names: List[str],
+        until_dt: Optional[datetime],
+        limit: int,
+        max_pages: int
+    ) -> Optional[List[Dict[str, Any]]]:
+        """依最後修改欄位遞減掃描，語意同 RagicClient._iter_pages_modified_desc；回傳 None 表示需退回遞增掃描。"""
+        url = f'{self.base_url}/{sheet_id}'
+        planner = ModifiedDescPlanner(self._parse_dt, since_dt, until_dt, last_modified_field_names, limit, max_pages)
+        if not planner.usable():
+            return None
+        collected: List[Dict[str, Any]] = []
+        while planner.has_more():
+            params = planner.next_params()
+            try:
+                data, _, _ = await self._get_page_once(url, params)
+            except Exception as e:
+                logging.warning(f"Ragic 讀取失敗（{sheet_id}, offset={params['offset']}, limit={limit}）：{e}")
+                break
+            kept, stop, ordered = planner.on_page(data, sheet_id)
+            if not ordered:
+                return None
+            collected.extend(kept)
+            if stop:
+                break
+        logging.info(f"[fetch_modified_desc] {sheet_id} 完成非同步抓取：共 {planner.pages} 頁，保留 {len(collected)} 筆資料")
+        return collected
+
+    async def fetch_since_local_paged(
+        self,
+        sheet_id: str,
+        since_dt: datetime,
+        last_modified_field_names: List[str],
+        until_dt: Optional[datetime] = None,
+        limit: int = 1000,
+        max_pages: int = 50,
+        no_new_data_pages_threshold: int = 2,
+        prefetch_pages: int = 1,
+        page_size_controller: Optional[AdaptivePageSizeController] = None,
+        pagination: str = 'offset',
+        strategy: str = 'ragic_id_asc',
+        start_offset: int = 0,
+        locate_field: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        本地過濾增量抓取，語意同 RagicClient.fetch_since_local_paged
+        （分頁規劃與停止規則共用 ragic_paging；prefetch_pages > 1 時以 task 預抓後續 offset）。
+        """
+        logging.info(f"[fetch_since_local_paged] 開始非同步抓取 {sheet_id}（since_dt={since_dt.isoformat()}）")
+
+        if strategy == 'modified_desc':
+            desc_records = await self._fetch_modified_desc(sheet_id, since_dt, last_modified_field_names, until_dt, limit, max_pages)
+            if desc_records is not None:
+                return desc_records
+            logging.warning(f"[fetch_since_local_paged] {sheet_id} 無法依修改時間遞減掃描，退回 _ragicId 遞增掃描")
+
+        if locate_field:
+            start_offset = max(int(start_offset or 0), await self.locate_start_offset(sheet_id, since_dt, locate_field, slack=limit))
+
+        collected: List[Dict[str, Any]] = []
+        url = f'{self.base_url}/{sheet_id}'
+        page_filter = _IncrementalPageFilter(
+            parse_dt=self._parse_dt,
+            since_dt=since_dt,
+            until_dt=until_dt,
+            last_modified_field_names=last_modified_field_names,
+            no_new_data_pages_threshold=no_new_data_pages_threshold,
+        )
+        planner = IncrementalPagePlanner(
+            sheet_id,
+            page_filter,
+            limit=limit,
+            max_pages=max_pages,
+            prefetch_pages=prefetch_pages,
+            page_size_controller=page_size_controller,
+            pagination=pagination,
+            start_offset=start_offset,
+        )
+
+        in_flight: Deque[Tuple[Dict[str, Any], asyncio.Task]] = deque()
+        try:
+            while planner.has_more():
+                while planner.can_submit(len(in_flight)):
+                    params = planner.next_params()
+                    in_flight.append((params, asyncio.ensure_future(self._get_page_once(url, params))))
+                params, task = in_flight.popleft()
+                try:
+                    data, elapsed, payload_bytes = await task
+                except httpx.ReadTimeout as e:
+                    planner.on_timeout(params)
+                    logging.warning(f"Ragic 讀取逾時（{sheet_id}, offset={params['offset']}, limit={params['limit']}）：{e}")
+                    break
+                except Exception as e:
+                    logging.warning(f"Ragic 讀取失敗（{sheet_id}, offset={params['offset']}, limit={params['limit']}）：{e}")
+                    break
+
+                kept, stop = planner.on_page(params, data, elapsed, payload_bytes)
+                if kept is None:
+                    continue
+                collected.extend(kept)
+                if stop:
+                    break
+        finally:
+            tasks = [task for _, task in in_flight]
+            for task in tasks:
+                task.cancel()
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+
+        logging.info(f"[fetch_since_local_paged] {sheet_id} 完成非同步抓取：共 {planner.pages} 頁，保留 {len(collected)} 筆資料")
+        return collected
+
+    async def test_connection(self) -> bool:
+        """簡易測試：嘗試連到帳號根網址，能連上即視為可用（同 RagicClient.test_connection）。"""
+        try:
+            resp = await self._get(self.base_url)
+            logging.info(f"Ragic ping {self.base_url} -> {resp.status_code}")
+            return resp.status_code in (200, 301, 302, 401, 403, 404)
+        except Exception as e:
+            logging.error(f"Ragic ping error for {self.base_url}: {e}")
+            return False
+
+    async def close(self):
+        """關閉連線池"""
+        await self.client.aclose()
@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+"""
+BigQuery 非阻塞工作協調模組
+
+以相依關係描述一組 BigQuery 工作（載入、MERGE、同步狀態更新），立即送出所有已可執行的工作，
+以退避間隔輪詢進行中的工作，某工作完成後立即送出依賴它的工作：
+- 互不相依的載入工作同時進行，各表的上傳時間重疊而非相加
+- exclusive 相同的工作不同時執行（例如寫入同一目標表的 MERGE，避免 DML 並行衝突）
+- 依賴的工作失敗或被略過時，後續工作略過；cleanup 不論成功與否都會執行
+"""
+
+import logging
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+# 工作狀態
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+SKIPPED = "skipped"
+
+
+class JobTask:
+    """單一工作：start 送出 BigQuery 工作並回傳 job（回傳 None 表示同步步驟，視為立即完成）"""
+
+    def __init__(self,
+                 name: str,
+                 start: Callable[[], Any],
+                 depends_on: Sequence[str] = (),
+                 exclusive: Optional[str] = None,
+                 on_done: Optional[Callable[[Any], Any]] = None,
+                 cleanup: Optional[Callable[[], None]] = None):
+        self.name = name
+        self.start = start
+        self.depends_on = list(depends_on)
+        self.exclusive = exclusive
+        self.on_done = on_done
+        self.cleanup = cleanup
+        self.status = PENDING
+        self.job: Any = None
+        self.job_id: Optional[str] = None
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.submitted_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+
+class BigQueryJobManager:
+    """依相依關係同時送出 BigQuery 工作並以退避間隔輪詢"""
+
+    def __init__(self,
+                 max_concurrent_jobs: int = 4,
+                 poll_interval: float = 0.5,
+                 max_poll_interval: float = 8.0,
+                 backoff: float = 1.5):
+        """
+        初始化工作協調器
+
+        Args:
+            max_concurrent_jobs: 同時進行的 BigQuery 工作上限
+            poll_interval: 初始輪詢間隔（秒）；有工作狀態變化時重設
+            max_poll_interval: 輪詢間隔上限（秒）
+            backoff: 無狀態變化時輪詢間隔的倍率
+        """
+        self.max_concurrent_jobs = max(1, max_concurrent_jobs)
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.backoff = backoff
+        self.tasks: Dict[str, JobTask] = {}
+
+    def submit(self,
+               name: str,
+               start: Callable[[], Any],
+               depends_on: Sequence[str] = (),
+               exclusive: Optional[str] = None,
+               on_done: Optional[Callable[[Any], Any]] = None,
+               cleanup: Optional[Callable[[], None]] = None) -> str:
+        """
+        登記工作（依賴滿足後於 wait 期間送出）
+
+        Args:
+            name: 工作名稱（唯一）
+            start: 送出工作的函數，回傳 BigQuery job 或 None
+            depends_on: 須先成功完成的工作名稱
+            exclusive: 互斥鍵；相同鍵的工作不同時執行
+            on_done: 成功完成後以 job 呼叫，回傳值存為工作結果
+            cleanup: 工作結束（成功、失敗或略過）後呼叫
+
+        Returns:
+            str: 工作名稱
+        """
+        if name in self.tasks:
+            raise ValueError(f"工作名稱重複: {name}")
+        missing = [dep for dep in depends_on if dep not in self.tasks]
+        if missing:
+            raise ValueError(f"工作 {name} 依賴未登記的工作: {', '.join(missing)}")
+        self.tasks[name] = JobTask(name, start, depends_on, exclusive, on_done, cleanup)
+        return name
+
+    def _finish(self, task: JobTask, status: str, error: Optional[str] = None) -> None:
+        task.status = status
+        task.error = error
+        task.finished_at = time.monotonic()
+        if status == FAILED:
+            logging.error(f"BigQuery 工作 {task.name}（{task.job_id or '-'}）失敗: {error}")
+        elif status == SKIPPED:
+            logging.warning(f"BigQuery 工作 {task.name} 已略過: {error}")
+        if task.cleanup:
+            try:
+                task.cleanup()
+            except Exception as e:
+                logging.warning(f"工作 {task.name} 的清理失敗: {e}")
+
+    def _complete(self, task: JobTask) -> None:
+        """工作已完成：取得結果（失敗時拋出的錯誤記為失敗）並執行 on_done"""
+        try:
+            if task.job is not None:
+                task.job.result()
+                if getattr(task.job, 'errors', None):
+                    raise Exception(task.job.errors)
+            if task.on_done:
+                task.result = task.on_done(task.job)
+        except Exception as e:
+            self._finish(task, FAILED, str(e))
+            return
+        self._finish(task, DONE)
+        if task.submitted_at is not None:
+            logging.info(f"BigQuery 工作 {task.name}（{task.job_id or '同步'}）完成，耗時 {task.finished_at - task.submitted_at:.2f} 秒")
+
+    def _start_ready(self) -> bool:
+        """送出依賴已滿足的工作；回傳是否有狀態變化"""
+        changed = False
+        running = [t for t in self.tasks.values() if t.status == RUNNING]
+        busy_keys = {t.exclusive for t in running if t.exclusive}
+        for task in self.tasks.values():
+            if task.status != PENDING:
+                continue
+            deps = [self.tasks[d] for d in task.depends_on]
+            blocked = [d for d in deps if d.status in (FAILED, SKIPPED)]
+            if blocked:
+                self._finish(task, SKIPPED, f"依賴的工作 {blocked[0].name} 未成功")
+                changed = True
+                continue
+            if any(d.status != DONE for d in deps) or (task.exclusive and task.exclusive in busy_keys):
+                continue
+            if len(running) >= self.max_concurrent_jobs:
+                break
+            task.submitted_at = time.monotonic()
+            try:
+                task.job = task.start()
+            except Exception as e:
+                self._finish(task, FAILED, str(e))
+                changed = True
+                continue
+            changed = True
+            if task.job is None:
+                self._complete(task)
+                continue
+            task.job_id = getattr(task.job, 'job_id', None)
+            task.status = RUNNING
+            running.append(task)
+            if task.exclusive:
+                busy_keys.add(task.exclusive)
+            logging.info(f"已送出 BigQuery 工作 {task.name}（{task.job_id}）")
+        return changed
+
+    def _poll_running(self) -> bool:
+        """輪詢進行中的工作；回傳是否有工作完成"""
+        changed = False
+        for task in self.tasks.values():
+            if task.status != RUNNING:
+                continue
+            try:
+                done = task.job.done()
+            except Exception as e:
+                self._finish(task, FAILED, str(e))
+                changed = True
+                continue
+            if done:
+                self._complete(task)
+                changed = True
+        return changed
+
+    def pump(self) -> bool:
+        """
+        不等待地推進一輪：送出已就緒的工作並輪詢進行中的工作
+
+        Returns:
+            bool: 是否有狀態變化
+        """
+        changed = self._start_ready()
+        changed = self._poll_running() or changed
+        # 有工作完成時立即送出依賴它的工作
+        if changed:
+            changed = self._start_ready() or changed
+        return changed
+
+    def wait(self, timeout: Optional[float] = None) -> Dict[str, JobTask]:
+        """
+        執行至所有工作結束
+
+        Args:
+            timeout: 整體逾時秒數；逾時仍未結束的工作記為失敗（已送出的 BigQuery 工作不會取消）
+
+        Returns:
+            Dict[工作名稱, JobTask]
+        """
+        deadline = time.monotonic() + timeout if timeout else None
+        interval = self.poll_interval
+        while True:
+            changed = self.pump()
+            unfinished = [t for t in self.tasks.values() if t.status in (PENDING, RUNNING)]
+            if not unfinished:
+                break
+            if deadline is not None and time.monotonic() >= deadline:
+                for task in unfinished:
+                    self._finish(task, FAILED, "等待逾時")
+                break
+            interval = self.poll_interval if changed else min(interval * self.backoff, self.max_poll_interval)
+            time.sleep(interval if deadline is None else max(0.0, min(interval, deadline - time.monotonic())))
+        return self.tasks
+
+    def summary(self) -> Dict[str, Any]:
+        """各狀態的工作數與失敗工作的錯誤"""
+        counts: Dict[str, int] = {}
+        for task in self.tasks.values():
+            counts[task.status] = counts.get(task.status, 0) + 1
+        failed: List[Dict[str, Any]] = [
+            {"name": t.name, "job_id": t.job_id, "error": t.error}
+            for t in self.tasks.values() if t.status in (FAILED, SKIPPED)
+        ]
+        return {"counts": counts, "failed": failed}
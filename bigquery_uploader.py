@@ -4,26 +4,65 @@ BigQuery 上傳模組
 專門處理資料上傳至 BigQuery 的功能
 """
 
+import io
 import logging
 import datetime
+import threading
+import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Any, Optional, Tuple
 from google.cloud import bigquery
 from google.cloud.exceptions import NotFound, Conflict
-from data_transformer import BIGQUERY_SCHEMA, TAIPEI_TZ
+from data_transformer import TAIPEI_TZ, get_bigquery_schema
 from datetime import timezone
 
+# 快取的 MERGE 語句中代表來源表的佔位字串（每次執行替換為實際的臨時表）
+_MERGE_SOURCE_PLACEHOLDER = "__merge_source__"
+
+# BigQuery 在 schema 不符或資料表不存在時的錯誤訊息片語（小寫）
+_SCHEMA_ERROR_PHRASES = (
+    "no such field",                    # 載入/MERGE 時目標表沒有的欄位
+    "unrecognized name",                # 查詢引用不存在的欄位
+    "not found: table",                 # 資料表已刪除
+    "provided schema does not match",   # 載入的 schema 與既有表不同
+    "invalid schema update",            # 欄位型別或模式變更
+    "cannot be inserted into column",   # MERGE/INSERT 欄位型別不符
+    "wrong column count",               # INSERT 欄位數不符
+)
+
 
 class BigQueryUploader:
     """BigQuery 上傳器類別"""
 
-    def __init__(self, project_id: str, location: str = "US"):
+    def __init__(self,
+                 project_id: str,
+                 location: str = "US",
+                 client: Optional[bigquery.Client] = None,
+                 load_format: str = "json",
+                 storage_write_stream: str = "pending",
+                 storage_write_endpoint: Optional[str] = None,
+                 partition_field: Optional[str] = None,
+                 cluster_fields: Optional[List[str]] = None,
+                 merge_sp_auto_deploy: bool = False,
+                 metadata_cache_ttl: float = 0,
+                 include_row_hash: bool = False):
         """
         初始化 BigQuery 上傳器
 
         Args:
             project_id: GCP 專案 ID
             location: BigQuery 資料集位置
+            client: 共用的 BigQuery 客戶端（None 時自行建立）
+            load_format: 載入檔格式，json（load_table_from_json）、parquet（需 pyarrow）或 avro（需 fastavro）
+            storage_write_stream: storage_write 模式使用的 stream 類型（committed | pending）
+            storage_write_endpoint: Storage Write API 自訂端點（本機假服務，如 localhost:50051）
+            partition_field: 目標表的日期分區欄位（如 created_at）；建立目標表時依日分區，MERGE 時依批次範圍裁切分區
+                （僅限值不會改變的欄位，見 merge_procedure.IMMUTABLE_PRUNE_FIELDS）
+            cluster_fields: 目標表的叢集欄位（如 ["order_id"]）；MERGE 時依批次範圍加上叢集過濾（限制同上）
+            merge_sp_auto_deploy: 依 schema 產生並部署 MERGE 預儲程序；啟用時 auto 模式不論筆數皆走 staging + 預儲程序
+            metadata_cache_ttl: 資料集/資料表中繼資料（存在與否、schema、MERGE 語句）的快取秒數；0 表示不快取
+            include_row_hash: 預設 schema 是否含 row_hash（轉換器計算列雜湊時啟用；既有目標表缺少時新增該欄位）
 
         Raises:
             Exception: 當無法建立 BigQuery 客戶端時
@@ -33,6 +72,34 @@ class BigQueryUploader:
 
         self.project_id = project_id
         self.location = location
+        # 未指定 schema 時使用的預設 schema
+        self.default_schema = get_bigquery_schema(include_row_hash)
+        self.load_format = "json"
+        if load_format and load_format.lower() != "json":
+            # 延遲匯入：使用 JSON 載入時不載入 pyarrow/fastavro
+            from load_serializer import check_load_format
+            self.load_format = check_load_format(load_format)
+        self.storage_write_stream = storage_write_stream
+        self.storage_write_endpoint = storage_write_endpoint
+        self._write_client = None
+        self.partition_field = partition_field or None
+        self.cluster_fields = list(cluster_fields or [])
+        # 目標表 → 實際的分區欄位（由 _ensure_table_exists 記錄，None 表示未分區）
+        self._table_partition_fields: Dict[str, Optional[str]] = {}
+        self.merge_sp_auto_deploy = merge_sp_auto_deploy
+        # 預儲程序 → 本行程已確認部署的定義
+        self._deployed_procedures: Dict[str, str] = {}
+        # 中繼資料快取：資料集 → 確認存在的時間；資料表 → {"table", "loaded_at", "layout_checked", "merge_sql"}
+        self.metadata_cache_ttl = metadata_cache_ttl
+        self._dataset_cache: Dict[str, float] = {}
+        self._table_cache: Dict[str, Dict[str, Any]] = {}
+        self._metadata_lock = threading.Lock()
+
+        # 外部傳入的客戶端（如客戶端池共用者）由呼叫端負責關閉
+        self._owns_client = client is None
+        if client is not None:
+            self.client = client
+            return
 
         try:
             self.client = bigquery.Client(project=project_id)
@@ -75,7 +142,7 @@ class BigQueryUploader:
 
         # 使用預設 schema 如果沒有提供
         if schema is None:
-            schema = BIGQUERY_SCHEMA
+            schema = self.default_schema
 
         logging.info(f"開始上傳資料至 BigQuery - 資料集: {dataset_id}, 資料表: {table_id}")
         start_time = datetime.datetime.now()
@@ -84,8 +151,9 @@ class BigQueryUploader:
             # 直送或 staging+SP 決策
             mode = (upload_mode or "auto").lower()
 
-            if mode == "staging_sp" or (mode == "auto" and len(data) > batch_threshold):
-                # 使用 staging + 預儲程序
+            use_staging = mode == "auto" and (self.merge_sp_auto_deploy or len(data) > batch_threshold)
+            if mode in ("staging_sp", "storage_write") or use_staging:
+                # 使用 staging + 預儲程序（storage_write 以 Storage Write API 寫入 staging，不經載入工作）
                 st_table = staging_table or f"{table_id}_staging"
                 result = self._upload_via_staging(
                     data=data,
@@ -93,11 +161,12 @@ class BigQueryUploader:
                     target_table_id=table_id,
                     staging_table_id=st_table,
                     base_schema=schema,
-                    merge_sp_name=merge_sp_name
+                    merge_sp_name=merge_sp_name,
+                    use_storage_write=(mode == "storage_write")
                 )
             else:
                 # 直送（MERGE / INSERT）
-                table_ref = self._ensure_table_exists(dataset_id, table_id, schema)
+                table_ref = self._ensure_table_exists(dataset_id, table_id, schema, apply_layout=True)
                 if use_merge:
                     result = self._upload_with_merge(data, table_ref, schema)
                 else:
@@ -116,6 +185,11 @@ class BigQueryUploader:
 
         except Exception as e:
             logging.error(f"BigQuery 上傳失敗: {e}")
+            self._invalidate_on_schema_error(
+                e,
+                f"{self.project_id}.{dataset_id}.{table_id}",
+                f"{self.project_id}.{dataset_id}.{staging_table or f'{table_id}_staging'}",
+            )
             raise
 
     def truncate_table(self, dataset_id: str, table_id: str, *, confirm: bool = False) -> None:
@@ -134,7 +208,7 @@ class BigQueryUploader:
         logging.info(f"即將清空資料表: {table_ref}")
         try:
             # 先確保資料表存在
-            self._ensure_table_exists(dataset_id, table_id, BIGQUERY_SCHEMA)
+            self._ensure_table_exists(dataset_id, table_id, self.default_schema)
 
             # 優先使用 TRUNCATE TABLE，若不支援則改用 DELETE FROM
             try:
@@ -157,7 +231,8 @@ class BigQueryUploader:
     def _ensure_table_exists(self,
                            dataset_id: str,
                            table_id: str,
-                           schema: List[bigquery.SchemaField]) -> str:
+                           schema: List[bigquery.SchemaField],
+                           apply_layout: bool = False) -> str:
         """
         確保資料集和資料表存在
 
@@ -165,6 +240,7 @@ class BigQueryUploader:
             dataset_id: 資料集 ID
             table_id: 資料表 ID
             schema: BigQuery 架構
+            apply_layout: 是否套用分區與叢集設定（目標表）
 
         Returns:
             str: 完整的資料表參考路徑
@@ -175,24 +251,150 @@ class BigQueryUploader:
         # 完整資料表參考
         table_ref = f"{self.project_id}.{dataset_id}.{table_id}"
 
+        # 快取中的資料表已確認存在（資料集必然存在）；需套用分區設定時須已檢查過
+        cached = self._get_cached_table(table_ref)
+        if (cached is not None and (cached["layout_checked"] or not apply_layout)
+                and not self._missing_row_hash(cached["table"], schema)):
+            return table_ref
+
         # 確保資料集存在
         self._ensure_dataset_exists(dataset_id)
 
         # 確保資料表存在
         try:
-            self.client.get_table(table_ref)
+            table = self.client.get_table(table_ref)
             logging.info(f"資料表 {table_id} 已存在")
+            table = self._ensure_row_hash_column(table, schema)
+            if apply_layout:
+                table = self._check_table_layout(table, schema)
         except NotFound:
             logging.info(f"資料表 {table_id} 不存在，正在建立...")
             try:
                 table = bigquery.Table(table_ref, schema=schema)
-                self.client.create_table(table)
+                if apply_layout:
+                    schema_names = {f.name for f in schema}
+                    if self.partition_field in schema_names:
+                        table.time_partitioning = bigquery.TimePartitioning(
+                            type_=bigquery.TimePartitioningType.DAY, field=self.partition_field
+                        )
+                    cluster_fields = [f for f in self.cluster_fields if f in schema_names]
+                    if cluster_fields:
+                        table.clustering_fields = cluster_fields
+                table = self.client.create_table(table)
                 logging.info(f"資料表 {table_id} 建立成功")
             except Exception as e:
                 raise Exception(f"建立資料表失敗: {e}")
 
+        partitioning = getattr(table, 'time_partitioning', None)
+        self._table_partition_fields[table_ref] = partitioning.field if partitioning else None
+        self._cache_table(table_ref, table, layout_checked=apply_layout)
         return table_ref
 
+    def _get_cached_table(self, table_ref: str) -> Optional[Dict[str, Any]]:
+        """取得未過期的資料表快取項目（未啟用快取或已過期時回傳 None）"""
+        if self.metadata_cache_ttl <= 0:
+            return None
+        with self._metadata_lock:
+            entry = self._table_cache.get(table_ref)
+            if entry is None or time.monotonic() - entry["loaded_at"] >= self.metadata_cache_ttl:
+                return None
+            return entry
+
+    def _cache_table(self, table_ref: str, table: bigquery.Table, layout_checked: bool = False) -> None:
+        """記錄資料表中繼資料（schema 未變時保留已產生的 MERGE 語句）"""
+        if self.metadata_cache_ttl <= 0:
+            return
+        with self._metadata_lock:
+            previous = self._table_cache.get(table_ref)
+            same_schema = previous is not None and list(previous["table"].schema) == list(table.schema)
+            self._table_cache[table_ref] = {
+                "table": table,
+                "loaded_at": time.monotonic(),
+                "layout_checked": layout_checked or bool(same_schema and previous["layout_checked"]),
+                "merge_sql": previous["merge_sql"] if same_schema else {},
+            }
+
+    def invalidate_table_metadata(self, table_ref: Optional[str] = None) -> None:
+        """
+        清除中繼資料快取
+
+        Args:
+            table_ref: 資料表完整名稱；None 時清除全部（含資料集）
+        """
+        with self._metadata_lock:
+            if table_ref is None:
+                self._table_cache.clear()
+                self._dataset_cache.clear()
+            else:
+                self._table_cache.pop(table_ref, None)
+
+    @staticmethod
+    def _is_schema_error(error: Exception) -> bool:
+        """
+        判斷錯誤是否來自 schema 不符或資料表已不存在（快取可能過期）
+
+        NotFound（或錯誤原因為 notFound）一律視為是；其餘僅在錯誤原因為 invalid/invalidQuery（或無原因，
+        如包裝後的一般 Exception）且訊息含 schema 不符的特定片語時才是，避免配額、權限等錯誤誤判。
+        """
+        if isinstance(error, NotFound):
+            return True
+        reasons = {e.get("reason") for e in (getattr(error, "errors", None) or []) if isinstance(e, dict)}
+        if "notFound" in reasons:
+            return True
+        if reasons and not reasons & {"invalid", "invalidQuery"}:
+            return False
+        message = str(error).lower()
+        return any(phrase in message for phrase in _SCHEMA_ERROR_PHRASES)
+
+    def _invalidate_on_schema_error(self, error: Exception, *table_refs: str) -> None:
+        """schema 不符時清除相關資料表的快取，下次重新讀取"""
+        if self.metadata_cache_ttl <= 0 or not self._is_schema_error(error):
+            return
+        for table_ref in table_refs:
+            self.invalidate_table_metadata(table_ref)
+        logging.info(f"偵測到 schema 不符，已清除中繼資料快取: {', '.join(table_refs)}")
+
+    @staticmethod
+    def _missing_row_hash(table: bigquery.Table, schema: List[bigquery.SchemaField]) -> bool:
+        """schema 含 row_hash 而既有表沒有"""
+        return "row_hash" in {f.name for f in schema} and "row_hash" not in {f.name for f in table.schema}
+
+    def _ensure_row_hash_column(self, table: bigquery.Table, schema: List[bigquery.SchemaField]) -> bigquery.Table:
+        """
+        schema 含 row_hash 而既有表（目標表或 staging 表）沒有時新增該欄位（既有列為 NULL）；
+        staging 表缺少時雜湊不會寫入，預儲程序的雜湊比對也就無從生效
+        """
+        if not self._missing_row_hash(table, schema):
+            return table
+        try:
+            table.schema = list(table.schema) + [bigquery.SchemaField("row_hash", "STRING")]
+            table = self.client.update_table(table, ["schema"])
+            logging.info(f"資料表 {table.table_id} 已新增 row_hash 欄位")
+        except Exception as e:
+            logging.warning(f"新增資料表 {table.table_id} 的 row_hash 欄位失敗: {e}")
+        return table
+
+    def _check_table_layout(self, table: bigquery.Table, schema: List[bigquery.SchemaField]) -> bigquery.Table:
+        """
+        檢查既有目標表的分區與叢集設定：叢集欄位不同時更新（僅影響之後寫入的資料）；
+        分區無法就地變更，僅記錄警告
+        """
+        partitioning = table.time_partitioning
+        if self.partition_field and (partitioning is None or partitioning.field != self.partition_field):
+            logging.warning(
+                f"資料表 {table.table_id} 未以 {self.partition_field} 分區，MERGE 無法裁切分區；"
+                f"需以 CREATE TABLE ... PARTITION BY DATE({self.partition_field}) AS SELECT 重建"
+            )
+        cluster_fields = [f for f in self.cluster_fields if f in {s.name for s in table.schema}]
+        if cluster_fields and list(table.clustering_fields or []) != cluster_fields:
+            try:
+                table.clustering_fields = cluster_fields
+                self.client.update_table(table, ["clustering_fields"])
+                logging.info(f"資料表 {table.table_id} 叢集欄位已更新為 {cluster_fields}")
+            except Exception as e:
+                logging.warning(f"更新資料表 {table.table_id} 叢集欄位失敗: {e}")
+        return table
+
     def _ensure_dataset_exists(self, dataset_id: str):
         """
         確保資料集存在
@@ -204,6 +406,11 @@ class BigQueryUploader:
             Exception: 當建立失敗時
         """
         dataset_ref = f"{self.project_id}.{dataset_id}"
+        if self.metadata_cache_ttl > 0:
+            with self._metadata_lock:
+                checked_at = self._dataset_cache.get(dataset_ref)
+            if checked_at is not None and time.monotonic() - checked_at < self.metadata_cache_ttl:
+                return
 
         try:
             self.client.get_dataset(dataset_ref)
@@ -217,13 +424,20 @@ class BigQueryUploader:
                 logging.info(f"資料集 {dataset_id} 建立成功")
             except Exception as e:
                 raise Exception(f"建立資料集失敗: {e}")
+        if self.metadata_cache_ttl > 0:
+            with self._metadata_lock:
+                self._dataset_cache[dataset_ref] = time.monotonic()
 
     def _get_existing_table_schema(self, table_ref: str) -> Optional[List[bigquery.SchemaField]]:
         """
         讀取 BigQuery 目標表的現有 Schema，若不存在則回傳 None。
         """
+        cached = self._get_cached_table(table_ref)
+        if cached is not None:
+            return list(cached["table"].schema)
         try:
             table = self.client.get_table(table_ref)
+            self._cache_table(table_ref, table)
             return list(table.schema)
         except NotFound:
             return None
@@ -242,6 +456,33 @@ class BigQueryUploader:
             projected.append(filtered)
         return projected
 
+    def _load_rows(self,
+                   rows: List[Dict[str, Any]],
+                   table_ref: str,
+                   job_config: bigquery.LoadJobConfig) -> bigquery.LoadJob:
+        """
+        依 load_format 載入記錄：json 使用 load_table_from_json，parquet/avro 先在記憶體中依
+        job_config.schema 序列化為二進位檔再以 load_table_from_file 載入
+
+        Args:
+            rows: 已投影到 schema 的記錄
+            table_ref: 目標資料表
+            job_config: 載入設定（需含 schema）
+
+        Returns:
+            bigquery.LoadJob: 已送出的載入工作
+        """
+        if self.load_format == "json":
+            return self.client.load_table_from_json(rows, table_ref, job_config=job_config)
+
+        from load_serializer import serialize_rows
+        payload, source_format = serialize_rows(rows, job_config.schema, self.load_format)
+        job_config.source_format = source_format
+        if self.load_format == "avro":
+            job_config.use_avro_logical_types = True
+        logging.info(f"以 {self.load_format} 載入 {len(rows)} 筆資料（{len(payload):,} bytes）")
+        return self.client.load_table_from_file(io.BytesIO(payload), table_ref, job_config=job_config)
+
     def _get_staging_schema(self, base_schema: List[bigquery.SchemaField]) -> List[bigquery.SchemaField]:
         """
         取得 staging 表的 Schema：在基底 schema 基礎上，額外附加批次欄位
@@ -292,11 +533,15 @@ class BigQueryUploader:
                             target_table_id: str,
                             staging_table_id: str,
                             base_schema: List[bigquery.SchemaField],
-                            merge_sp_name: Optional[str]) -> Dict[str, Any]:
+                            merge_sp_name: Optional[str],
+                            use_storage_write: bool = False) -> Dict[str, Any]:
         """
         透過 staging 表 + 預儲程序進行上傳（高吞吐、安全）
+
+        use_storage_write 時以 Storage Write API 寫入 staging（不經載入工作排隊），其餘流程相同
         """
-        logging.info(f"使用 staging+SP 上傳 {len(data)} 筆資料 → staging 表: {staging_table_id}")
+        method = "storage_write_sp" if use_storage_write else "staging_sp"
+        logging.info(f"使用 {method} 上傳 {len(data)} 筆資料 → staging 表: {staging_table_id}")
 
         # 生成批次 ID 與時間戳
         batch_id = f"{datetime.datetime.utcnow().strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}"
@@ -309,6 +554,12 @@ class BigQueryUploader:
         # 以實際 staging 表 schema 為準，避免未知欄位
         existing_staging_schema = self._get_existing_table_schema(staging_table_ref) or staging_schema
 
+        sp_fqn = self._resolve_sp_fqn(merge_sp_name, dataset_id)
+        if self.merge_sp_auto_deploy:
+            # 先確認預儲程序與 staging 欄位一致，再寫入 staging
+            self._ensure_merge_procedure(sp_fqn, dataset_id, target_table_id, staging_table_ref,
+                                         base_schema, existing_staging_schema)
+
         # 附加批次欄位並投影到 schema（排除未知欄位如 _ragicId 等）
         payload = []
         allowed_fields = {f.name for f in existing_staging_schema}
@@ -318,18 +569,21 @@ class BigQueryUploader:
             enriched['ingested_at'] = ingested_at
             payload.append(enriched)
 
-        # 載入至 staging（Append）
-        job_config = bigquery.LoadJobConfig(
-            schema=existing_staging_schema,
-            write_disposition=bigquery.WriteDisposition.WRITE_APPEND
-        )
-        load_job = self.client.load_table_from_json(payload, staging_table_ref, job_config=job_config)
-        load_job.result()
-        if load_job.errors:
-            raise Exception(f"載入 staging 失敗: {load_job.errors}")
+        if use_storage_write:
+            # 以 Storage Write API 附加至 staging
+            self._append_via_storage_write(payload, dataset_id, staging_table_id, existing_staging_schema)
+        else:
+            # 載入至 staging（Append）
+            job_config = bigquery.LoadJobConfig(
+                schema=existing_staging_schema,
+                write_disposition=bigquery.WriteDisposition.WRITE_APPEND
+            )
+            load_job = self._load_rows(payload, staging_table_ref, job_config)
+            load_job.result()
+            if load_job.errors:
+                raise Exception(f"載入 staging 失敗: {load_job.errors}")
 
         # 呼叫預儲程序執行 MERGE（在 BQ 端完成 Upsert / 清理 / 審計）
-        sp_fqn = self._resolve_sp_fqn(merge_sp_name, dataset_id)
         logging.info(f"呼叫預儲程序: {sp_fqn} (batch_id={batch_id})")
 
         call_query = f"CALL `{sp_fqn}`(@batch_id)"
@@ -342,13 +596,71 @@ class BigQueryUploader:
 
         return {
             "status": "success",
-            "method": "staging_sp",
+            "method": method,
             "records_processed": len(data),
             "batch_id": batch_id,
             "staging_table": staging_table_id,
             "stored_procedure": sp_fqn
         }
 
+    def _ensure_merge_procedure(self,
+                                sp_fqn: str,
+                                dataset_id: str,
+                                target_table_id: str,
+                                staging_table_ref: str,
+                                base_schema: List[bigquery.SchemaField],
+                                staging_schema: List[bigquery.SchemaField]) -> None:
+        """
+        依 schema 與目標表、staging 表的實際欄位產生 MERGE 預儲程序並部署（定義未變更時不重新部署）
+
+        Raises:
+            Exception: 當部署失敗時
+        """
+        from merge_procedure import build_merge_procedure, deploy_merge_procedure, resolve_merge_fields
+
+        target_ref = self._ensure_table_exists(dataset_id, target_table_id, base_schema, apply_layout=True)
+        fields = resolve_merge_fields(base_schema, self._get_existing_table_schema(target_ref), staging_schema)
+        # 與直送 MERGE 相同：目標表確實以設定的欄位分區時才裁切分區
+        partition_field = self.partition_field if self._table_partition_fields.get(target_ref) == self.partition_field else None
+        definition = build_merge_procedure(
+            sp_fqn, target_ref, staging_table_ref, fields,
+            partition_field=partition_field,
+            cluster_fields=self.cluster_fields,
+            audit_table_ref=f"{self.project_id}.{dataset_id}.ragic_ingest_audit",
+        )
+        if self._deployed_procedures.get(sp_fqn) == definition:
+            return
+        try:
+            deploy_merge_procedure(self.client, sp_fqn, definition)
+        except Exception as e:
+            raise Exception(f"部署預儲程序失敗（{sp_fqn}）: {e}")
+        self._deployed_procedures[sp_fqn] = definition
+
+    def _append_via_storage_write(self,
+                                  rows: List[Dict[str, Any]],
+                                  dataset_id: str,
+                                  table_id: str,
+                                  schema: List[bigquery.SchemaField]) -> Dict[str, Any]:
+        """
+        以 Storage Write API 附加記錄（首次使用時建立 BigQueryWriteClient）
+
+        Args:
+            rows: 已投影到 schema 的記錄
+            dataset_id: 資料集 ID
+            table_id: 資料表 ID
+            schema: 資料表的 BigQuery 架構
+
+        Returns:
+            Dict: 寫入結果
+        """
+        from storage_writer import StorageWriteAppender, create_write_client
+        if self._write_client is None:
+            self._write_client = create_write_client(self.storage_write_endpoint)
+        appender = StorageWriteAppender(
+            self._write_client, self.project_id, dataset_id, table_id, schema, self.storage_write_stream
+        )
+        return appender.append(rows)
+
     def _upload_with_merge(self,
                           data: List[Dict[str, Any]],
                           table_ref: str,
@@ -370,82 +682,23 @@ class BigQueryUploader:
         logging.info(f"使用 MERGE 操作上傳 {len(data)} 筆資料")
 
         try:
-            # 動態生成所有欄位名稱
-            # 以目標表現有欄位為準，與提供 schema 取交集，避免未知欄位
-            existing_schema = self._get_existing_table_schema(table_ref) or schema
-            existing_names = {f.name for f in existing_schema}
-            provided_by_name = {f.name: f for f in schema}
-            effective_schema = [provided_by_name[name] for name in existing_names if name in provided_by_name]
-            if not effective_schema:
-                effective_schema = schema
-
-            all_fields = [field.name for field in effective_schema]
-
-            # 生成 UPDATE SET 子句
-            update_statements = [f"T.{field} = S.{field}" for field in all_fields if field != 'order_id']
-            update_clause = ",\n        ".join(update_statements)
-
-            # 生成 INSERT 子句
-            insert_fields = ", ".join(all_fields)
-            insert_values = ", ".join([f"S.{field}" for field in all_fields])
-
-            # 建立臨時表並載入資料（避免複雜的 STRUCT 參數型別問題）
-            try:
-                project_id, dataset_id, _ = table_ref.split('.')
-            except ValueError:
-                # 退而求其次：使用預設專案
-                project_id = self.project_id
-                parts = table_ref.split('.')
-                dataset_id = parts[1] if len(parts) > 1 else self.location
-
-            temp_table_id = f"__tmp_merge_{uuid.uuid4().hex[:12]}"
-            temp_full_ref = f"{project_id}.{dataset_id}.{temp_table_id}"
-
-            # 建立臨時表
-            temp_table = bigquery.Table(temp_full_ref, schema=effective_schema)
-            self.client.create_table(temp_table)
+            effective_schema = self._get_effective_schema(table_ref, schema)
+            temp_full_ref = self._create_temp_table(table_ref, effective_schema)
 
             try:
                 # 載入資料至臨時表
                 load_cfg = bigquery.LoadJobConfig(schema=effective_schema, write_disposition=bigquery.WriteDisposition.WRITE_APPEND)
-                load_job = self.client.load_table_from_json(self._project_records_to_schema(data, effective_schema), temp_full_ref, job_config=load_cfg)
+                load_job = self._load_rows(self._project_records_to_schema(data, effective_schema), temp_full_ref, load_cfg)
                 load_job.result()
                 if load_job.errors:
                     raise Exception(load_job.errors)
 
-                # 使用臨時表進行 MERGE（來源端依 order_id 去重，取 updated_at 最新一筆）
-                merge_query = f"""
-                MERGE `{table_ref}` T
-                USING (
-                  SELECT * EXCEPT(row_num) FROM (
-                    SELECT *, ROW_NUMBER() OVER (
-                      PARTITION BY order_id
-                      ORDER BY updated_at DESC NULLS LAST
-                    ) AS row_num
-                    FROM `{temp_full_ref}`
-                  ) WHERE row_num = 1
-                ) S
-                ON T.order_id = S.order_id
-                WHEN MATCHED THEN
-                  UPDATE SET
-                    {update_clause}
-                WHEN NOT MATCHED THEN
-                  INSERT ({insert_fields})
-                  VALUES ({insert_values})
-                """
-
-                qcfg = bigquery.QueryJobConfig(job_timeout_ms=600000)
-                qjob = self.client.query(merge_query, job_config=qcfg)
-                qjob.result()
-                if qjob.errors:
-                    raise Exception(f"MERGE 操作執行錯誤: {qjob.errors}")
-
-                affected_rows = getattr(qjob, 'num_dml_affected_rows', len(data))
+                merge_stats = self._merge_from_table(table_ref, temp_full_ref, effective_schema, data)
                 return {
                     "status": "success",
                     "method": "merge",
                     "records_processed": len(data),
-                    "affected_rows": affected_rows
+                    **merge_stats
                 }
             finally:
                 # 確保臨時表被移除
@@ -456,10 +709,317 @@ class BigQueryUploader:
 
         except Exception as e:
             logging.error(f"MERGE 操作失敗: {e}")
+            self._invalidate_on_schema_error(e, table_ref)
             # 嘗試備用的 INSERT 方案
             logging.info("嘗試使用 INSERT 操作作為備用方案...")
             return self._upload_with_insert(data, table_ref, schema, is_fallback=True)
 
+    def _get_effective_schema(self,
+                              table_ref: str,
+                              schema: List[bigquery.SchemaField]) -> List[bigquery.SchemaField]:
+        """以目標表現有欄位為準，與提供 schema 取交集，避免未知欄位"""
+        existing_schema = self._get_existing_table_schema(table_ref) or schema
+        provided_by_name = {f.name: f for f in schema}
+        # 依目標表欄位順序（產生的 MERGE 語句固定，可重複使用快取）
+        effective_schema = [provided_by_name[f.name] for f in existing_schema if f.name in provided_by_name]
+        return effective_schema or schema
+
+    def _create_temp_table(self, table_ref: str, schema: List[bigquery.SchemaField]) -> str:
+        """在目標表的資料集中建立臨時表（避免複雜的 STRUCT 參數型別問題），回傳完整名稱"""
+        try:
+            project_id, dataset_id, _ = table_ref.split('.')
+        except ValueError:
+            # 退而求其次：使用預設專案
+            project_id = self.project_id
+            parts = table_ref.split('.')
+            dataset_id = parts[1] if len(parts) > 1 else self.location
+
+        temp_table_id = f"__tmp_merge_{uuid.uuid4().hex[:12]}"
+        temp_full_ref = f"{project_id}.{dataset_id}.{temp_table_id}"
+        self.client.create_table(bigquery.Table(temp_full_ref, schema=schema))
+        return temp_full_ref
+
+    def _build_prune_filter(self,
+                            table_ref: str,
+                            schema: List[bigquery.SchemaField],
+                            rows: Optional[List[Dict[str, Any]]]) -> Tuple[List[str], List[bigquery.ScalarQueryParameter]]:
+        """
+        依批次資料的最小/最大值產生目標表的分區與叢集過濾條件
+
+        只使用同一 order_id 的值不會改變的欄位（merge_procedure.IMMUTABLE_PRUNE_FIELDS，如 created_at），
+        否則值已改變的既有列落在範圍外不會被比對到而重複插入。分區欄位僅在目標表確實以該欄位分區、
+        且批次內沒有空值時使用；叢集欄位忽略空值（空值本來就不會比對成功）。
+
+        Returns:
+            Tuple[條件列表, 查詢參數]
+        """
+        if not rows:
+            return [], []
+        field_types = {f.name: f.field_type for f in schema}
+        conditions: List[str] = []
+        params: List[bigquery.ScalarQueryParameter] = []
+
+        from merge_procedure import select_prune_fields
+        part_field = self.partition_field
+        if self._table_partition_fields.get(table_ref) != part_field:
+            part_field = None
+        prune_fields = select_prune_fields(field_types, part_field, self.cluster_fields)
+
+        for i, (field, require_all) in enumerate(prune_fields):
+            field_type = field_types[field]
+            values = [self._coerce_bound(row.get(field), field_type) for row in rows]
+            present = [v for v in values if v is not None]
+            if not present or (require_all and len(present) != len(values)):
+                logging.info(f"批次中 {field} 有空值，MERGE 不以此欄位裁切")
+                continue
+            conditions.append(f"T.{field} BETWEEN @prune_min_{i} AND @prune_max_{i}")
+            params.append(bigquery.ScalarQueryParameter(f"prune_min_{i}", field_type, min(present)))
+            params.append(bigquery.ScalarQueryParameter(f"prune_max_{i}", field_type, max(present)))
+        return conditions, params
+
+    @staticmethod
+    def _coerce_bound(value: Any, field_type: str) -> Any:
+        """將過濾邊界值轉為可比較的型別（TIMESTAMP → UTC datetime、DATE → ISO 字串）"""
+        if value is None or value == "":
+            return None
+        if field_type == "TIMESTAMP":
+            if not isinstance(value, datetime.datetime):
+                value = datetime.datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+            return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+        if field_type == "DATE":
+            return value.isoformat()[:10] if isinstance(value, datetime.date) else str(value)[:10]
+        return value
+
+    @staticmethod
+    def _build_merge_query(table_ref: str, source_ref: str, all_fields: List[str], prune_conditions: List[str]) -> str:
+        """產生 MERGE 語句（來源端依 order_id 去重；prune_conditions 加在 ON 條件；含 row_hash 時僅更新雜湊不同的列）"""
+        from merge_procedure import build_merge_statement
+        return build_merge_statement(table_ref, f"SELECT * FROM `{source_ref}`", all_fields, prune_conditions)
+
+    def _get_merge_query(self, table_ref: str, source_ref: str, all_fields: List[str], prune_conditions: List[str]) -> str:
+        """取得 MERGE 語句；目標表中繼資料已快取時，重複使用相同欄位與裁切條件的語句，只替換來源表"""
+        cached = self._get_cached_table(table_ref)
+        if cached is None:
+            return self._build_merge_query(table_ref, source_ref, all_fields, prune_conditions)
+        key = (tuple(all_fields), tuple(prune_conditions))
+        with self._metadata_lock:
+            template = cached["merge_sql"].get(key)
+            if template is None:
+                template = self._build_merge_query(table_ref, _MERGE_SOURCE_PLACEHOLDER, all_fields, prune_conditions)
+                cached["merge_sql"][key] = template
+        return template.replace(_MERGE_SOURCE_PLACEHOLDER, source_ref)
+
+    def _merge_from_table(self,
+                          table_ref: str,
+                          source_ref: str,
+                          schema: List[bigquery.SchemaField],
+                          rows: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """
+        以來源表 MERGE 至目標表；提供 rows 時依其範圍加上分區/叢集過濾，
+        並以 dry run 估算未裁切 MERGE 的處理量以供比較
+
+        Returns:
+            Dict: affected_rows、bytes_processed、inserted_rows、updated_rows、unchanged_rows（無 DML 統計時為 None），
+                  有裁切時另含 prune_filters 與 bytes_unpruned_estimate
+
+        Raises:
+            Exception: 當 MERGE 執行錯誤時
+        """
+        all_fields = [field.name for field in schema]
+        prune_conditions, prune_params = self._build_prune_filter(table_ref, schema, rows)
+        merge_query = self._get_merge_query(table_ref, source_ref, all_fields, prune_conditions)
+
+        qcfg = bigquery.QueryJobConfig(job_timeout_ms=600000, query_parameters=prune_params)
+        qjob = self.client.query(merge_query, job_config=qcfg)
+        qjob.result()
+        if qjob.errors:
+            raise Exception(f"MERGE 操作執行錯誤: {qjob.errors}")
+
+        stats, message = self._merge_job_stats(qjob, rows)
+        if prune_conditions:
+            stats["prune_filters"] = prune_conditions
+            try:
+                dry_cfg = bigquery.QueryJobConfig(dry_run=True, use_query_cache=False)
+                dry_job = self.client.query(self._get_merge_query(table_ref, source_ref, all_fields, []), job_config=dry_cfg)
+                stats["bytes_unpruned_estimate"] = dry_job.total_bytes_processed
+                message += f"（未裁切預估 {dry_job.total_bytes_processed or 0:,} bytes）"
+            except Exception as e:
+                logging.warning(f"未裁切 MERGE 的 dry run 失敗: {e}")
+        logging.info(message)
+        return stats
+
+    @staticmethod
+    def _merge_job_stats(qjob: bigquery.QueryJob, rows: Optional[List[Dict[str, Any]]]) -> Tuple[Dict[str, Any], str]:
+        """由已完成的 MERGE 工作整理處理量與新增/更新/未變更筆數，回傳 (統計, 記錄訊息)"""
+        affected_rows = getattr(qjob, 'num_dml_affected_rows', None)
+        stats: Dict[str, Any] = {
+            "affected_rows": affected_rows if affected_rows is not None else len(rows or []),
+            "bytes_processed": getattr(qjob, 'total_bytes_processed', None),
+            "inserted_rows": None,
+            "updated_rows": None,
+            "unchanged_rows": None,
+        }
+        message = f"MERGE 處理 {stats['bytes_processed'] or 0:,} bytes"
+        dml_stats = getattr(qjob, 'dml_stats', None)
+        if dml_stats is not None:
+            stats["inserted_rows"] = dml_stats.inserted_row_count or 0
+            stats["updated_rows"] = dml_stats.updated_row_count or 0
+            if rows is not None:
+                # 來源端依 order_id 去重後，未插入也未更新的即為雜湊相同而略過的列
+                source_rows = len({row.get('order_id') for row in rows})
+                stats["unchanged_rows"] = max(0, source_rows - stats["inserted_rows"] - stats["updated_rows"])
+            message += f"，新增 {stats['inserted_rows']} 筆、更新 {stats['updated_rows']} 筆"
+            if stats["unchanged_rows"] is not None:
+                message += f"、未變更 {stats['unchanged_rows']} 筆"
+        return stats, message
+
+    def submit_upload(self,
+                      manager: Any,
+                      name: str,
+                      data: List[Dict[str, Any]],
+                      dataset_id: str,
+                      table_id: str,
+                      schema: Optional[List[bigquery.SchemaField]] = None) -> str:
+        """
+        非阻塞上傳：登記「載入臨時表 → MERGE」兩個工作到 BigQueryJobManager，由其在 wait 時送出
+
+        載入工作彼此同時進行；寫入同一目標表的 MERGE 互斥執行。失敗時不改用 INSERT，
+        錯誤記錄在工作結果中；不執行未裁切 MERGE 的 dry run 估算。
+
+        Args:
+            manager: BigQueryJobManager
+            name: 工作名稱前綴（如表單代碼）
+            data: 要上傳的資料
+            dataset_id: 資料集 ID
+            table_id: 資料表 ID
+            schema: BigQuery 架構，如果不提供則使用預設
+
+        Returns:
+            str: MERGE 工作名稱（其結果為上傳結果）
+        """
+        if schema is None:
+            schema = self.default_schema
+
+        table_ref = self._ensure_table_exists(dataset_id, table_id, schema, apply_layout=True)
+        effective_schema = self._get_effective_schema(table_ref, schema)
+        temp_full_ref = self._create_temp_table(table_ref, effective_schema)
+        projected = self._project_records_to_schema(data, effective_schema)
+        all_fields = [field.name for field in effective_schema]
+        prune_conditions, prune_params = self._build_prune_filter(table_ref, effective_schema, data)
+        merge_query = self._get_merge_query(table_ref, temp_full_ref, all_fields, prune_conditions)
+        source_rows = [{'order_id': row.get('order_id')} for row in data]
+
+        def _start_load() -> bigquery.LoadJob:
+            load_cfg = bigquery.LoadJobConfig(schema=effective_schema, write_disposition=bigquery.WriteDisposition.WRITE_APPEND)
+            return self._load_rows(projected, temp_full_ref, load_cfg)
+
+        def _start_merge() -> bigquery.QueryJob:
+            qcfg = bigquery.QueryJobConfig(job_timeout_ms=600000, query_parameters=prune_params)
+            return self.client.query(merge_query, job_config=qcfg)
+
+        def _merge_done(qjob: bigquery.QueryJob) -> Dict[str, Any]:
+            stats, message = self._merge_job_stats(qjob, source_rows)
+            logging.info(f"[{name}] {message}")
+            if prune_conditions:
+                stats["prune_filters"] = prune_conditions
+            return {"status": "success", "method": "merge", "records_processed": len(data), **stats}
+
+        load_name, merge_name = f"load:{name}", f"merge:{name}"
+
+        def _cleanup() -> None:
+            try:
+                self.client.delete_table(temp_full_ref, not_found_ok=True)
+            except Exception:
+                logging.warning(f"無法刪除臨時表: {temp_full_ref}")
+            for task_name in (load_name, merge_name):
+                task = manager.tasks.get(task_name)
+                if task is not None and task.status == "failed":
+                    self._invalidate_on_schema_error(Exception(task.error), table_ref)
+
+        manager.submit(load_name, _start_load)
+        return manager.submit(merge_name, _start_merge, depends_on=[load_name],
+                              exclusive=table_ref, on_done=_merge_done, cleanup=_cleanup)
+
+    def upload_coalesced(self,
+                         data: List[Dict[str, Any]],
+                         dataset_id: str,
+                         table_id: str,
+                         schema: Optional[List[bigquery.SchemaField]] = None,
+                         chunk_size: int = 1000,
+                         load_workers: int = 1) -> Dict[str, Any]:
+        """
+        合併上傳：全部資料分塊載入同一張臨時表（可平行載入），再執行單一次去重 MERGE
+
+        與逐批呼叫 upload_data 相比，每批各自建立臨時表並 MERGE 整張目標表；
+        此處每次執行只掃描目標表一次。
+
+        Args:
+            data: 要上傳的資料
+            dataset_id: 資料集 ID
+            table_id: 資料表 ID
+            schema: BigQuery 架構，如果不提供則使用預設
+            chunk_size: 每個載入工作的筆數
+            load_workers: 同時進行的載入工作數
+
+        Returns:
+            Dict: 上傳結果
+        """
+        if not data:
+            logging.warning("沒有資料需要上傳到 BigQuery")
+            return {"status": "no_data", "records_processed": 0}
+
+        if schema is None:
+            schema = self.default_schema
+
+        start_time = datetime.datetime.now()
+        table_ref = self._ensure_table_exists(dataset_id, table_id, schema, apply_layout=True)
+        chunks = [data[i:i + chunk_size] for i in range(0, len(data), chunk_size)]
+        logging.info(f"合併上傳 {len(data)} 筆資料：{len(chunks)} 個載入工作（同時 {load_workers} 個）+ 1 次 MERGE")
+
+        try:
+            effective_schema = self._get_effective_schema(table_ref, schema)
+            temp_full_ref = self._create_temp_table(table_ref, effective_schema)
+
+            def _load_chunk(chunk: List[Dict[str, Any]]) -> None:
+                load_cfg = bigquery.LoadJobConfig(schema=effective_schema, write_disposition=bigquery.WriteDisposition.WRITE_APPEND)
+                load_job = self._load_rows(self._project_records_to_schema(chunk, effective_schema), temp_full_ref, load_cfg)
+                load_job.result()
+                if load_job.errors:
+                    raise Exception(load_job.errors)
+
+            try:
+                if load_workers > 1 and len(chunks) > 1:
+                    with ThreadPoolExecutor(max_workers=min(load_workers, len(chunks))) as executor:
+                        list(executor.map(_load_chunk, chunks))
+                else:
+                    for chunk in chunks:
+                        _load_chunk(chunk)
+
+                merge_stats = self._merge_from_table(table_ref, temp_full_ref, effective_schema, data)
+                result = {
+                    "status": "success",
+                    "method": "coalesced_merge",
+                    "records_processed": len(data),
+                    "load_jobs": len(chunks),
+                    **merge_stats
+                }
+            finally:
+                try:
+                    self.client.delete_table(temp_full_ref, not_found_ok=True)
+                except Exception:
+                    logging.warning(f"無法刪除臨時表: {temp_full_ref}")
+
+        except Exception as e:
+            logging.error(f"合併 MERGE 失敗: {e}")
+            self._invalidate_on_schema_error(e, table_ref)
+            logging.info("嘗試使用 INSERT 操作作為備用方案...")
+            result = self._upload_with_insert(data, table_ref, schema, is_fallback=True)
+
+        duration = (datetime.datetime.now() - start_time).total_seconds()
+        result["duration_seconds"] = duration
+        logging.info(f"合併上傳完成 - 耗時: {duration:.2f} 秒, 處理記錄: {result.get('records_processed', 0)}")
+        return result
+
     def _upload_with_insert(self,
                            data: List[Dict[str, Any]],
                            table_ref: str,
@@ -489,9 +1049,7 @@ class BigQueryUploader:
                 write_disposition=bigquery.WriteDisposition.WRITE_APPEND
             )
 
-            job = self.client.load_table_from_json(
-                self._project_records_to_schema(data, schema), table_ref, job_config=job_config
-            )
+            job = self._load_rows(self._project_records_to_schema(data, schema), table_ref, job_config)
             job.result()  # 等待完成
 
             if job.errors:
@@ -524,7 +1082,7 @@ class BigQueryUploader:
             datetime.datetime: UTC datetime 物件。
         """
         sync_state_table_ref = f"{self.project_id}.ragic_backup.sheet_sync_state"
-        default_last_sync = datetime.now(timezone.utc) - datetime.timedelta(weeks=1)
+        default_last_sync = datetime.datetime.now(timezone.utc) - datetime.timedelta(weeks=1)
 
         try:
             query = f"""
@@ -559,26 +1117,25 @@ class BigQueryUploader:
             logging.warning(f"無法從 sheet_sync_state 獲取最後同步時間（{sheet_code}）: {e}，使用預設值（UTC 一週前）")
             return default_last_sync
 
-    def update_sync_timestamp(self, sheet_code: str, new_timestamp: datetime.datetime):
+    def start_sync_timestamp_update(self, sheet_code: str, new_timestamp: datetime.datetime) -> bigquery.QueryJob:
         """
-        更新 BigQuery 中 sheet_sync_state 表的最後同步時間。
-        使用 MERGE 操作來插入或更新記錄。
+        送出更新 sheet_sync_state 最後同步時間的 MERGE 工作（不等待完成）
 
         Args:
             sheet_code: Sheet 代碼。
             new_timestamp: 新的最後同步時間 (UTC datetime 物件)。
+
+        Returns:
+            bigquery.QueryJob: 已送出的查詢工作
         """
         sync_state_table_ref = f"{self.project_id}.ragic_backup.sheet_sync_state"
-        
+
         # 確保 new_timestamp 是 timezone-aware UTC
         if new_timestamp.tzinfo is None:
             new_timestamp = new_timestamp.replace(tzinfo=timezone.utc)
         else:
             new_timestamp = new_timestamp.astimezone(timezone.utc)
 
-        # 將 datetime 物件轉換為 BigQuery TIMESTAMP 字符串格式
-        timestamp_str = new_timestamp.isoformat(timespec='microseconds')
-
         query = f"""
         MERGE `{sync_state_table_ref}` AS T
         USING (SELECT @sheet_code AS sheet_code, @new_timestamp AS last_sync_timestamp, CURRENT_TIMESTAMP() AS updated_at) AS S
@@ -595,9 +1152,19 @@ class BigQueryUploader:
             bigquery.ScalarQueryParameter('sheet_code', 'STRING', sheet_code),
             bigquery.ScalarQueryParameter('new_timestamp', 'TIMESTAMP', new_timestamp)
         ])
+        return self.client.query(query, job_config=qcfg)
+
+    def update_sync_timestamp(self, sheet_code: str, new_timestamp: datetime.datetime):
+        """
+        更新 BigQuery 中 sheet_sync_state 表的最後同步時間。
+        使用 MERGE 操作來插入或更新記錄。
 
+        Args:
+            sheet_code: Sheet 代碼。
+            new_timestamp: 新的最後同步時間 (UTC datetime 物件)。
+        """
         try:
-            query_job = self.client.query(query, job_config=qcfg)
+            query_job = self.start_sync_timestamp_update(sheet_code, new_timestamp)
             query_job.result()
             logging.info(f"[Sheet {sheet_code}] sheet_sync_state 最後同步時間已更新為: {new_timestamp.isoformat()}")
         except Exception as e:
@@ -652,10 +1219,13 @@ class BigQueryUploader:
             return None
 
     def close(self):
-        """關閉連線"""
-        if hasattr(self, 'client'):
+        """關閉連線（外部傳入的 BigQuery 客戶端不關閉）"""
+        if hasattr(self, 'client') and getattr(self, '_owns_client', True):
             self.client.close()
             logging.info("BigQuery 客戶端連線已關閉")
+        if getattr(self, '_write_client', None) is not None:
+            self._write_client.transport.close()
+            self._write_client = None
 
 
 def create_uploader(project_id: str, **kwargs) -> BigQueryUploader:
@@ -676,7 +1246,9 @@ def batch_upload_data(uploader: BigQueryUploader,
                      data: List[Dict[str, Any]],
                      dataset_id: str,
                      table_id: str,
-                     batch_size: int = 1000) -> List[Dict[str, Any]]:
+                     batch_size: int = 1000,
+                     coalesce: bool = False,
+                     load_workers: int = 1) -> List[Dict[str, Any]]:
     """
     批次上傳大量資料
 
@@ -686,6 +1258,8 @@ def batch_upload_data(uploader: BigQueryUploader,
         dataset_id: 資料集 ID
         table_id: 資料表 ID
         batch_size: 每批次大小
+        coalesce: 全部批次載入同一張臨時表後只 MERGE 一次（結果只有一筆）
+        load_workers: coalesce 時同時進行的載入工作數
 
     Returns:
         List[Dict]: 每批次的上傳結果
@@ -696,6 +1270,20 @@ def batch_upload_data(uploader: BigQueryUploader,
     if not data:
         return []
 
+    if coalesce:
+        try:
+            result = uploader.upload_coalesced(data, dataset_id, table_id, chunk_size=batch_size, load_workers=load_workers)
+            result["batch_number"] = 1
+            return [result]
+        except Exception as e:
+            logging.error(f"合併上傳失敗: {e}")
+            return [{
+                "batch_number": 1,
+                "status": "error",
+                "error": str(e),
+                "records_processed": 0
+            }]
+
     results = []
     total_batches = (len(data) + batch_size - 1) // batch_size
 
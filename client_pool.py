@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+長期客戶端池模組
+Cloud Function 暖啟動時，模組層級的物件會保留到下一次呼叫；此模組以延遲建立的方式共用
+Ragic session、BigQuery 客戶端、速率限制器與分頁大小控制器等，避免每次觸發都重新進行 TLS 握手與認證。
+
+- 依設定（API Key、專案等）區分；設定改變時關閉舊客戶端並重建
+- 取用前檢查健康狀態：超過最長存活時間或已標記失效者重建
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from google.cloud import bigquery
+
+from ragic_client import RagicClient
+from rate_limiter import TokenBucketRateLimiter, create_rate_limiter
+from page_size_controller import AdaptivePageSizeController, create_page_size_controller
+from bigquery_uploader import BigQueryUploader, create_uploader
+
+# 預設最長存活時間（秒）：超過即重建，避免長時間閒置後沿用過期的連線或認證
+DEFAULT_MAX_AGE_SECONDS = 6 * 3600
+
+
+class ClientPool:
+    """行程層級的客戶端池（執行緒安全）"""
+
+    def __init__(self, max_age_seconds: float = DEFAULT_MAX_AGE_SECONDS):
+        """
+        初始化客戶端池
+
+        Args:
+            max_age_seconds: 客戶端最長存活時間（秒）
+        """
+        self.max_age_seconds = max_age_seconds
+        # 種類 → (設定鍵, 物件, 建立時間)
+        self._entries: Dict[str, Tuple[Tuple[Any, ...], Any, float]] = {}
+        self._lock = threading.RLock()
+        # 建立、重建或失效時遞增；沿用先前檢查結果者（如預檢快取）據此判斷客戶端是否已更換
+        self.generation = 0
+
+    def _get(self, kind: str, key: Tuple[Any, ...], factory: Callable[[], Any]) -> Any:
+        """取得（必要時建立或重建）指定種類的共用物件"""
+        with self._lock:
+            entry = self._entries.get(kind)
+            if entry is not None:
+                entry_key, value, created_at = entry
+                age = time.monotonic() - created_at
+                if entry_key == key and age < self.max_age_seconds:
+                    logging.info(f"[client_pool] 沿用 {kind}（已存活 {age:.0f} 秒）")
+                    return value
+                reason = "設定變更" if entry_key != key else "超過最長存活時間"
+                logging.info(f"[client_pool] 重建 {kind}（{reason}）")
+                self._close_value(value)
+            value = factory()
+            self._entries[kind] = (key, value, time.monotonic())
+            self.generation += 1
+            return value
+
+    @staticmethod
+    def _close_value(value: Any) -> None:
+        """關閉物件（上傳器只關閉自己建立的資源，共用的 BigQuery 客戶端由 bigquery_client 負責）"""
+        close = getattr(value, 'close', None)
+        if callable(close):
+            try:
+                close()
+            except Exception as e:
+                logging.warning(f"[client_pool] 關閉客戶端時發生錯誤: {e}")
+
+    def get_rate_limiter(self, rate_per_second: float, burst: int) -> TokenBucketRateLimiter:
+        """取得共用的 Ragic 速率限制器（跨呼叫共用，連續觸發時仍遵守速率）"""
+        return self._get('rate_limiter', (rate_per_second, burst),
+                         lambda: create_rate_limiter(rate_per_second=rate_per_second, burst=burst))
+
+    def get_page_size_controller(self, timeout: float, state_file: Optional[str], state_store: Optional[Any] = None) -> AdaptivePageSizeController:
+        """取得共用的分頁大小控制器（已學到的 limit 保留在記憶體，不必每次重讀持久化儲存）"""
+        return self._get('page_size_controller', (timeout, state_file, str(state_store) if state_store else None),
+                         lambda: create_page_size_controller(timeout=timeout, state_file=state_file, state_store=state_store))
+
+    def get_ragic_client(
+        self,
+        api_key: str,
+        account: str,
+        timeout: int,
+        max_retries: int,
+        pool_maxsize: int,
+        rate_limiter: TokenBucketRateLimiter
+    ) -> RagicClient:
+        """取得共用的 Ragic 客戶端（保留 requests session 的連線池）"""
+        key = (api_key, account, timeout, max_retries, pool_maxsize, id(rate_limiter))
+        return self._get('ragic_client', key, lambda: RagicClient(
+            api_key=api_key,
+            account=account,
+            timeout=timeout,
+            max_retries=max_retries,
+            pool_maxsize=pool_maxsize,
+            rate_limiter=rate_limiter
+        ))
+
+    def get_bigquery_client(self, project_id: str) -> bigquery.Client:
+        """取得共用的 BigQuery 客戶端"""
+        return self._get('bigquery_client', (project_id,), lambda: bigquery.Client(project=project_id))
+
+    def get_uploader(self, project_id: str, location: str = "US", **options: Any) -> BigQueryUploader:
+        """取得共用的 BigQuery 上傳器（使用共用的 BigQuery 客戶端；options 為 create_uploader 的其他參數）"""
+        client = self.get_bigquery_client(project_id)
+        return self._get('uploader', (project_id, location, tuple(sorted(options.items())), id(client)),
+                         lambda: create_uploader(project_id=project_id, location=location, client=client, **options))
+
+    def invalidate(self, *kinds: str) -> None:
+        """
+        標記失效並關閉共用物件（下次取用時重建）
+
+        Args:
+            *kinds: 種類名稱；未指定時全部失效
+        """
+        with self._lock:
+            for kind in (kinds or list(self._entries)):
+                entry = self._entries.pop(kind, None)
+                if entry is not None:
+                    self._close_value(entry[1])
+                    self.generation += 1
+                    logging.info(f"[client_pool] {kind} 已失效")
+
+    def close(self) -> None:
+        """關閉所有共用物件"""
+        self.invalidate()
+
+
+_client_pool: Optional[ClientPool] = None
+_client_pool_lock = threading.Lock()
+
+
+def get_client_pool(max_age_seconds: float = DEFAULT_MAX_AGE_SECONDS) -> ClientPool:
+    """
+    取得行程層級的客戶端池（首次呼叫時建立）
+
+    Args:
+        max_age_seconds: 客戶端最長存活時間（秒）
+
+    Returns:
+        ClientPool: 客戶端池
+    """
+    global _client_pool
+    with _client_pool_lock:
+        if _client_pool is None:
+            _client_pool = ClientPool(max_age_seconds=max_age_seconds)
+        else:
+            _client_pool.max_age_seconds = max_age_seconds
+        return _client_pool
@@ -6,9 +6,11 @@
 
 import logging
 import hashlib
-from typing import Dict, Optional, Tuple
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple
 from google.cloud import bigquery
-from pypinyin import lazy_pinyin
 
 # ============================================================================
 # Layer 1: 硬編碼對照表（基礎保護）
@@ -216,18 +218,125 @@ FIELD_MAPPING_BY_SHEET = {
 # ============================================================================
 # Layer 2: BigQuery 動態對照表載入
 # ============================================================================
+# 動態對照表的行程層級快取（所有 DynamicFieldMapper 共用；Cloud Function 暖啟動時沿用）
+DEFAULT_MAPPING_CACHE_TTL = 600
+FIELD_MAPPINGS_TABLE = "grefun-testing.ragic_backup.field_mappings"
+
+_mapping_cache: Dict[str, Any] = {
+    "mappings": None,   # Dict[sheet_code, Dict[中文欄位, 英文欄位]]
+    "loaded_at": 0.0,   # 載入（或確認未變動）的時間（time.monotonic）
+    "version": None,    # field_mappings 資料表的最後修改時間
+}
+_mapping_cache_lock = threading.Lock()
+
+
+def _get_mappings_table_version(client: bigquery.Client) -> Optional[Any]:
+    """取得 field_mappings 資料表的最後修改時間（讀取中繼資料，不執行查詢）"""
+    try:
+        return client.get_table(FIELD_MAPPINGS_TABLE).modified
+    except Exception as e:
+        logging.warning(f"無法取得動態對照表版本: {e}")
+        return None
+
+
+def _query_all_mappings(client: bigquery.Client) -> Dict[str, Dict[str, str]]:
+    """以單一查詢載入所有表單的動態對照（同表單內 priority 較大者覆蓋較小者，同原本逐表查詢）"""
+    query = f"""
+    SELECT sheet_code, chinese_field, english_field
+    FROM `{FIELD_MAPPINGS_TABLE}`
+    WHERE enabled = TRUE
+    ORDER BY priority ASC
+    """
+    mappings: Dict[str, Dict[str, str]] = {}
+    for row in client.query(query).result():
+        mappings.setdefault(row.sheet_code, {})[row.chinese_field] = row.english_field
+    return mappings
+
+
+def load_all_dynamic_mappings(
+    client: bigquery.Client,
+    ttl_seconds: float = DEFAULT_MAPPING_CACHE_TTL,
+    check_version: bool = False,
+    force_reload: bool = False
+) -> Dict[str, Dict[str, str]]:
+    """
+    取得所有表單的動態對照（行程層級快取）
+
+    - 快取未過期：直接回傳，不呼叫 BigQuery
+    - 快取過期且 check_version：資料表最後修改時間未變動時延長快取，不重新查詢
+    - 其餘情況：以單一查詢重新載入；失敗時沿用舊快取
+
+    Args:
+        client: BigQuery 客戶端
+        ttl_seconds: 快取有效秒數
+        check_version: 過期時是否先比對資料表最後修改時間
+        force_reload: 是否忽略快取強制重新載入
+
+    Returns:
+        Dict[表單代碼, Dict[中文欄位, 英文欄位]]
+    """
+    with _mapping_cache_lock:
+        cached = _mapping_cache["mappings"]
+        now = time.monotonic()
+        if not force_reload and cached is not None and now - _mapping_cache["loaded_at"] < ttl_seconds:
+            return cached
+
+        version = _get_mappings_table_version(client) if check_version else None
+        if (not force_reload and cached is not None and version is not None
+                and version == _mapping_cache["version"]):
+            _mapping_cache["loaded_at"] = now
+            logging.info("動態對照表未變動，沿用快取")
+            return cached
+
+        try:
+            mappings = _query_all_mappings(client)
+        except Exception as e:
+            if cached is not None:
+                logging.warning(f"重新載入動態對照表失敗，沿用快取: {e}")
+                return cached
+            raise
+
+        _mapping_cache.update(mappings=mappings, loaded_at=now, version=version)
+        logging.info(f"載入 {sum(len(m) for m in mappings.values())} 個動態欄位對照（{len(mappings)} 個表單）")
+        return mappings
+
+
+def clear_mapping_cache() -> None:
+    """清除動態對照表的行程層級快取"""
+    with _mapping_cache_lock:
+        _mapping_cache.update(mappings=None, loaded_at=0.0, version=None)
+
+
 class DynamicFieldMapper:
     """動態欄位對照表管理器"""
 
-    def __init__(self, project_id: str, use_dynamic: bool = True):
+    def __init__(
+        self,
+        project_id: str,
+        use_dynamic: bool = True,
+        cache_ttl: float = DEFAULT_MAPPING_CACHE_TTL,
+        check_version: bool = False
+    ):
+        """
+        初始化動態欄位對照表管理器
+
+        Args:
+            project_id: GCP 專案 ID
+            use_dynamic: 是否啟用 BigQuery 動態對照表
+            cache_ttl: 行程層級對照快取的有效秒數
+            check_version: 快取過期時是否先比對 field_mappings 最後修改時間，未變動則不重新查詢
+        """
         self.project_id = project_id
         self.use_dynamic = use_dynamic
         self.client = bigquery.Client(project=project_id) if use_dynamic else None
-        self._cache = {}  # 快取機制
+        self.cache_ttl = cache_ttl
+        self.check_version = check_version
+        # 待寫入的未知欄位：(sheet_code, chinese_field) → 暫時英文名稱、出現次數、範例值
+        self._pending_unknown_fields: Dict[Tuple[str, str], Dict[str, Any]] = {}
 
     def load_dynamic_mappings(self, sheet_code: str) -> Dict[str, str]:
         """
-        從 BigQuery 載入動態對照表
+        從 BigQuery 載入動態對照表（所有表單一次載入並於行程內快取）
 
         Args:
             sheet_code: 表單代碼（10, 20, 30...）
@@ -238,72 +347,109 @@ class DynamicFieldMapper:
         if not self.use_dynamic:
             return {}
 
-        # 檢查快取
-        if sheet_code in self._cache:
-            return self._cache[sheet_code]
-
         try:
-            query = """
-            SELECT chinese_field, english_field
-            FROM `grefun-testing.ragic_backup.field_mappings`
-            WHERE sheet_code = @sheet_code AND enabled = TRUE
-            ORDER BY priority ASC
-            """
-
-            job_config = bigquery.QueryJobConfig(
-                query_parameters=[
-                    bigquery.ScalarQueryParameter("sheet_code", "STRING", sheet_code)
-                ]
-            )
-
-            results = self.client.query(query, job_config=job_config).result()
-            mappings = {row.chinese_field: row.english_field for row in results}
-
-            # 更新快取
-            self._cache[sheet_code] = mappings
-            logging.info(f"載入 {len(mappings)} 個動態欄位對照（表單 {sheet_code}）")
-
-            return mappings
+            all_mappings = load_all_dynamic_mappings(self.client, self.cache_ttl, self.check_version)
+            return all_mappings.get(sheet_code, {})
 
         except Exception as e:
             logging.warning(f"無法載入動態對照表（表單 {sheet_code}）: {e}")
             return {}
 
-    def log_unknown_field(self, sheet_code: str, chinese_field: str, temp_english: str, sample_value: str):
-        """記錄未知欄位到 BigQuery"""
+    def record_unknown_field(self, sheet_code: str, chinese_field: str, temp_english: str, sample_value: str) -> bool:
+        """
+        在記憶體中累計未知欄位（不查詢 BigQuery，於 flush_unknown_fields 時批次寫入）
+
+        Args:
+            sheet_code: 表單代碼
+            chinese_field: 中文欄位名稱
+            temp_english: 自動轉換的英文欄位名稱
+            sample_value: 欄位範例值（每個欄位保留第一個非空值）
+
+        Returns:
+            bool: 是否為本批次首次出現的未知欄位
+        """
+        key = (sheet_code, chinese_field)
+        entry = self._pending_unknown_fields.get(key)
+        if entry is None:
+            self._pending_unknown_fields[key] = {
+                "temp_english": temp_english,
+                "occurrence_count": 1,
+                "sample_value": str(sample_value)[:500],
+            }
+            return True
+        entry["occurrence_count"] += 1
+        if not entry["sample_value"] and sample_value:
+            entry["sample_value"] = str(sample_value)[:500]
+        return False
+
+    def flush_unknown_fields(self) -> int:
+        """
+        將累計的未知欄位以單一 MERGE 寫入 BigQuery（出現次數累加、範例值更新）
+
+        Returns:
+            int: 寫入的未知欄位數
+        """
+        if not self._pending_unknown_fields:
+            return 0
+        pending = self._pending_unknown_fields
+        self._pending_unknown_fields = {}
         if not self.use_dynamic:
-            return
+            return 0
 
         try:
             query = """
-            INSERT INTO `grefun-testing.ragic_backup.unknown_fields`
-            (sheet_code, chinese_field, temp_english_field, first_seen_at, occurrence_count, sample_value)
-            VALUES (@sheet_code, @chinese_field, @temp_english, CURRENT_TIMESTAMP(), 1, @sample_value)
-            ON CONFLICT (sheet_code, chinese_field)
-            DO UPDATE SET
-                occurrence_count = unknown_fields.occurrence_count + 1,
-                sample_value = @sample_value
+            MERGE `grefun-testing.ragic_backup.unknown_fields` T
+            USING (SELECT * FROM UNNEST(@rows)) S
+            ON T.sheet_code = S.sheet_code AND T.chinese_field = S.chinese_field
+            WHEN MATCHED THEN UPDATE SET
+                occurrence_count = T.occurrence_count + S.occurrence_count,
+                sample_value = S.sample_value
+            WHEN NOT MATCHED THEN INSERT
+                (sheet_code, chinese_field, temp_english_field, first_seen_at, occurrence_count, sample_value)
+            VALUES
+                (S.sheet_code, S.chinese_field, S.temp_english_field, CURRENT_TIMESTAMP(), S.occurrence_count, S.sample_value)
             """
 
-            job_config = bigquery.QueryJobConfig(
-                query_parameters=[
+            rows = [
+                bigquery.StructQueryParameter(
+                    None,
                     bigquery.ScalarQueryParameter("sheet_code", "STRING", sheet_code),
                     bigquery.ScalarQueryParameter("chinese_field", "STRING", chinese_field),
-                    bigquery.ScalarQueryParameter("temp_english", "STRING", temp_english),
-                    bigquery.ScalarQueryParameter("sample_value", "STRING", str(sample_value)[:500])
-                ]
+                    bigquery.ScalarQueryParameter("temp_english_field", "STRING", entry["temp_english"]),
+                    bigquery.ScalarQueryParameter("occurrence_count", "INT64", entry["occurrence_count"]),
+                    bigquery.ScalarQueryParameter("sample_value", "STRING", entry["sample_value"]),
+                )
+                for (sheet_code, chinese_field), entry in pending.items()
+            ]
+            job_config = bigquery.QueryJobConfig(
+                query_parameters=[bigquery.ArrayQueryParameter("rows", "STRUCT", rows)]
             )
 
-            self.client.query(query, job_config=job_config)
-            logging.info(f"記錄未知欄位: {chinese_field} → {temp_english}")
+            self.client.query(query, job_config=job_config).result()
+            total = sum(entry["occurrence_count"] for entry in pending.values())
+            logging.info(f"已批次記錄 {len(pending)} 個未知欄位（共 {total} 次出現）")
+            return len(pending)
 
         except Exception as e:
-            logging.error(f"記錄未知欄位失敗: {e}")
+            logging.error(f"批次記錄未知欄位失敗: {e}")
+            return 0
 
 
 # ============================================================================
 # Layer 3: 自動未知欄位處理
 # ============================================================================
+@lru_cache(maxsize=4096)
+def _pinyin_field_name(chinese_field: str) -> str:
+    """以拼音轉換欄位名稱（同一欄位名稱只轉換一次）"""
+    # pypinyin 載入詞典約需數百毫秒，僅在出現未知欄位時才匯入，縮短冷啟動時間
+    from pypinyin import lazy_pinyin
+    pinyin_parts = lazy_pinyin(chinese_field)
+    english = '_'.join(pinyin_parts).lower()
+    # 清理特殊字元
+    english = ''.join(c if c.isalnum() or c == '_' else '_' for c in english)
+    return f"auto_{english}"
+
+
 def auto_convert_field_name(chinese_field: str, strategy: str = "pinyin") -> str:
     """
     自動轉換未知中文欄位為英文
@@ -318,11 +464,7 @@ def auto_convert_field_name(chinese_field: str, strategy: str = "pinyin") -> str
     if strategy == "pinyin":
         # 策略 A：拼音轉換
         try:
-            pinyin_parts = lazy_pinyin(chinese_field)
-            english = '_'.join(pinyin_parts).lower()
-            # 清理特殊字元
-            english = ''.join(c if c.isalnum() or c == '_' else '_' for c in english)
-            return f"auto_{english}"
+            return _pinyin_field_name(chinese_field)
         except Exception as e:
             logging.warning(f"拼音轉換失敗: {e}，回退到 hash 策略")
             strategy = "hash"
@@ -385,10 +527,12 @@ def translate_field(
     # Layer 3: 自動轉換未知欄位
     english_field = auto_convert_field_name(chinese_field, strategy="pinyin")
 
-    # 記錄未知欄位
-    logging.warning(f"未知欄位: {chinese_field} → {english_field} (表單 {sheet_code})")
+    # 記錄未知欄位（有動態對照時先於記憶體累計，由 flush_unknown_fields 批次寫入，且每個欄位只警告一次）
     if dynamic_mapper:
-        dynamic_mapper.log_unknown_field(sheet_code, chinese_field, english_field, sample_value)
+        if dynamic_mapper.record_unknown_field(sheet_code, chinese_field, english_field, sample_value):
+            logging.warning(f"未知欄位: {chinese_field} → {english_field} (表單 {sheet_code})")
+    else:
+        logging.warning(f"未知欄位: {chinese_field} → {english_field} (表單 {sheet_code})")
 
     return english_field, True
 
@@ -396,15 +540,16 @@ def translate_field(
 # ============================================================================
 # 工廠函數
 # ============================================================================
-def create_field_mapper(project_id: str, use_dynamic: bool = True) -> DynamicFieldMapper:
+def create_field_mapper(project_id: str, use_dynamic: bool = True, **kwargs) -> DynamicFieldMapper:
     """
     建立動態欄位對照表管理器
 
     Args:
         project_id: GCP 專案 ID
         use_dynamic: 是否啟用 BigQuery 動態對照表
+        **kwargs: 其他管理器參數（cache_ttl、check_version）
 
     Returns:
         DynamicFieldMapper 實例
     """
-    return DynamicFieldMapper(project_id, use_dynamic)
+    return DynamicFieldMapper(project_id, use_dynamic, **kwargs)
@@ -8,13 +8,15 @@
 """
 
 import logging
+import os
 import json
-from datetime import datetime, date, timezone
-from typing import List, Dict, Any, Optional, Set
+import hashlib
+from datetime import datetime, date
+from itertools import compress
+from operator import itemgetter, not_
+from typing import List, Dict, Any, Optional, Set, Callable, Iterable, Tuple, NamedTuple
 from google.cloud import bigquery
-import zoneinfo # For robust timezone handling
-
-TAIPEI_TZ = zoneinfo.ZoneInfo("Asia/Taipei")
+from temporal_parser import TAIPEI_TZ, INVALID_TEMPORAL_VALUES, parse_date, parse_timestamp
 
 # 導入新的配置模組
 try:
@@ -283,6 +285,89 @@ BIGQUERY_SCHEMA = [
     bigquery.SchemaField("RAGIC_AUTOGEN_1622007913873", "STRING"),
 ]
 
+# 列內容雜湊欄位（compute_row_hash 啟用時才加入 schema；MERGE 僅在雜湊不同時更新）
+ROW_HASH_FIELD = bigquery.SchemaField("row_hash", "STRING")
+
+
+def get_bigquery_schema(include_row_hash: bool = False) -> List[bigquery.SchemaField]:
+    """
+    取得 BigQuery Schema
+
+    Args:
+        include_row_hash: 是否附加 row_hash 欄位（僅在計算列雜湊時）
+
+    Returns:
+        List[bigquery.SchemaField]: BigQuery 架構定義
+    """
+    return BIGQUERY_SCHEMA + [ROW_HASH_FIELD] if include_row_hash else BIGQUERY_SCHEMA
+
+
+def _row_hash_default(value: Any) -> str:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+def compute_row_hash(row: Dict[str, Any]) -> str:
+    """
+    計算轉換後記錄的內容雜湊（欄位順序無關；不含 row_hash 本身）
+
+    Args:
+        row: 轉換後的記錄
+
+    Returns:
+        str: 32 字元的十六進位雜湊值
+    """
+    content = {k: v for k, v in row.items() if k != "row_hash"}
+    payload = json.dumps(content, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=_row_hash_default)
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+
+# 轉換計畫中的欄位動作類型
+_ACTION_MAPPED = 0     # 對照表內欄位
+_ACTION_TRANSLATE = 1  # 未知欄位，英文名稱逐筆由 translate_field 決定（動態對照啟用時，改走逐欄位流程）
+_ACTION_UNKNOWN = 2    # 未知欄位，保留原名輸出
+_ACTION_DROP = 3       # 未知欄位，嚴格模式丟棄
+
+
+class _FieldAction(NamedTuple):
+    """轉換計畫中單一欄位的預先決定動作"""
+    chinese_key: str
+    kind: int
+    english_key: Optional[str]
+    converter: Optional[Callable[[Any, Dict[str, Any]], Any]]
+    raw_key: Optional[str]
+    non_nullable: bool
+
+
+class _TransformPlan(NamedTuple):
+    """
+    欄位組合的轉換計畫：批次處理的一般字串欄位 + 逐一處理的其餘欄位
+
+    template 依逐欄位流程的插入順序預先排好輸出欄位（值為 None），填值不改變順序；
+    raw_keys 為視值而定才輸出的原始值欄位，未填值者最後移除。template 為 None 時改走逐欄位流程。
+    """
+    template: Optional[Dict[str, Any]]
+    raw_keys: Tuple[str, ...]
+    fast_keys: Tuple[str, ...]
+    fast_getter: Optional[Callable[[Tuple[Any, ...]], Tuple[Any, ...]]]
+    slow: Tuple[_FieldAction, ...]
+    slow_getter: Callable[[Tuple[Any, ...]], Tuple[Any, ...]]
+
+
+def _tuple_getter(indices: List[int]) -> Callable[[Tuple[Any, ...]], Tuple[Any, ...]]:
+    """依索引取值並一律回傳 tuple（itemgetter 在 0/1 個索引時不回傳 tuple）"""
+    if len(indices) >= 2:
+        return itemgetter(*indices)
+    return lambda values: tuple(values[i] for i in indices)
+
+
+def _plain_string_value(value: Any) -> Any:
+    """一般字串欄位的非典型值：空值為 None，其餘 falsy 值為空字串"""
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return None
+    return str(value) if value else ""
+
 
 class DataTransformer:
     """
@@ -301,7 +386,11 @@ class DataTransformer:
         project_id: Optional[str] = None,
         use_dynamic_mapping: bool = False,
         drop_unmapped: bool = False,
-        log_per_record_failures: bool = False
+        log_per_record_failures: bool = False,
+        use_transform_plan: bool = True,
+        parallel_workers: int = 1,
+        parallel_min_rows: int = 100000,
+        compute_row_hash: bool = False
     ):
         """
         初始化資料轉換器
@@ -311,6 +400,10 @@ class DataTransformer:
             sheet_code: 表單代碼（10, 20, 30...），用於載入對應的欄位映射
             project_id: GCP 專案 ID（啟用動態對照表時需要）
             use_dynamic_mapping: 是否啟用 BigQuery 動態對照表（Layer 2）
+            use_transform_plan: 是否以轉換計畫批次處理一般字串欄位（False 時逐欄位轉換，供比對/除錯）
+            parallel_workers: 平行轉換的行程數（1 = 不使用多行程，0 = 依 CPU 核心數）
+            parallel_min_rows: 筆數達此門檻才使用多行程（門檻依 scripts/benchmark_transform_parallel.py 在目標機器的量測設定）
+            compute_row_hash: 是否為每筆記錄加上 row_hash 內容雜湊欄位（供 MERGE 略過未變更的列）
         """
         self.sheet_code = sheet_code
         self.use_dynamic_mapping = use_dynamic_mapping and USE_NEW_CONFIG_SYSTEM
@@ -375,6 +468,18 @@ class DataTransformer:
         # 不允許為空的欄位（依需求：僅檢查 _ragicId）
         self.non_nullable_fields: Set[str] = {"_ragicId"}
 
+        # 轉換計畫快取：欄位組合（依序）→ 每個欄位的預先決定動作
+        self.use_transform_plan = use_transform_plan
+        self._plan_cache: Dict[Tuple[str, ...], _TransformPlan] = {}
+        self._field_actions: Dict[str, _FieldAction] = {}
+        self._converters: Dict[str, Callable[[Any, Dict[str, Any]], Any]] = {}
+
+        # 多行程平行轉換（行程數不超過 CPU 核心數；筆數未達門檻或啟用動態對照時仍於本行程轉換）
+        cpu_count = os.cpu_count() or 1
+        self.parallel_workers = min(parallel_workers, cpu_count) if parallel_workers > 0 else cpu_count
+        self.parallel_min_rows = parallel_min_rows
+        self.compute_row_hash = compute_row_hash
+
         logging.info(f"資料轉換器初始化完成（表單 {sheet_code}，動態對照: {self.use_dynamic_mapping}）")
 
     def transform_data(self, ragic_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
@@ -415,25 +520,69 @@ class DataTransformer:
                 for f in found_dates:
                     logging.info(f"[transform_data] {f} = {sample.get(f)}")
 
-        for i, item in enumerate(ragic_data):
+        results = None
+        if self.parallel_workers > 1 and len(ragic_data) >= self.parallel_min_rows and self.dynamic_mapper is None:
             try:
-                transformed_item = self._transform_single_record(item, i)
-                if transformed_item:
-                    transformed.append(transformed_item)
-                else:
-                    failed_records.append(i)
-
+                from parallel_transformer import transform_in_process_pool
+                results = transform_in_process_pool(self, ragic_data, self.parallel_workers)
             except Exception as e:
-                logging.error(f"[transform_data] 轉換記錄 {i} 時發生錯誤: {e}")
+                logging.warning(f"[transform_data] 平行轉換失敗，改用單一行程轉換: {e}")
+        if results is None:
+            results = self._transform_records(ragic_data)
+
+        for i, transformed_item in enumerate(results):
+            if transformed_item:
+                transformed.append(transformed_item)
+            else:
                 failed_records.append(i)
-                continue
 
         if failed_records:
             logging.warning(f"[transform_data] 共有 {len(failed_records)} 筆記錄轉換失敗，記錄索引: {failed_records[:10]}...")
 
+        # 本批次累計的未知欄位以單一 MERGE 寫入 BigQuery
+        if self.dynamic_mapper:
+            self.dynamic_mapper.flush_unknown_fields()
+
         logging.info(f"[transform_data] 轉換完成 {len(transformed)} 筆資料，{len(failed_records)} 筆失敗")
         return transformed
 
+    def _transform_records(self, records: List[Any], start_index: int = 0) -> List[Optional[Dict[str, Any]]]:
+        """
+        轉換一批記錄
+
+        Args:
+            records: Ragic 原始記錄
+            start_index: 第一筆記錄在整批資料中的索引（平行轉換時用於錯誤報告）
+
+        Returns:
+            List[Optional[Dict]]: 與輸入等長，轉換失敗或無效的位置為 None
+        """
+        results = [self._transform_record_safe(item, start_index + i) for i, item in enumerate(records)]
+        if self.compute_row_hash:
+            for row in results:
+                if row is not None:
+                    row["row_hash"] = compute_row_hash(row)
+        return results
+
+    def _get_init_kwargs(self) -> Dict[str, Any]:
+        """平行轉換子行程建立相同轉換器所需的參數（不含動態對照與平行設定）"""
+        return {
+            "field_mapping": self.field_mapping,
+            "sheet_code": self.sheet_code,
+            "drop_unmapped": self.drop_unmapped,
+            "log_per_record_failures": self.log_per_record_failures,
+            "use_transform_plan": self.use_transform_plan,
+            "compute_row_hash": self.compute_row_hash,
+        }
+
+    def _transform_record_safe(self, item: Dict[str, Any], index: int) -> Optional[Dict[str, Any]]:
+        """轉換單筆記錄，發生非預期錯誤時記錄並回傳 None"""
+        try:
+            return self._transform_single_record(item, index)
+        except Exception as e:
+            logging.error(f"[transform_data] 轉換記錄 {index} 時發生錯誤: {e}")
+            return None
+
     def _transform_single_record(self, item: Dict[str, Any], index: int) -> Optional[Dict[str, Any]]:
         """
         轉換單筆記錄
@@ -453,73 +602,217 @@ class DataTransformer:
             logging.warning(f"記錄 {index} 不是字典格式")
             return None
 
-        transformed_item: Dict[str, Any] = {}
-        errors: List[str] = []
-        invalid = False
+        if self.use_transform_plan:
+            return self._transform_with_plan(item, index)
+        return self._transform_record_generic(item, index)
+
+    # ---- 轉換計畫：每種欄位組合只判斷一次對照/型別/原始值欄位 ----
+    _PLAN_CACHE_LIMIT = 256
 
-        for chinese_key, value in item.items():
-            # Layer 1/2: 查詢對照表
-            if chinese_key in self.field_mapping:
-                english_key = self.field_mapping[chinese_key]
-                is_unknown = False
+    def _get_converter(self, english_key: str) -> Callable[[Any, Dict[str, Any]], Any]:
+        """
+        取得欄位的型別轉換函數（依英文欄位名稱快取；空值由呼叫端先行處理）
+        """
+        converter = self._converters.get(english_key)
+        if converter is not None:
+            return converter
+
+        default = self._get_default_value(english_key)
+        if english_key in self.float_fields:
+            def converter(value, context):
+                return float(str(value).replace(',', '').strip()) if value else default
+        elif english_key in self.integer_fields:
+            def converter(value, context):
+                return int(float(str(value).replace(',', '').strip())) if value else default
+        elif english_key in self.boolean_fields:
+            def converter(value, context):
+                return str(value).replace(',', '').strip().lower() in ['true', '1', 'yes', '是', '開立'] if value else default
+        elif english_key in self.date_fields:
+            infer_year_from = "order_date" if english_key == "requested_delivery_date" else None
+
+            def converter(value, context):
+                if not value:
+                    return default
+                cleaned = str(value).replace(',', '').strip()
+                # 快速路徑：可直接解析者不經 _normalize_date（無效字串由 parse_date 回傳 None）
+                return parse_date(cleaned) or self._normalize_date(cleaned, context=context, infer_year_from=infer_year_from)
+        elif english_key in self.timestamp_fields:
+            def converter(value, context):
+                if not value:
+                    return default
+                return parse_timestamp(str(value).replace(',', '').strip()) or self._normalize_timestamp(str(value).replace(',', '').strip())
+        else:
+            def converter(value, context):
+                return str(value) if value else default
+
+        self._converters[english_key] = converter
+        return converter
+
+    def _compile_field_action(self, chinese_key: str) -> "_FieldAction":
+        """決定單一中文欄位的處理方式（對照、型別轉換、原始值欄位）"""
+        if chinese_key in self.field_mapping:
+            english_key = self.field_mapping[chinese_key]
+            return _FieldAction(chinese_key, _ACTION_MAPPED, english_key, self._get_converter(english_key),
+                                self.raw_pairs.get(english_key), english_key in self.non_nullable_fields)
+        if USE_NEW_CONFIG_SYSTEM and self.dynamic_mapper:
+            # 英文名稱逐筆決定，輸出順序無法預先排定
+            return _FieldAction(chinese_key, _ACTION_TRANSLATE, None, None, None, False)
+        if self.drop_unmapped:
+            return _FieldAction(chinese_key, _ACTION_DROP, None, None, None, False)
+        return _FieldAction(chinese_key, _ACTION_UNKNOWN, chinese_key, self._get_converter(chinese_key),
+                            self.raw_pairs.get(chinese_key), chinese_key in self.non_nullable_fields)
+
+    def _get_field_action(self, chinese_key: str) -> "_FieldAction":
+        """取得（必要時編譯）單一中文欄位的處理動作"""
+        action = self._field_actions.get(chinese_key)
+        if action is None:
+            action = self._field_actions[chinese_key] = self._compile_field_action(chinese_key)
+        return action
+
+    def _get_plan(self, keys: Tuple[str, ...]) -> "_TransformPlan":
+        """取得（必要時編譯）欄位組合的轉換計畫"""
+        plan = self._plan_cache.get(keys)
+        if plan is None:
+            plan = self._compile_plan(keys)
+            if len(self._plan_cache) >= self._PLAN_CACHE_LIMIT:
+                self._plan_cache.clear()
+            self._plan_cache[keys] = plan
+        return plan
+
+    def _compile_plan(self, keys: Tuple[str, ...]) -> "_TransformPlan":
+        """
+        編譯欄位組合的轉換計畫
+
+        一般字串欄位（無型別轉換、無原始值欄位、可為空）以單一 update 批次填入；
+        其餘欄位依原始順序逐一處理。英文欄位名稱重複者（別名，後者覆蓋前者）一律逐一處理以維持覆蓋順序。
+        輸出欄位順序與逐欄位流程相同；含動態對照欄位（英文名稱逐筆決定）或原始值欄位名稱衝突時不編譯。
+        """
+        plan_actions = [self._get_field_action(chinese_key) for chinese_key in keys]
+
+        seen: Set[str] = set()
+        duplicated: Set[str] = set()
+        for action in plan_actions:
+            if action.english_key is not None:
+                (duplicated if action.english_key in seen else seen).add(action.english_key)
+
+        # 依逐欄位流程的插入順序排列輸出欄位：英文欄位首次出現處，原始值欄位緊接其後
+        order: Dict[str, None] = {}
+        raw_keys: List[str] = []
+        compilable = True
+        for action in plan_actions:
+            if action.kind == _ACTION_TRANSLATE:
+                compilable = False
+                break
+            if action.kind == _ACTION_DROP:
+                continue
+            order.setdefault(action.english_key, None)
+            if action.raw_key is not None:
+                if action.english_key in duplicated or action.raw_key in seen or action.raw_key in order:
+                    compilable = False
+                    break
+                order[action.raw_key] = None
+                raw_keys.append(action.raw_key)
+        if not compilable:
+            return _TransformPlan(None, (), (), None, (), _tuple_getter([]))
+
+        fast_idx: List[int] = []
+        slow_idx: List[int] = []
+        for idx, action in enumerate(plan_actions):
+            if (action.kind == _ACTION_MAPPED and action.english_key not in duplicated and action.raw_key is None
+                    and not action.non_nullable and self._is_plain_string_field(action.english_key)):
+                fast_idx.append(idx)
             else:
+                slow_idx.append(idx)
+        if len(fast_idx) < 2:
+            # itemgetter 單一索引不回傳 tuple，直接逐一處理
+            fast_idx = []
+            slow_idx = list(range(len(plan_actions)))
+
+        return _TransformPlan(
+            template=order,
+            raw_keys=tuple(raw_keys),
+            fast_keys=tuple(plan_actions[idx].english_key for idx in fast_idx),
+            fast_getter=itemgetter(*fast_idx) if fast_idx else None,
+            slow=tuple(plan_actions[idx] for idx in slow_idx),
+            slow_getter=_tuple_getter(slow_idx),
+        )
+
+    def _is_plain_string_field(self, english_key: str) -> bool:
+        return not (english_key in self.float_fields or english_key in self.integer_fields
+                    or english_key in self.boolean_fields or english_key in self.date_fields
+                    or english_key in self.timestamp_fields)
+
+    def _translate_action(self, chinese_key: str, value: Any) -> "_FieldAction":
+        """動態對照欄位：以 translate_field 逐筆決定英文名稱後的處理動作"""
+        english_key, is_unknown = translate_field(
+            chinese_field=chinese_key,
+            sheet_code=self.sheet_code,
+            mappings=self.field_mapping,
+            dynamic_mapper=self.dynamic_mapper,
+            sample_value=str(value)[:500]  # 限制長度
+        )
+        if is_unknown and self.drop_unmapped:
+            return _FieldAction(chinese_key, _ACTION_DROP, None, None, None, False)
+        return _FieldAction(chinese_key, _ACTION_UNKNOWN if is_unknown else _ACTION_MAPPED, english_key,
+                            self._get_converter(english_key), self.raw_pairs.get(english_key),
+                            english_key in self.non_nullable_fields)
+
+    def _convert_fields(self, pairs: Iterable[Tuple["_FieldAction", Any]], transformed_item: Dict[str, Any],
+                        index: int, errors: List[str]) -> bool:
+        """
+        依欄位動作逐一轉換並寫入 transformed_item
+
+        Args:
+            pairs: (欄位動作, 原始值)，依原始欄位順序
+            transformed_item: 輸出記錄（同時作為推斷年份的上下文）
+            index: 記錄索引（用於錯誤報告）
+            errors: 收集錯誤訊息
+
+        Returns:
+            bool: 是否有不可為空的欄位為空（整筆視為無效）
+        """
+        invalid = False
+        for action, value in pairs:
+            chinese_key, kind, english_key, converter, raw_key, non_nullable = action
+            if kind == _ACTION_TRANSLATE:
                 # Layer 3: 自動處理未知欄位
-                if USE_NEW_CONFIG_SYSTEM and self.dynamic_mapper:
-                    english_key, is_unknown = translate_field(
-                        chinese_field=chinese_key,
-                        sheet_code=self.sheet_code,
-                        mappings=self.field_mapping,
-                        dynamic_mapper=self.dynamic_mapper,
-                        sample_value=str(value)[:500]  # 限制長度
-                    )
-                    if is_unknown:
-                        self.unknown_fields_count += 1
-                        self.unknown_field_counts[chinese_key] = self.unknown_field_counts.get(chinese_key, 0) + 1
-                        if self.drop_unmapped:
-                            # 嚴格模式：丟棄未對應欄位（不輸出），僅統計
-                            continue
-                else:
-                    # 回退方案
-                    is_unknown = True
-                    self.unknown_fields_count += 1
-                    self.unknown_field_counts[chinese_key] = self.unknown_field_counts.get(chinese_key, 0) + 1
-                    if self.drop_unmapped:
-                        # 嚴格模式：丟棄未對應欄位（不輸出），僅統計
-                        continue
-                    # 非嚴格模式才保留原名輸出
-                    english_key = chinese_key
+                _, kind, english_key, converter, raw_key, non_nullable = self._translate_action(chinese_key, value)
+            if kind != _ACTION_MAPPED:
+                self.unknown_fields_count += 1
+                self.unknown_field_counts[chinese_key] = self.unknown_field_counts.get(chinese_key, 0) + 1
+                if kind == _ACTION_DROP:
+                    # 嚴格模式：丟棄未對應欄位（不輸出），僅統計
+                    continue
 
             # 空值檢查：指定欄位不可為空
-            if value is None or (isinstance(value, str) and value.strip() == ""):
-                if english_key in self.non_nullable_fields:
+            if value is None or (isinstance(value, str) and not value.strip()):
+                if non_nullable:
                     errors.append(f"欄位 {english_key} 不可為空")
                     invalid = True
                 # 仍記錄為 None 以利觀察
                 transformed_item[english_key] = None
                 continue
 
-            # 型別轉換
             try:
-                converted_value = self._convert_field_type(english_key, value, context=transformed_item)
-                transformed_item[english_key] = converted_value
-                # 保留原始值（僅在轉換失敗或屬於需保留清單時記錄）
-                if english_key in self.raw_pairs:
-                    # 僅在原始字串非空時保留
-                    if isinstance(value, str) and value.strip() != "":
-                        transformed_item[self.raw_pairs[english_key]] = str(value)
-
+                transformed_item[english_key] = converter(value, transformed_item)
+                # 保留原始值（僅在原始字串非空時）
+                if raw_key is not None and isinstance(value, str):
+                    transformed_item[raw_key] = str(value)
             except (ValueError, TypeError) as e:
                 if self.log_per_record_failures:
                     logging.warning(f"記錄 {index} 的欄位 {english_key} 轉換失敗: {value}, 錯誤: {e}")
                 errors.append(f"欄位 {english_key} 型別不符: {value}")
-                # 清理策略：不視為無效列，改填預設值/None
+                # 清理策略：不視為無效列，改填預設值/None，並保留原始字串
                 transformed_item[english_key] = self._get_default_value(english_key)
-                # 轉換失敗則保留原始字串
-                if english_key in self.raw_pairs:
-                    transformed_item[self.raw_pairs[english_key]] = str(value)
+                if raw_key is not None:
+                    transformed_item[raw_key] = str(value)
                 # 統計欄位失敗計數
                 self.failure_counts[english_key] = self.failure_counts.get(english_key, 0) + 1
+        return invalid
 
+    def _finish_record(self, item: Dict[str, Any], index: int, transformed_item: Dict[str, Any],
+                       errors: List[str], invalid: bool) -> Optional[Dict[str, Any]]:
+        """驗證必要欄位並注入來源表代碼；無效時記入 invalid_records 並回傳 None"""
         # 驗證必要欄位（僅檢查 _ragicId）
         if not self._validate_required_fields(transformed_item, index):
             errors.append("缺少必要欄位：_ragicId")
@@ -537,40 +830,44 @@ class DataTransformer:
         transformed_item["sheet_code"] = self.sheet_code
         return transformed_item
 
-    def _convert_field_type(self, field_name: str, value: Any, context: Optional[Dict[str, Any]] = None) -> Any:
-        """
-        根據欄位類型轉換值
-
-        Args:
-            field_name: 欄位名稱
-            value: 原始值
-
-        Returns:
-            Any: 轉換後的值
-        """
-        # 檢查空值
-        if not value or (isinstance(value, str) and value.strip() == ""):
-            return self._get_default_value(field_name)
-
-        # 清理數值字串（移除千分位逗號）
-        cleaned_value = str(value).replace(',', '').strip()
+    def _transform_with_plan(self, item: Dict[str, Any], index: int) -> Optional[Dict[str, Any]]:
+        """依預先編譯的轉換計畫轉換單筆記錄（結果與欄位順序同 _transform_record_generic）"""
+        keys = tuple(item)
+        plan = self._get_plan(keys)
+        if plan.template is None:
+            return self._transform_record_generic(item, index)
+        values = tuple(item.values())
+        errors: List[str] = []
 
-        # 根據欄位類型進行轉換
-        if field_name in self.float_fields:
-            return float(cleaned_value)
-        elif field_name in self.integer_fields:
-            return int(float(cleaned_value))
-        elif field_name in self.boolean_fields:
-            return cleaned_value.lower() in ['true', '1', 'yes', '是', '開立']
-        elif field_name in self.date_fields:
-            # 特例：requested_delivery_date 支援月/日推斷年份
-            if field_name == "requested_delivery_date":
-                return self._normalize_date(cleaned_value, context=context, infer_year_from="order_date")
-            return self._normalize_date(cleaned_value)
-        elif field_name in self.timestamp_fields:
-            return self._normalize_timestamp(cleaned_value)
-        else:
-            return str(value)
+        # 預先排好欄位順序（原始值欄位與尚未處理的欄位為 None，推斷年份時視同不存在）
+        transformed_item: Dict[str, Any] = plan.template.copy()
+        if plan.fast_getter is not None:
+            # 一般字串欄位：非空字串原樣保留，空白字串改為 None（以 C 層級迭代找出空白值）
+            fast_values = plan.fast_getter(values)
+            transformed_item.update(zip(plan.fast_keys, fast_values))
+            try:
+                for english_key in compress(plan.fast_keys, map(not_, map(str.strip, fast_values))):
+                    transformed_item[english_key] = None
+            except TypeError:
+                # 含非字串值（數字、None 等）：逐一套用一般字串欄位的轉換規則
+                for english_key, value in zip(plan.fast_keys, fast_values):
+                    if not (isinstance(value, str) and value.strip()):
+                        transformed_item[english_key] = _plain_string_value(value)
+
+        invalid = self._convert_fields(zip(plan.slow, plan.slow_getter(values)), transformed_item, index, errors)
+
+        for raw_key in plan.raw_keys:
+            if transformed_item[raw_key] is None:
+                del transformed_item[raw_key]
+        return self._finish_record(item, index, transformed_item, errors, invalid)
+
+    def _transform_record_generic(self, item: Dict[str, Any], index: int) -> Optional[Dict[str, Any]]:
+        """依原始欄位順序逐一轉換（未使用轉換計畫、含動態對照欄位或原始值欄位名稱衝突時）"""
+        transformed_item: Dict[str, Any] = {}
+        errors: List[str] = []
+        pairs = ((self._get_field_action(chinese_key), value) for chinese_key, value in item.items())
+        invalid = self._convert_fields(pairs, transformed_item, index, errors)
+        return self._finish_record(item, index, transformed_item, errors, invalid)
 
     def _get_default_value(self, field_name: str) -> Any:
         """
@@ -601,25 +898,14 @@ class DataTransformer:
         if not isinstance(value, str):
             raise ValueError("日期欄位必須是字串")
 
-        candidates = [
-            "%Y-%m-%d",
-            "%Y/%m/%d",
-            "%Y%m%d",
-            "%Y-%m-%d %H:%M:%S",
-            "%Y/%m/%d %H:%M:%S",
-            "%Y-%m-%d %H:%M",
-            "%Y/%m/%d %H:%M",
-        ]
         # 常見無效字串直接視為不可解析
-        if value.strip() in {"不指定", "N/A", "NA", "-", "—", "null", "None", "ADDLINE"}:
+        if value.strip() in INVALID_TEMPORAL_VALUES:
             raise ValueError(f"無法解析日期: {value}")
 
-        for fmt in candidates:
-            try:
-                dt = datetime.strptime(value.strip(), fmt)
-                return dt.strftime("%Y-%m-%d")
-            except ValueError:
-                continue
+        normalized = parse_date(value)
+        if normalized is not None:
+            return normalized
+
         # 支援月/日（省略年份）→ 以 context 的 infer_year_from 推斷年份
         v = value.strip()
         if infer_year_from and context is not None:
@@ -643,63 +929,15 @@ class DataTransformer:
         """
         將常見日期時間格式正規化為 UTC datetime 物件。
         如果輸入時間沒有時區資訊，則假定為 Asia/Taipei 時區。
+        （解析與快取由 temporal_parser.parse_timestamp 負責）
         """
         if not isinstance(value, str):
             raise ValueError("時間戳欄位必須是字串")
 
-        v = value.strip()
-        if v in {"不指定", "N/A", "NA", "-", "—", "null", "None", "ADDLINE"}:
+        dt_utc = parse_timestamp(value)
+        if dt_utc is None:
             raise ValueError(f"無法解析時間戳: {value}")
-
-        dt_naive: Optional[datetime] = None
-
-        # 嘗試解析常見格式
-        candidates = [
-            "%Y-%m-%d %H:%M:%S",
-            "%Y/%m/%d %H:%M:%S",
-            "%Y-%m-%d %H:%M",
-            "%Y/%m/%d %H:%M",
-            "%Y-%m-%d",
-            "%Y/%m/%d",
-        ]
-        for fmt in candidates:
-            try:
-                dt_naive = datetime.strptime(v, fmt)
-                break
-            except ValueError:
-                continue
-
-        # 支援 14 碼數字時間戳（YYYYMMDDHHMMSS）
-        if dt_naive is None and v.isdigit() and len(v) == 14:
-            try:
-                dt_naive = datetime.strptime(v, "%Y%m%d%H%M%S")
-            except ValueError:
-                pass
-
-        # 常見的 ISO 格式直接解析
-        if dt_naive is None:
-            try:
-                # datetime.fromisoformat 可以處理帶時區的 ISO 格式
-                # 將 Z 替換為 +00:00，以便 fromisoformat 正確處理 UTC
-                dt_parsed = datetime.fromisoformat(v.replace("Z", "+00:00"))
-                if dt_parsed.tzinfo is None: # 如果是 naive ISO 格式
-                    dt_naive = dt_parsed
-                else: # 如果已經帶有時區資訊，直接轉換為 UTC
-                    return dt_parsed.astimezone(timezone.utc)
-            except ValueError:
-                pass
-
-        if dt_naive is None:
-            raise ValueError(f"無法解析時間戳: {value}")
-
-        # 如果解析出的時間是 naive，則假定為 Asia/Taipei 時區，然後轉換為 UTC
-        if dt_naive.tzinfo is None:
-            dt_localized = dt_naive.replace(tzinfo=TAIPEI_TZ) # Localize to Taipei
-            dt_utc = dt_localized.astimezone(timezone.utc) # Convert to UTC
-            return dt_utc
-        else:
-            # 如果已經帶有時區資訊，直接轉換為 UTC
-            return dt_naive.astimezone(timezone.utc)
+        return dt_utc
 
     def _validate_required_fields(self, record: Dict[str, Any], index: int) -> bool:
         """
@@ -726,9 +964,9 @@ class DataTransformer:
         獲取 BigQuery Schema
 
         Returns:
-            List[bigquery.SchemaField]: BigQuery 架構定義
+            List[bigquery.SchemaField]: BigQuery 架構定義（計算 row_hash 時含該欄位）
         """
-        return BIGQUERY_SCHEMA
+        return get_bigquery_schema(self.compute_row_hash)
 
     def get_field_mapping(self) -> Dict[str, str]:
         """
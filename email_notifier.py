@@ -11,7 +11,6 @@ import time
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from typing import List, Dict, Any, Optional
-from google.cloud import logging as cloud_logging
 
 
 class EmailNotifier:
@@ -42,8 +41,9 @@ class EmailNotifier:
         self.from_email = from_email
         self.from_password = from_password
 
-        # 初始化 Cloud Logging 客戶端
+        # 初始化 Cloud Logging 客戶端（延遲匯入，未寄送通知時不載入）
         try:
+            from google.cloud import logging as cloud_logging
             self.logging_client = cloud_logging.Client(project=project_id)
             logging.info(f"Cloud Logging 客戶端初始化完成 - 專案: {project_id}")
         except Exception as e:
@@ -81,6 +81,7 @@ class EmailNotifier:
             logging.info(f"查詢日誌 - 時間範圍: {hours_back} 小時, 限制: {limit} 筆")
 
             # 查詢日誌
+            from google.cloud import logging as cloud_logging
             entries = self.logging_client.list_entries(
                 filter_=full_filter,
                 order_by=cloud_logging.DESCENDING,
@@ -6,12 +6,15 @@ ERP 資料備份主程式
 
 import os
 import json
+import asyncio
 import logging
 from datetime import datetime, timezone, timedelta
 from data_transformer import TAIPEI_TZ # For robust timezone handling
 import time
+import threading
 import requests
-from typing import Dict, Any, Optional, List
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Dict, Any, Optional, List, Tuple
 from google.cloud import bigquery
 
 # Sheet 時間欄位配置
@@ -24,10 +27,23 @@ from sheet_time_field_config import (
 
 # 導入自定義模組
 from ragic_client import RagicClient
+from rate_limiter import create_rate_limiter
+from page_size_controller import create_page_size_controller, AdaptivePageSizeController, BigQueryPageSizeStore
 from data_transformer import create_transformer, DataTransformer
 from bigquery_uploader import create_uploader, BigQueryUploader
+from client_pool import ClientPool, get_client_pool
 from email_notifier import send_backup_notification
 
+# 預檢（連線測試）成功結果的行程層級快取：(Ragic 帳號, GCP 專案) → (成功時間, 客戶端池世代)
+_preflight_cache: Dict[Tuple[str, str], Tuple[float, Optional[int]]] = {}
+_preflight_cache_lock = threading.Lock()
+
+
+def clear_preflight_cache() -> None:
+    """清除預檢結果快取"""
+    with _preflight_cache_lock:
+        _preflight_cache.clear()
+
 
 class ERPBackupManager:
     """ERP 資料備份管理器"""
@@ -41,6 +57,31 @@ class ERPBackupManager:
         """
         self.config = config
         self.ragic_client: Optional[RagicClient] = None
+        # 暖啟動時跨呼叫共用的客戶端池（REUSE_CLIENTS=true 時啟用）
+        self.client_pool: Optional[ClientPool] = None
+        if config.get('reuse_clients'):
+            self.client_pool = get_client_pool(max_age_seconds=config.get('client_max_age_seconds', 21600))
+        # 同步/非同步 Ragic 客戶端共用的速率限制器
+        rate_per_second = float(config.get('ragic_rate_limit_rps', 2.0))
+        burst = int(config.get('ragic_rate_limit_burst', 2))
+        if self.client_pool:
+            self.rate_limiter = self.client_pool.get_rate_limiter(rate_per_second, burst)
+        else:
+            self.rate_limiter = create_rate_limiter(rate_per_second=rate_per_second, burst=burst)
+        # 每表分頁大小自動調整（學到的 limit 依表單持久化）
+        self.page_size_controller: Optional[AdaptivePageSizeController] = None
+        if config.get('ragic_adaptive_page_size'):
+            state_store = self._create_page_size_store()
+            if self.client_pool:
+                self.page_size_controller = self.client_pool.get_page_size_controller(
+                    config.get('ragic_timeout', 30), config.get('ragic_page_size_state_file'), state_store
+                )
+            else:
+                self.page_size_controller = create_page_size_controller(
+                    timeout=config.get('ragic_timeout', 30),
+                    state_file=config.get('ragic_page_size_state_file'),
+                    state_store=state_store
+                )
         self.transformer: Optional[DataTransformer] = None
         self.uploader: Optional[BigQueryUploader] = None
 
@@ -52,6 +93,20 @@ class ERPBackupManager:
 
         logging.info("ERP 備份管理器初始化完成")
 
+    def _create_page_size_store(self) -> Optional[BigQueryPageSizeStore]:
+        """分頁大小持久化至 BigQuery 時建立儲存（客戶端延遲到第一次讀寫才取得）；使用本機檔案時回傳 None"""
+        project_id = self.config.get('gcp_project_id')
+        if self.config.get('ragic_page_size_state_store', 'bigquery') != 'bigquery' or not project_id:
+            return None
+        table_ref = f"{project_id}.{self.config.get('ragic_page_size_state_table', 'ragic_backup.ragic_page_size_state')}"
+
+        def client_factory() -> bigquery.Client:
+            if self.client_pool:
+                return self.client_pool.get_bigquery_client(project_id)
+            return bigquery.Client(project=project_id)
+
+        return BigQueryPageSizeStore(client_factory, table_ref)
+
     def _setup_logging(self):
         """設定日誌格式"""
         log_level = self.config.get('log_level', 'INFO').upper()
@@ -67,33 +122,56 @@ class ERPBackupManager:
             ]
         )
 
-    def _diagnose_egress(self) -> Dict[str, Any]:
+    def _diagnose_egress(self, deadline: Optional[float] = None) -> Dict[str, Any]:
         """
-        最小對外診斷：google.com、api.ipify.org、Ragic base。
+        最小對外診斷：google.com、api.ipify.org、Ragic base（同時進行）。
         回傳各目標之狀態碼/逾時與耗時，並寫入日誌。
+
+        Args:
+            deadline: 整體期限（time.monotonic()）；未完成的目標記為逾時
         """
         targets = [
             ("google", "https://www.google.com", 5, {}),
             ("ipify", "https://api.ipify.org", 5, {}),
             ("ragic_base", f"https://ap6.ragic.com/{self.config.get('ragic_account','')}", 15, {}),
         ]
-        out: Dict[str, Any] = {}
-        sess = requests.Session()
+        if deadline is None:
+            deadline = time.monotonic() + max(to for _, _, to, _ in targets)
         # 若提供金鑰，附上 header（Ragic base 不一定需要，但不影響）
+        headers = {}
         ak = self.config.get('ragic_api_key')
         if ak:
-            sess.headers['Authorization'] = f'Basic {ak}'
-        for name, url, to, params in targets:
+            headers['Authorization'] = f'Basic {ak}'
+
+        def _probe(name: str, url: str, to: float, params: Dict[str, Any]) -> Dict[str, Any]:
             t0 = time.time()
             try:
-                r = sess.get(url, params=params, timeout=to)
+                r = requests.get(url, params=params, headers=headers, timeout=to)
                 dt = round(time.time() - t0, 3)
-                out[name] = {"ok": True, "status": r.status_code, "elapsed_s": dt}
                 logging.info(f"egress diag {name}: {url} -> {r.status_code} in {dt}s")
+                return {"ok": True, "status": r.status_code, "elapsed_s": dt}
             except Exception as e:
                 dt = round(time.time() - t0, 3)
-                out[name] = {"ok": False, "error": str(e), "elapsed_s": dt}
                 logging.error(f"egress diag {name} error: {e} ({url}) in {dt}s")
+                return {"ok": False, "error": str(e), "elapsed_s": dt}
+
+        out: Dict[str, Any] = {}
+        executor = ThreadPoolExecutor(max_workers=len(targets))
+        try:
+            remaining = max(deadline - time.monotonic(), 0.1)
+            futures = {
+                name: executor.submit(_probe, name, url, min(to, remaining), params)
+                for name, url, to, params in targets
+            }
+            wait(futures.values(), timeout=remaining)
+            for name, future in futures.items():
+                if future.done():
+                    out[name] = future.result()
+                else:
+                    out[name] = {"ok": False, "error": "超過預檢期限", "elapsed_s": round(remaining, 3)}
+                    logging.error(f"egress diag {name} error: 超過預檢期限")
+        finally:
+            executor.shutdown(wait=False)
         return out
 
     def _validate_config(self):
@@ -121,12 +199,24 @@ class ERPBackupManager:
         """初始化所有客戶端"""
         try:
             # 初始化 Ragic 客戶端
-            self.ragic_client = RagicClient(
-                api_key=self.config['ragic_api_key'],
-                account=self.config['ragic_account'],
-                timeout=self.config.get('ragic_timeout', 30),
-                max_retries=self.config.get('ragic_max_retries', 3)
-            )
+            if self.client_pool:
+                self.ragic_client = self.client_pool.get_ragic_client(
+                    api_key=self.config['ragic_api_key'],
+                    account=self.config['ragic_account'],
+                    timeout=self.config.get('ragic_timeout', 30),
+                    max_retries=self.config.get('ragic_max_retries', 3),
+                    pool_maxsize=self.config.get('ragic_prefetch_pages', 1),
+                    rate_limiter=self.rate_limiter
+                )
+            else:
+                self.ragic_client = RagicClient(
+                    api_key=self.config['ragic_api_key'],
+                    account=self.config['ragic_account'],
+                    timeout=self.config.get('ragic_timeout', 30),
+                    max_retries=self.config.get('ragic_max_retries', 3),
+                    pool_maxsize=self.config.get('ragic_prefetch_pages', 1),
+                    rate_limiter=self.rate_limiter
+                )
 
             # 初始化資料轉換器（單表流程需帶入正確 sheet_code，避免預設為 99）
             sheet_code_cfg = self.config.get('sheet_code')
@@ -140,13 +230,24 @@ class ERPBackupManager:
                             break
                 except Exception:
                     pass
-            self.transformer = create_transformer(sheet_code=sheet_code_cfg or '99')
+            self.transformer = create_transformer(
+                sheet_code=sheet_code_cfg or '99',
+                **self._get_transformer_options(sheet_code_cfg or '99')
+            )
 
             # 初始化 BigQuery 上傳器
-            self.uploader = create_uploader(
-                project_id=self.config['gcp_project_id'],
-                location=self.config.get('bigquery_location', 'US')
-            )
+            if self.client_pool:
+                self.uploader = self.client_pool.get_uploader(
+                    self.config['gcp_project_id'],
+                    self.config.get('bigquery_location', 'US'),
+                    **self._get_uploader_options()
+                )
+            else:
+                self.uploader = create_uploader(
+                    project_id=self.config['gcp_project_id'],
+                    location=self.config.get('bigquery_location', 'US'),
+                    **self._get_uploader_options()
+                )
 
             logging.info("所有客戶端初始化完成")
 
@@ -154,30 +255,151 @@ class ERPBackupManager:
             logging.error(f"客戶端初始化失敗: {e}")
             raise
 
-    def test_connections(self) -> Dict[str, bool]:
+    def _get_uploader_options(self) -> Dict[str, Any]:
+        """上傳器設定（載入檔格式、Storage Write API、目標表分區與叢集、預儲程序自動部署、中繼資料快取、row_hash 欄位）"""
+        return {
+            'load_format': self.config.get('bigquery_load_format', 'json'),
+            'storage_write_stream': self.config.get('storage_write_stream', 'pending'),
+            'storage_write_endpoint': self.config.get('storage_write_endpoint'),
+            'partition_field': self.config.get('bigquery_partition_field'),
+            'cluster_fields': tuple(self.config.get('bigquery_cluster_fields') or ()),
+            'merge_sp_auto_deploy': self.config.get('merge_sp_auto_deploy', False),
+            'metadata_cache_ttl': self.config.get('bigquery_metadata_cache_ttl', 0),
+            'include_row_hash': self.config.get('transform_row_hash', False),
+        }
+
+    def _create_job_manager(self) -> Optional[Any]:
+        """
+        多表上傳的工作協調器（BIGQUERY_CONCURRENT_JOBS > 1 且為直送 MERGE 時）；否則回傳 None，逐表同步上傳
+        """
+        max_jobs = self.config.get('bigquery_concurrent_jobs', 1)
+        mode = (self.config.get('upload_mode') or 'auto').lower()
+        if (max_jobs <= 1 or self.config.get('test_fetch_only') or not self.config.get('use_merge', True)
+                or mode not in ('auto', 'direct') or self.config.get('merge_sp_auto_deploy')):
+            return None
+        from bigquery_job_manager import BigQueryJobManager
+        return BigQueryJobManager(
+            max_concurrent_jobs=max_jobs,
+            poll_interval=self.config.get('bigquery_job_poll_interval', 0.5),
+            max_poll_interval=self.config.get('bigquery_job_max_poll_interval', 8.0),
+        )
+
+    def _latest_sync_timestamp(self, transformed: List[Dict[str, Any]], field_names: List[str]) -> Optional[datetime]:
+        """找出這批資料中最新的時間戳（每筆取第一個有效的時間欄位）"""
+        latest = None
+        for record in transformed:
+            for field_name in field_names:
+                if field_name in record and record[field_name]:
+                    dt = self.ragic_client._parse_dt(record[field_name])
+                    if dt and (latest is None or dt > latest):
+                        latest = dt
+                        break # 找到一個有效時間就跳出內層循環
+        return latest
+
+    def test_connections(self, deadline: Optional[float] = None) -> Dict[str, bool]:
         """
         測試所有連線
 
+        Args:
+            deadline: 整體期限（time.monotonic()）；未完成的測試視為失敗
+
         Returns:
             Dict[str, bool]: 各服務的連線狀態
         """
-        results = {}
-
-        # 測試 Ragic 連線
-        if self.ragic_client:
-            results['ragic'] = self.ragic_client.test_connection()
-        else:
-            results['ragic'] = False
-
-        # 測試 BigQuery 連線
-        if self.uploader:
-            results['bigquery'] = self.uploader.test_connection()
-        else:
-            results['bigquery'] = False
+        results = self._check_connections(deadline)
+
+        # 共用客戶端的健康檢查：失敗者重建後再測一次
+        if self.client_pool and not all(results.values()):
+            failed = [k for k, v in results.items() if not v]
+            logging.warning(f"共用客戶端連線測試失敗（{', '.join(failed)}），重建後重試")
+            if 'ragic' in failed:
+                self.client_pool.invalidate('ragic_client')
+            if 'bigquery' in failed:
+                self.client_pool.invalidate('bigquery_client', 'uploader')
+            self.initialize_clients()
+            results = self._check_connections(deadline)
 
         logging.info(f"連線測試結果: {results}")
         return results
 
+    def _check_connections(self, deadline: Optional[float] = None) -> Dict[str, bool]:
+        """同時測試 Ragic 與 BigQuery 連線（超過期限者視為失敗）"""
+        checks = {
+            # 測試 Ragic 連線
+            'ragic': self.ragic_client.test_connection if self.ragic_client else None,
+            # 測試 BigQuery 連線
+            'bigquery': self.uploader.test_connection if self.uploader else None,
+        }
+        results: Dict[str, bool] = {name: False for name in checks}
+        executor = ThreadPoolExecutor(max_workers=len(checks))
+        try:
+            futures = {name: executor.submit(check) for name, check in checks.items() if check}
+            timeout = max(deadline - time.monotonic(), 0) if deadline is not None else None
+            wait(futures.values(), timeout=timeout)
+            for name, future in futures.items():
+                if future.done():
+                    results[name] = bool(future.result())
+                else:
+                    logging.error(f"{name} 連線測試超過預檢期限")
+        finally:
+            executor.shutdown(wait=False)
+        return results
+
+    def _run_preflight(self, include_diagnostics: bool = True) -> Tuple[Dict[str, bool], Optional[Dict[str, Any]]]:
+        """
+        預檢：初始化客戶端並測試連線，對外診斷依 EGRESS_DIAGNOSTICS 決定
+
+        - always：診斷與客戶端初始化、連線測試同時進行
+        - on_failure：僅在連線測試失敗時診斷
+        - off：不診斷
+        連線測試成功的結果在暖啟動實例上快取 PREFLIGHT_CACHE_TTL 秒，期間略過測試；
+        共用客戶端池在快取後曾重建客戶端時不沿用，重新測試。
+
+        Args:
+            include_diagnostics: 是否執行對外診斷
+
+        Returns:
+            Tuple[各服務的連線狀態, 對外診斷結果（未執行為 None）]
+        """
+        deadline = time.monotonic() + float(self.config.get('preflight_timeout', 15))
+        mode = self.config.get('egress_diagnostics', 'on_failure') if include_diagnostics else 'off'
+        cache_ttl = float(self.config.get('preflight_cache_ttl', 0))
+        cache_key = (self.config.get('ragic_account', ''), self.config.get('gcp_project_id', ''))
+
+        diagnostics_executor: Optional[ThreadPoolExecutor] = None
+        diagnostics_future = None
+        if mode == 'always':
+            diagnostics_executor = ThreadPoolExecutor(max_workers=1)
+            diagnostics_future = diagnostics_executor.submit(self._diagnose_egress, deadline)
+
+        try:
+            # 初始化所有客戶端
+            self.initialize_clients()
+
+            # 共用客戶端在快取後曾建立、重建或失效時，快取結果不適用於目前的客戶端
+            generation = self.client_pool.generation if self.client_pool else None
+            with _preflight_cache_lock:
+                cached = _preflight_cache.get(cache_key)
+            if (cache_ttl > 0 and cached is not None and cached[1] == generation
+                    and time.monotonic() - cached[0] < cache_ttl):
+                connections = {'ragic': True, 'bigquery': True}
+                logging.info(f"沿用 {time.monotonic() - cached[0]:.0f} 秒前的連線測試結果: {connections}")
+            else:
+                # 測試連線（共用客戶端失敗時於 test_connections 內重建後重試）
+                connections = self.test_connections(deadline)
+                if cache_ttl > 0 and all(connections.values()):
+                    generation = self.client_pool.generation if self.client_pool else None
+                    with _preflight_cache_lock:
+                        _preflight_cache[cache_key] = (time.monotonic(), generation)
+        finally:
+            diagnostics = diagnostics_future.result() if diagnostics_future else None
+            if diagnostics_executor:
+                diagnostics_executor.shutdown(wait=False)
+
+        if mode == 'on_failure' and not all(connections.values()):
+            diagnostics = self._diagnose_egress(time.monotonic() + float(self.config.get('preflight_timeout', 15)))
+        return connections, diagnostics
+
     
 
     
@@ -187,6 +409,15 @@ class ERPBackupManager:
         if not self.ragic_client:
             raise Exception("Ragic 客戶端未初始化")
 
+        fetch_kwargs = self._build_since_fetch_kwargs(sheet_id, last_sync_time, last_modified_names, limit, max_pages)
+        data = self.ragic_client.fetch_since_local_paged(**fetch_kwargs)
+        if self.page_size_controller:
+            self.page_size_controller.save()
+        logging.info(f"[fetch_ragic_data_for_sheet] [{sheet_id}] 取得 {len(data)} 筆（local paged incremental）")
+        return data
+
+    def _build_since_fetch_kwargs(self, sheet_id: str, last_sync_time: datetime, last_modified_names: Optional[List[str]] = None, limit: Optional[int] = None, max_pages: Optional[int] = None) -> Dict[str, Any]:
+        """解析時間欄位、分頁設定與上界，組出 fetch_since_local_paged 的參數（同步/非同步共用）。"""
         logging.info(f"[fetch_ragic_data_for_sheet] 開始處理 {sheet_id}")
         logging.info(f"[fetch_ragic_data_for_sheet] last_sync_time 輸入: {last_sync_time.isoformat()}") # Log isoformat
 
@@ -196,7 +427,7 @@ class ERPBackupManager:
 
         # 如果 last_sync_time 是 None (不應該發生，但作為防禦性編程)
         if since_dt is None:
-            since_dt = datetime.datetime.now(timezone.utc) - datetime.timedelta(days=7)
+            since_dt = datetime.now(timezone.utc) - timedelta(days=7)
             logging.warning(f"[fetch_ragic_data_for_sheet] last_sync_time 為空，使用預設一週前 (UTC): {since_dt.isoformat()}")
 
         # 欄位名稱清單（優先順序：參數 > sheet_id配置 > 環境變數 > 預設值）
@@ -224,6 +455,9 @@ class ERPBackupManager:
         default_limit = self.config.get('ragic_page_size', 1000)
         per_sheet_boost = {'forms8/17': 3000, 'forms8/2': 3000, 'forms8/3': 3000}
         lim = limit if isinstance(limit, int) and limit > 0 else per_sheet_boost.get(sheet_id, default_limit)
+        if self.page_size_controller and not (isinstance(limit, int) and limit > 0):
+            # 已學到的 limit 優先於預設值
+            lim = self.page_size_controller.get_limit(sheet_id, lim)
         maxp = int(max_pages) if isinstance(max_pages, int) and max_pages else int(self.config.get('ragic_max_pages', 50))
         logging.info(f"[fetch_ragic_data_for_sheet] 分頁設定: limit={lim}, max_pages={maxp}")
 
@@ -233,7 +467,7 @@ class ERPBackupManager:
         fud = os.environ.get('FORCE_UNTIL_DAYS')
         if fui:
             try:
-                until_dt = datetime.datetime.fromisoformat(fui.replace('Z', '+00:00')).replace(tzinfo=None)
+                until_dt = datetime.fromisoformat(fui.replace('Z', '+00:00')).replace(tzinfo=None)
                 logging.info(f"[fetch_ragic_data_for_sheet] 使用 FORCE_UNTIL_ISO: {until_dt.strftime('%Y-%m-%d %H:%M:%S')}")
             except Exception:
                 logging.warning(f"FORCE_UNTIL_ISO 非法，忽略: {fui}")
@@ -241,22 +475,43 @@ class ERPBackupManager:
             try:
                 d = int(fud)
                 # 使用台北時間
-                until_dt = datetime.datetime.now(timezone.utc) - datetime.timedelta(days=d)
+                until_dt = datetime.now(timezone.utc) - timedelta(days=d)
                 logging.info(f"[fetch_ragic_data_for_sheet] 使用 FORCE_UNTIL_DAYS（台北時間）: {until_dt.strftime('%Y-%m-%d %H:%M:%S')}")
             except Exception:
                 logging.warning(f"FORCE_UNTIL_DAYS 非法，忽略: {fud}")
 
-        data = self.ragic_client.fetch_since_local_paged(
-            sheet_id=sheet_id,
-            since_dt=since_dt,
-            last_modified_field_names=names,
-            until_dt=until_dt,
-            limit=lim,
-            max_pages=maxp,
-            no_new_data_pages_threshold=self.config.get('ragic_no_new_data_pages_threshold')
-        )
-        logging.info(f"[fetch_ragic_data_for_sheet] [{sheet_id}] 取得 {len(data)} 筆（local paged incremental）")
-        return data
+        return {
+            'sheet_id': sheet_id,
+            'since_dt': since_dt,
+            'last_modified_field_names': names,
+            'until_dt': until_dt,
+            'limit': lim,
+            'max_pages': maxp,
+            'no_new_data_pages_threshold': self.config.get('ragic_no_new_data_pages_threshold'),
+            'prefetch_pages': self.config.get('ragic_prefetch_pages', 1),
+            'page_size_controller': self.page_size_controller,
+            'pagination': self.config.get('ragic_pagination', 'offset'),
+            'strategy': self.config.get('ragic_incremental_strategy', 'ragic_id_asc'),
+            'locate_field': self._get_locate_field(sheet_id)
+        }
+
+    def _get_locate_field(self, sheet_id: str) -> Optional[str]:
+        """啟用起始 offset 定位器時，回傳該表的建立時間欄位（未配置則為 None）"""
+        if not self.config.get('ragic_start_offset_locator'):
+            return None
+        from sheet_time_field_config import SHEET_ID_MAP, get_creation_time_field_for_sheet
+        for code, sid in SHEET_ID_MAP.items():
+            if sid == sheet_id:
+                return get_creation_time_field_for_sheet(code)
+        return None
+
+    def _get_transformer_options(self, sheet_code: str) -> Dict[str, Any]:
+        """依設定決定表單的平行轉換參數與是否計算 row_hash"""
+        return {
+            'parallel_workers': self.config.get('transform_parallel_workers', 1),
+            'parallel_min_rows': self.config.get('transform_parallel_min_rows', 100000),
+            'compute_row_hash': self.config.get('transform_row_hash', False),
+        }
 
     def transform_data(self, ragic_data: list) -> list:
         """
@@ -326,7 +581,9 @@ class ERPBackupManager:
                     transformed_data,
                     self.config['bigquery_dataset'],
                     self.config['bigquery_table'],
-                    batch_size
+                    batch_size,
+                    coalesce=self.config.get('upload_coalesce', False),
+                    load_workers=self.config.get('upload_load_workers', 1)
                 )
 
                 # 彙總結果
@@ -362,7 +619,10 @@ class ERPBackupManager:
 
     def _write_run_result(self, agg_id: Optional[str], sheet_code: str, result: Dict[str, Any]) -> None:
         try:
-            client = bigquery.Client(project=self.config['gcp_project_id'])
+            if self.client_pool:
+                client = self.client_pool.get_bigquery_client(self.config['gcp_project_id'])
+            else:
+                client = bigquery.Client(project=self.config['gcp_project_id'])
             table = f"{self.config['gcp_project_id']}.erp_backup.run_results"
             details = (result.get('details') or [{}])
             d0 = details[0] if isinstance(details, list) and details else {}
@@ -406,13 +666,8 @@ class ERPBackupManager:
         }
 
         try:
-            # 先做對外診斷，協助釐清雲端連線狀況
-            diagnostics = self._diagnose_egress()
-            # 初始化所有客戶端
-            self.initialize_clients()
-
-            # 測試連線
-            connections = self.test_connections()
+            # 初始化客戶端並測試連線（對外診斷協助釐清雲端連線狀況）
+            connections, diagnostics = self._run_preflight()
             if not all(connections.values()):
                 failed_services = [k for k, v in connections.items() if not v]
                 raise Exception(f"服務連線失敗: {', '.join(failed_services)}")
@@ -431,7 +686,7 @@ class ERPBackupManager:
 
             if not ragic_data:
                 logging.info("Ragic 無新資料需要備份")
-                end_time = datetime.datetime.now(timezone.utc)
+                end_time = datetime.now(timezone.utc)
                 result = {
                     "status": "no_data",
                     "message": "Ragic 無新資料可以備份",
@@ -469,8 +724,8 @@ class ERPBackupManager:
                 result = {
                     "status": "no_valid_data",
                     "start_time": start_time.isoformat(),
-                    "end_time": datetime.datetime.now(timezone.utc).isoformat(),
-                    "duration_seconds": (datetime.datetime.now(timezone.utc) - start_time).total_seconds(),
+                    "end_time": datetime.now(timezone.utc).isoformat(),
+                    "duration_seconds": (datetime.now(timezone.utc) - start_time).total_seconds(),
                     "records_fetched": len(ragic_data),
                     "records_processed": 0
                 }
@@ -498,7 +753,7 @@ class ERPBackupManager:
             upload_result = self.upload_to_bigquery(transformed_data)
 
             # 計算總耗時
-            end_time = datetime.datetime.now(timezone.utc)
+            end_time = datetime.now(timezone.utc)
             duration = (end_time - start_time).total_seconds()
 
             # 整合結果（單表）
@@ -550,7 +805,7 @@ class ERPBackupManager:
             return result
 
         except Exception as e:
-            end_time = datetime.datetime.now(timezone.utc)
+            end_time = datetime.now(timezone.utc)
             duration = (end_time - start_time).total_seconds()
             error_msg = f"備份失敗 - 耗時: {duration:.2f} 秒, 錯誤: {str(e)}"
             logging.error(error_msg)
@@ -622,6 +877,10 @@ class ERPBackupManager:
 
     def cleanup(self):
         """清理資源"""
+        if self.client_pool:
+            # 共用客戶端保留給下一次呼叫
+            logging.info("保留共用客戶端，資源清理略過")
+            return
         try:
             if self.ragic_client:
                 self.ragic_client.close()
@@ -671,6 +930,173 @@ class ERPBackupManager:
                 logging.warning(f"SHEET_MAP_FILE 載入失敗，使用預設對照: {e}")
         return default_map
 
+    def _resolve_sheet_since(self, sheet_code: str) -> datetime:
+        """決定單表的起始同步時間：若設 FORCE_SINCE_DAYS/ISO 則覆蓋 per-sheet；否則使用 per-sheet last sync。"""
+        force_iso = os.environ.get('FORCE_SINCE_ISO')
+        force_days = os.environ.get('FORCE_SINCE_DAYS')
+        ls: datetime # 確保 ls 是 datetime 物件
+
+        if force_iso:
+            ls = datetime.fromisoformat(force_iso.replace('Z', '+00:00')).astimezone(timezone.utc)
+        elif force_days:
+            days = int(force_days)
+            ls = datetime.now(timezone.utc) - timedelta(days=days)
+        else:
+            # 從 sheet_sync_state 獲取最後同步時間
+            ls = self.uploader.get_last_sync_timestamp_by_sheet(sheet_code)
+        return ls
+
+    def _use_ragic_where(self, sheet_id: str) -> Optional[Dict[str, Any]]:
+        """若 USE_RAGIC_WHERE=true，回傳伺服端 where 抓取參數（limit/where_field）；否則回傳 None。"""
+        use_where = os.environ.get('USE_RAGIC_WHERE', 'false').lower() == 'true'
+        if not use_where:
+            return None
+        # 直接用 fetch_data（where），限制 1 頁
+        per_limit = self.config.get('ragic_page_size', 1000)
+        # 允許提供每表 where 欄位（欄位 ID 或系統鍵）；預設 _ragicModified
+        per_sheet_where = {
+            'forms8/3': os.environ.get('RAGIC_WHERE_FIELD_99'),
+        }
+        wfield = per_sheet_where.get(sheet_id) or os.environ.get('RAGIC_WHERE_FIELD')
+        return {'limit': per_limit, 'where_field': wfield}
+
+    def _fetch_sheet_records(self, sheet_code: str, sheet_id: str, ls: datetime) -> List[Dict[str, Any]]:
+        """同步抓取單表增量資料（切換：若 USE_RAGIC_WHERE=true，改用伺服端 where 避免排序影響）"""
+        where_opts = self._use_ragic_where(sheet_id)
+        if where_opts:
+            # fetch_data 期望 Ragic 格式字串
+            return self.ragic_client.fetch_data(sheet_id, last_sync_time=ls.strftime('%Y/%m/%d %H:%M:%S'), limit=where_opts['limit'], max_pages=1, where_field=where_opts['where_field'])
+        return self.fetch_ragic_data_for_sheet(
+            sheet_id=sheet_id,
+            last_sync_time=ls,
+            last_modified_names=get_time_fields_for_sheet(sheet_code),
+            limit=None,
+            max_pages=None
+        )
+
+    def _stream_sheet(self, sheet_code: str, sheet_id: str, ls: datetime, last_modified_names: List[str]) -> Dict[str, int]:
+        """
+        串流處理單表：逐頁抓取（iter_pages_since），累積到 stream_chunk_rows 筆即轉換並上傳，
+        原始與轉換後資料不會整表留在記憶體。
+
+        全部區塊上傳成功後才以各區塊最新的時間戳更新 sheet_sync_state；任一區塊失敗即拋出例外
+        （已上傳的區塊於下次執行重抓，由 MERGE 去重）。
+
+        Returns:
+            Dict: fetched / uploaded / invalid 筆數
+        """
+        chunk_rows = max(1, int(self.config.get('stream_chunk_rows', 0)))
+        transformer = create_transformer(
+            sheet_code=sheet_code,
+            project_id=self.config['gcp_project_id'],
+            use_dynamic_mapping=False,
+            **self._get_transformer_options(sheet_code)
+        )
+        fetch_kwargs = self._build_since_fetch_kwargs(sheet_id, ls, last_modified_names)
+        fetched = 0
+        uploaded = 0
+        chunks = 0
+        latest: Optional[datetime] = None
+        buffer: List[Dict[str, Any]] = []
+
+        def flush() -> None:
+            nonlocal uploaded, chunks, latest, buffer
+            transformed = transformer.transform_data(buffer)
+            buffer = []
+            if not transformed:
+                return
+            up_res = self.uploader.upload_data(
+                data=transformed,
+                dataset_id=self.config['bigquery_dataset'],
+                table_id=self.config['bigquery_table'],
+                use_merge=self.config.get('use_merge', False),
+                upload_mode=self.config.get('upload_mode', 'direct')
+            )
+            if up_res.get('status') != 'success':
+                raise Exception(f"第 {chunks + 1} 個區塊上傳失敗: {up_res.get('error') or up_res.get('message') or up_res.get('status')}")
+            chunks += 1
+            uploaded += up_res.get('records_processed', len(transformed))
+            chunk_latest = self._latest_sync_timestamp(transformed, last_modified_names)
+            if chunk_latest and (latest is None or chunk_latest > latest):
+                latest = chunk_latest
+
+        try:
+            for page in self.ragic_client.iter_pages_since(**fetch_kwargs):
+                buffer.extend(page)
+                fetched += len(page)
+                if len(buffer) >= chunk_rows:
+                    flush()
+            if buffer:
+                flush()
+        finally:
+            if self.page_size_controller:
+                self.page_size_controller.save()
+
+        logging.info(f"[Sheet {sheet_code}] 串流處理完成：抓取 {fetched} 筆，分 {chunks} 個區塊上傳 {uploaded} 筆")
+        if latest:
+            self.uploader.update_sync_timestamp(sheet_code, latest)
+        elif uploaded:
+            logging.warning(f"未能在上傳資料中找到有效時間戳來更新 sheet_sync_state ({sheet_code})")
+        invalid = len(transformer.get_invalid_records()) if hasattr(transformer, 'get_invalid_records') else 0
+        return {'fetched': fetched, 'uploaded': uploaded, 'invalid': invalid}
+
+    def fetch_all_sheets_async(self, sheets: Dict[str, str]) -> Dict[str, Any]:
+        """
+        以 asyncio 同時抓取多張表（全域併發上限 ragic_async_concurrency），
+        讓抓取階段耗時接近最慢的一張表，而非所有表的總和。
+
+        Returns:
+            Dict[sheet_code, (last_sync_used, records 或 Exception)]；
+            無法決定起始時間的表不列入，交由同步流程處理。
+        """
+        plan: Dict[str, Any] = {}
+        for sheet_code, sheet_id in sheets.items():
+            try:
+                plan[sheet_code] = (sheet_id, self._resolve_sheet_since(sheet_code))
+            except Exception as e:
+                logging.warning(f"[Sheet {sheet_code}] 無法決定起始時間，改由同步流程處理: {e}")
+
+        # 延遲匯入：未啟用非同步模式時不載入 httpx
+        from async_ragic_client import AsyncRagicClient
+
+        async def _run() -> Dict[str, Any]:
+            client = AsyncRagicClient(
+                api_key=self.config['ragic_api_key'],
+                account=self.config['ragic_account'],
+                timeout=self.config.get('ragic_timeout', 30),
+                max_retries=self.config.get('ragic_max_retries', 3),
+                max_concurrency=self.config.get('ragic_async_concurrency', 4),
+                rate_limiter=self.rate_limiter
+            )
+
+            async def _one(sheet_code: str, sheet_id: str, ls: datetime):
+                where_opts = self._use_ragic_where(sheet_id)
+                if where_opts:
+                    return await client.fetch_data(sheet_id, last_sync_time=ls.strftime('%Y/%m/%d %H:%M:%S'), limit=where_opts['limit'], max_pages=1, where_field=where_opts['where_field'])
+                fetch_kwargs = self._build_since_fetch_kwargs(sheet_id, ls, get_time_fields_for_sheet(sheet_code))
+                return await client.fetch_since_local_paged(**fetch_kwargs)
+
+            try:
+                codes = list(plan.keys())
+                results = await asyncio.gather(
+                    *(_one(code, plan[code][0], plan[code][1]) for code in codes),
+                    return_exceptions=True
+                )
+            finally:
+                await client.close()
+            return {code: (plan[code][1], res) for code, res in zip(codes, results)}
+
+        t0 = time.time()
+        try:
+            fetched = asyncio.run(_run())
+        except Exception as e:
+            logging.warning(f"非同步抓取失敗，改用逐表同步抓取: {e}")
+            return {}
+        logging.info(f"非同步抓取 {len(fetched)} 張表完成，耗時 {time.time() - t0:.2f} 秒")
+        if self.page_size_controller:
+            self.page_size_controller.save()
+        return fetched
+
     def run_backup_all_sheets(self) -> Dict[str, Any]:
         """多表流程：依固定 9 張表（或環境變數提供）進行一週增量抓取、轉換、上傳並彙總。"""
         start_time = datetime.now(timezone.utc)
@@ -687,8 +1113,7 @@ class ERPBackupManager:
 
         # 連線與最後同步時間
         try:
-            self.initialize_clients()
-            connections = self.test_connections()
+            connections, _ = self._run_preflight(include_diagnostics=False)
             if not all(connections.values()):
                 failed_services = [k for k, v in connections.items() if not v]
                 raise Exception(f"服務連線失敗: {', '.join(failed_services)}")
@@ -700,22 +1125,22 @@ class ERPBackupManager:
             details: List[Dict[str, Any]] = []
             all_fetched_records: Dict[str, List[Dict[str, Any]]] = {} # 儲存原始抓取到的記錄
 
+            # 非同步模式：先同時抓取所有表，再逐表轉換與上傳
+            prefetched: Dict[str, Any] = {}
+            # 並行上傳：各表的載入/MERGE/同步狀態更新交由工作協調器，轉換完即送出而不等待完成
+            job_manager = self._create_job_manager()
+            pending_uploads: Dict[str, Dict[str, Any]] = {}
+            if self.config.get('ragic_async_fetch'):
+                prefetched = self.fetch_all_sheets_async(sheets)
+            # 串流模式（STREAM_CHUNK_ROWS > 0）：僅用於逐表同步上傳，並行上傳與測試抓取仍整表處理
+            stream_sheets = (self.config.get('stream_chunk_rows', 0) > 0 and job_manager is None
+                             and not self.config.get('test_fetch_only'))
+
             # 逐表處理
             for sheet_code, sheet_id in sheets.items():
                 try:
-                    # 規則：若設 FORCE_SINCE_DAYS/ISO 則覆蓋 per-sheet；否則使用 per-sheet last sync。
-                    force_iso = os.environ.get('FORCE_SINCE_ISO')
-                    force_days = os.environ.get('FORCE_SINCE_DAYS')
-                    ls: datetime.datetime # 確保 ls 是 datetime 物件
-
-                    if force_iso:
-                        ls = datetime.datetime.fromisoformat(force_iso.replace('Z', '+00:00')).astimezone(timezone.utc)
-                    elif force_days:
-                        days = int(force_days)
-                        ls = datetime.datetime.now(timezone.utc) - datetime.timedelta(days=days)
-                    else:
-                        # 從 sheet_sync_state 獲取最後同步時間
-                        ls = self.uploader.get_last_sync_timestamp_by_sheet(sheet_code)
+                    # 非同步階段已抓取者直接取用（records 可能為例外物件）
+                    ls, records = prefetched.get(sheet_code) or (self._resolve_sheet_since(sheet_code), None)
 
                     logging.info(f"[Sheet {sheet_code}] 使用的最後同步時間 (UTC): {ls.isoformat()}")
 
@@ -723,26 +1148,26 @@ class ERPBackupManager:
                     last_modified_names_for_sheet = get_time_fields_for_sheet(sheet_code)
                     logging.info(f"[Sheet {sheet_code}] 使用的時間欄位: {last_modified_names_for_sheet}")
 
-                    # 切換：若 USE_RAGIC_WHERE=true，改用伺服端 where（避免排序影響）
-                    use_where = os.environ.get('USE_RAGIC_WHERE', 'false').lower() == 'true'
-                    if use_where:
-                        # 直接用 fetch_data（where），限制 1 頁
-                        per_limit = self.config.get('ragic_page_size', 1000)
-                        # 允許提供每表 where 欄位（欄位 ID 或系統鍵）；預設 _ragicModified
-                        per_sheet_where = {
-                            'forms8/3': os.environ.get('RAGIC_WHERE_FIELD_99'),
+                    if isinstance(records, Exception):
+                        raise records
+                    if records is None and stream_sheets and not self._use_ragic_where(sheet_id):
+                        # 串流模式：逐頁抓取、分區塊轉換與上傳
+                        streamed = self._stream_sheet(sheet_code, sheet_id, ls, last_modified_names_for_sheet)
+                        total_uploaded += streamed['uploaded']
+                        total_invalid += streamed['invalid']
+                        detail = {
+                            'sheet_code': sheet_code,
+                            'sheet_name': sheet_code,
+                            'last_sync_used': ls.isoformat(),
+                            **streamed
                         }
-                        wfield = per_sheet_where.get(sheet_id) or os.environ.get('RAGIC_WHERE_FIELD')
-                        # fetch_data 期望 Ragic 格式字串
-                        records = self.ragic_client.fetch_data(sheet_id, last_sync_time=ls.strftime('%Y/%m/%d %H:%M:%S'), limit=per_limit, max_pages=1, where_field=wfield)
-                    else:
-                        records = self.fetch_ragic_data_for_sheet(
-                            sheet_id=sheet_id,
-                            last_sync_time=ls,
-                            last_modified_names=last_modified_names_for_sheet,
-                            limit=None,
-                            max_pages=None
-                        )
+                        if not streamed['fetched']:
+                            logging.info(f"{sheet_code} 無新資料，跳過上傳（last_sync_used={ls.isoformat()})")
+                            detail.update({'skipped': True, 'reason': 'no_new_data'})
+                        details.append(detail)
+                        continue
+                    if records is None:
+                        records = self._fetch_sheet_records(sheet_code, sheet_id, ls)
 
                     # 如果是測試模式，只抓取資料並返回
                     if self.config.get('test_fetch_only'):
@@ -772,11 +1197,46 @@ class ERPBackupManager:
                         })
                         continue
 
-                    transformer = create_transformer(sheet_code=sheet_code, project_id=self.config['gcp_project_id'], use_dynamic_mapping=False)
+                    transformer = create_transformer(
+                        sheet_code=sheet_code,
+                        project_id=self.config['gcp_project_id'],
+                        use_dynamic_mapping=False,
+                        **self._get_transformer_options(sheet_code)
+                    )
                     transformed = transformer.transform_data(records)
 
                     uploaded = 0
                     invalid = len(transformer.get_invalid_records()) if hasattr(transformer, 'get_invalid_records') else 0
+                    merge_name = None
+                    if transformed and job_manager is not None:
+                        try:
+                            merge_name = self.uploader.submit_upload(
+                                job_manager, sheet_code, transformed,
+                                self.config['bigquery_dataset'], self.config['bigquery_table']
+                            )
+                        except Exception as submit_error:
+                            logging.warning(f"送出 BigQuery 工作失敗，改為同步上傳 ({sheet_code}): {submit_error}")
+                    if merge_name is not None:
+                        latest_timestamp_in_batch = self._latest_sync_timestamp(transformed, last_modified_names_for_sheet)
+                        if latest_timestamp_in_batch:
+                            job_manager.submit(
+                                f"sync:{sheet_code}",
+                                lambda code=sheet_code, ts=latest_timestamp_in_batch: self.uploader.start_sync_timestamp_update(code, ts),
+                                depends_on=[merge_name],
+                                exclusive='sheet_sync_state'
+                            )
+                        else:
+                            logging.warning(f"未能在上傳資料中找到有效時間戳來更新 sheet_sync_state ({sheet_code})")
+                        pending_uploads[sheet_code] = {
+                            'merge': merge_name,
+                            'fetched': len(records),
+                            'invalid': invalid,
+                            'last_sync_used': ls.isoformat(),
+                        }
+                        # 立即送出已就緒的工作，讓 BigQuery 在擷取下一張表時即開始處理
+                        job_manager.pump()
+                        continue
+
                     if transformed:
                         up_res = self.uploader.upload_data(
                             data=transformed,
@@ -790,20 +1250,24 @@ class ERPBackupManager:
                     # 成功上傳後，更新 sheet_sync_state
                         if up_res.get('status') == 'success':
                             # 找出這批資料中最新的時間戳
-                            latest_timestamp_in_batch = None
-                            for record in transformed:
-                                for field_name in last_modified_names_for_sheet:
-                                    if field_name in record and record[field_name]:
-                                        dt = self.ragic_client._parse_dt(record[field_name])
-                                        if dt and (latest_timestamp_in_batch is None or dt > latest_timestamp_in_batch):
-                                            latest_timestamp_in_batch = dt
-                                            break # 找到一個有效時間就跳出內層循環
+                            latest_timestamp_in_batch = self._latest_sync_timestamp(transformed, last_modified_names_for_sheet)
 
                             if latest_timestamp_in_batch:
                                 self.uploader.update_sync_timestamp(sheet_code, latest_timestamp_in_batch)
                             else:
                                 logging.warning(f"未能在上傳資料中找到有效時間戳來更新 sheet_sync_state ({sheet_code})")
 
+                    total_uploaded += uploaded
+                    total_invalid += invalid
+                    details.append({
+                        'sheet_code': sheet_code,
+                        'sheet_name': sheet_code,
+                        'uploaded': uploaded,
+                        'invalid': invalid,
+                        'fetched': len(records),
+                        'last_sync_used': ls.isoformat()
+                    })
+
                 except Exception as se:
                     logging.error(f"處理表 {sheet_code} 失敗: {se}")
                     details.append({
@@ -816,7 +1280,34 @@ class ERPBackupManager:
                         'error': str(se)
                     })
 
-            end_time = datetime.datetime.now(timezone.utc)
+            if job_manager is not None and job_manager.tasks:
+                logging.info(f"等待 {len(pending_uploads)} 張表的 BigQuery 工作完成")
+                tasks = job_manager.wait(timeout=self.config.get('bigquery_jobs_timeout') or None)
+                for sheet_code, pending in pending_uploads.items():
+                    merge_task = tasks[pending['merge']]
+                    sync_task = tasks.get(f"sync:{sheet_code}")
+                    detail = {
+                        'sheet_code': sheet_code,
+                        'sheet_name': sheet_code,
+                        'uploaded': 0,
+                        'invalid': pending['invalid'],
+                        'fetched': pending['fetched'],
+                        'last_sync_used': pending['last_sync_used'],
+                    }
+                    if merge_task.status == 'done':
+                        detail['uploaded'] = merge_task.result.get('records_processed', 0)
+                        detail['upload_result'] = merge_task.result
+                        total_uploaded += detail['uploaded']
+                        total_invalid += pending['invalid']
+                    else:
+                        detail['error'] = merge_task.error
+                    if sync_task is not None and sync_task.status != 'done':
+                        logging.error(f"更新 sheet_sync_state 失敗（{sheet_code}）: {sync_task.error}")
+                        detail['sync_state_error'] = sync_task.error
+                    details.append(detail)
+                logging.info(f"BigQuery 工作結果: {job_manager.summary()['counts']}")
+
+            end_time = datetime.now(timezone.utc)
             duration = (end_time - start_time).total_seconds()
 
             status = 'success' if total_uploaded > 0 else 'no_data'
@@ -837,7 +1328,7 @@ class ERPBackupManager:
                 return result
 
         except Exception as e:
-            end_time = datetime.datetime.now(timezone.utc)
+            end_time = datetime.now(timezone.utc)
             duration = (end_time - start_time).total_seconds()
             logging.error(f"多表備份失敗: {e}")
             return {
@@ -876,7 +1367,36 @@ def load_config_from_env() -> Dict[str, Any]:
         'ragic_page_size': int(os.environ.get('RAGIC_PAGE_SIZE', 1000)),
         'ragic_max_pages': int(os.environ.get('RAGIC_MAX_PAGES', 50)),
         'ragic_no_new_data_pages_threshold': int(os.environ.get('RAGIC_NO_NEW_DATA_PAGES_THRESHOLD', 2)),
+        # 分頁預抓：同時在途的分頁請求數（1 = 逐頁抓取）
+        'ragic_prefetch_pages': int(os.environ.get('RAGIC_PREFETCH_PAGES', 1)),
+        # 多表非同步抓取（需 httpx）與全域同時請求上限
+        'ragic_async_fetch': os.environ.get('RAGIC_ASYNC_FETCH', 'false').lower() == 'true',
+        'ragic_async_concurrency': int(os.environ.get('RAGIC_ASYNC_CONCURRENCY', 4)),
+        # Ragic 速率限制（token bucket：每秒請求數與突發量，所有呼叫端共用）
+        'ragic_rate_limit_rps': float(os.environ.get('RAGIC_RATE_LIMIT_RPS', 2.0)),
+        'ragic_rate_limit_burst': int(os.environ.get('RAGIC_RATE_LIMIT_BURST', 2)),
+        # 分頁大小自動調整（依每頁延遲/大小調整 limit）；學到的 limit 持久化至 BigQuery 表（bigquery，預設）或本機 state file（file）
+        'ragic_adaptive_page_size': os.environ.get('RAGIC_ADAPTIVE_PAGE_SIZE', 'false').lower() == 'true',
+        'ragic_page_size_state_store': os.environ.get('RAGIC_PAGE_SIZE_STATE_STORE', 'bigquery').lower(),
+        'ragic_page_size_state_table': os.environ.get('RAGIC_PAGE_SIZE_STATE_TABLE', 'ragic_backup.ragic_page_size_state'),
+        'ragic_page_size_state_file': os.environ.get('RAGIC_PAGE_SIZE_STATE_FILE', '/tmp/ragic_page_size_state.json'),
+        # 增量分頁方式：offset（預設）或 keyset（以最後 _ragicId 續抓，不支援時自動退回 offset）
+        'ragic_pagination': os.environ.get('RAGIC_PAGINATION', 'offset').lower(),
+        # 增量掃描策略：ragic_id_asc（預設）或 modified_desc（依 SHEET_TIME_FIELDS 的修改欄位遞減，遇到早於 since 的頁面即停止）
+        'ragic_incremental_strategy': os.environ.get('RAGIC_INCREMENTAL_STRATEGY', 'ragic_id_asc').lower(),
+        # 以建立時間欄位（SHEET_CREATION_TIME_FIELDS）二分搜尋增量起始 offset，而非從 offset 0 掃描
+        'ragic_start_offset_locator': os.environ.get('RAGIC_START_OFFSET_LOCATOR', 'false').lower() == 'true',
         'last_modified_field_names': os.environ.get('LAST_MODIFIED_FIELD_NAMES'),
+        # 多行程平行轉換：行程數（1 = 停用，0 = 依 CPU 核心數）與啟用門檻筆數
+        # scripts/benchmark_transform_parallel.py 量測（sheet 99）：20,000 筆單一行程 1.2 秒、4 行程 3.7 秒；
+        # 主行程 pickle 記錄與結果即需 1.5 秒，高於轉換本身（此部分不隨核心數縮短），5,000–100,000 筆皆未勝出，故預設停用。
+        # 僅在目標機器以該腳本量測到行程池勝出時才啟用，並將門檻設為量測到的交叉筆數
+        'transform_parallel_workers': int(os.environ.get('TRANSFORM_PARALLEL_WORKERS', 1)),
+        'transform_parallel_min_rows': int(os.environ.get('TRANSFORM_PARALLEL_MIN_ROWS', 100000)),
+        # 串流處理：每累積此筆數即轉換並上傳（0 = 整表抓取後再轉換上傳）
+        'stream_chunk_rows': int(os.environ.get('STREAM_CHUNK_ROWS', 0)),
+        # 列內容雜湊：MERGE 僅更新雜湊不同的列
+        'transform_row_hash': os.environ.get('TRANSFORM_ROW_HASH', 'false').lower() == 'true',
         # sheet 對照設定
         'sheet_map_json': os.environ.get('SHEET_MAP_JSON'),
         'sheet_map_file': os.environ.get('SHEET_MAP_FILE'),
@@ -885,13 +1405,42 @@ def load_config_from_env() -> Dict[str, Any]:
         'bigquery_dataset': os.environ.get('BIGQUERY_DATASET', 'your_dataset'),
         'bigquery_table': os.environ.get('BIGQUERY_TABLE', 'erp_backup'),
         'bigquery_location': os.environ.get('BIGQUERY_LOCATION', 'US'),
+        # 載入檔格式：json | parquet（需 pyarrow）| avro（需 fastavro；檔案與 parquet 相近，但序列化比 json 慢）
+        'bigquery_load_format': os.environ.get('BIGQUERY_LOAD_FORMAT', 'json').lower(),
+        # 目標表日期分區欄位與叢集欄位（如 created_at / order_id）；MERGE 依批次範圍裁切（僅 created_at、order_id 等值不會改變的欄位）
+        'bigquery_partition_field': os.environ.get('BIGQUERY_PARTITION_FIELD') or None,
+        'bigquery_cluster_fields': [f.strip() for f in os.environ.get('BIGQUERY_CLUSTER_FIELDS', '').split(',') if f.strip()],
+
+        # 預檢：整體期限（秒）、對外診斷模式（always | on_failure | off）、連線測試成功結果的快取秒數（0 = 不快取）
+        'preflight_timeout': float(os.environ.get('PREFLIGHT_TIMEOUT', 15)),
+        'egress_diagnostics': os.environ.get('EGRESS_DIAGNOSTICS', 'on_failure').lower(),
+        'preflight_cache_ttl': float(os.environ.get('PREFLIGHT_CACHE_TTL', 0)),
+
+        # 暖啟動共用客戶端（Ragic session、BigQuery 客戶端等跨呼叫沿用）與最長存活秒數
+        'reuse_clients': os.environ.get('REUSE_CLIENTS', 'false').lower() == 'true',
+        'client_max_age_seconds': int(os.environ.get('CLIENT_MAX_AGE_SECONDS', 21600)),
 
         'upload_batch_size': int(os.environ.get('UPLOAD_BATCH_SIZE', 1000)),
+        # 批次上傳合併為單一臨時表 + 一次 MERGE，與同時進行的載入工作數
+        'upload_coalesce': os.environ.get('UPLOAD_COALESCE', 'false').lower() == 'true',
+        'upload_load_workers': int(os.environ.get('UPLOAD_LOAD_WORKERS', 1)),
         'use_merge': os.environ.get('USE_MERGE', 'true').lower() == 'true',
         'upload_mode': os.environ.get('UPLOAD_MODE', 'auto'),
+        # UPLOAD_MODE=storage_write：Storage Write API 的 stream 類型（committed | pending）與自訂端點（本機假服務）
+        'storage_write_stream': os.environ.get('STORAGE_WRITE_STREAM', 'pending').lower(),
+        'storage_write_endpoint': os.environ.get('STORAGE_WRITE_ENDPOINT'),
         'batch_threshold': int(os.environ.get('BATCH_THRESHOLD', 5000)),
         'staging_table': os.environ.get('STAGING_TABLE'),
         'merge_sp_name': os.environ.get('MERGE_SP_NAME'),
+        # 依 schema 產生並部署 MERGE 預儲程序；啟用後 auto 模式不論筆數皆走 staging + 預儲程序
+        'merge_sp_auto_deploy': os.environ.get('MERGE_SP_AUTO_DEPLOY', 'false').lower() == 'true',
+        # 多表流程同時進行的 BigQuery 工作數（1 = 逐表同步上傳）、輪詢間隔與等待上限（0 = 不限）
+        'bigquery_concurrent_jobs': int(os.environ.get('BIGQUERY_CONCURRENT_JOBS', 1)),
+        'bigquery_job_poll_interval': float(os.environ.get('BIGQUERY_JOB_POLL_INTERVAL', 0.5)),
+        'bigquery_job_max_poll_interval': float(os.environ.get('BIGQUERY_JOB_MAX_POLL_INTERVAL', 8.0)),
+        'bigquery_jobs_timeout': float(os.environ.get('BIGQUERY_JOBS_TIMEOUT', 0)),
+        # 上傳器的資料集/資料表中繼資料快取秒數（0 表示每次讀取）
+        'bigquery_metadata_cache_ttl': float(os.environ.get('BIGQUERY_METADATA_CACHE_TTL', 0)),
         'log_level': os.environ.get('LOG_LEVEL', 'INFO'),
         # 近 N 天無新增則跳過（預設 7）
         'skip_if_no_recent_days': int(os.environ.get('SKIP_IF_NO_RECENT_DAYS', 7)),
@@ -1008,7 +1557,10 @@ def backup_erp_data(request):
         if mode and mode.upper() == 'AGGREGATE':
             try:
                 cfg = load_config_from_env()
-                bq = bigquery.Client(project=cfg['gcp_project_id'])
+                if cfg.get('reuse_clients'):
+                    bq = get_client_pool(cfg.get('client_max_age_seconds', 21600)).get_bigquery_client(cfg['gcp_project_id'])
+                else:
+                    bq = bigquery.Client(project=cfg['gcp_project_id'])
                 q = f"""
                 SELECT sheet_code, status, uploaded, invalid, fetched, created_at
                 FROM `{cfg['gcp_project_id']}.erp_backup.run_results`
@@ -0,0 +1,266 @@
+# -*- coding: utf-8 -*-
+"""
+MERGE 預儲程序產生模組
+
+依 BIGQUERY_SCHEMA 與目標表、staging 表的實際欄位產生完整的 sp_upsert_ragic_data：
+- 只處理指定批次（p_batch_id），來源端依 order_id 去重，取 updated_at 最新一筆
+- 更新與插入全部共同欄位；含 row_hash 時僅在雜湊不同時更新
+- 依批次的分區/叢集欄位範圍裁切目標表（僅限值不會改變的欄位；以常值條件動態執行 MERGE，確保分區裁切生效）
+- 寫入審計表（可選，失敗不影響 MERGE）後清除該批次的 staging 資料
+
+部署時比對程序描述中的指紋，內容未變更則不重新建立（可重複呼叫）。
+"""
+
+import hashlib
+import logging
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+from google.cloud import bigquery
+from google.cloud.exceptions import NotFound
+
+# 預設程序名稱
+DEFAULT_PROCEDURE_NAME = "sp_upsert_ragic_data"
+
+# staging 表的批次欄位（不寫入目標表）
+STAGING_FIELDS = ("batch_id", "ingested_at")
+
+# 可在程序中以範圍裁切的欄位型別
+_PRUNE_TYPES = ("DATE", "TIMESTAMP", "DATETIME", "INTEGER", "INT64", "STRING")
+
+# 可用於 MERGE 範圍裁切的欄位：同一 order_id 的值不會改變者。
+# 以可變欄位（如訂單日期）裁切時，值已改變的既有列落在批次範圍外、比對不到，會被重複插入。
+IMMUTABLE_PRUNE_FIELDS = ("order_id", "created_at")
+
+_warned_prune_fields: Set[str] = set()
+
+_FINGERPRINT_PREFIX = "fingerprint="
+
+
+def build_merge_statement(target_ref: str,
+                          source_query: str,
+                          fields: List[str],
+                          on_conditions: Sequence[str] = ()) -> str:
+    """
+    產生 MERGE 語句（來源端依 order_id 去重，取 updated_at 最新一筆）
+
+    欄位含 row_hash 時，僅在雜湊不同時更新（來源未計算雜湊時照常更新；既有列的 NULL 雜湊視為不同）
+
+    Args:
+        target_ref: 目標表完整名稱
+        source_query: 來源查詢（如 SELECT * FROM `staging`）
+        fields: 更新與插入的欄位（須含 order_id）
+        on_conditions: 附加在 ON 的條件（分區/叢集裁切）
+
+    Returns:
+        str: MERGE 語句
+    """
+    update_clause = ",\n            ".join(f"T.{field} = S.{field}" for field in fields if field != 'order_id')
+    insert_fields = ", ".join(fields)
+    insert_values = ", ".join(f"S.{field}" for field in fields)
+    on_clause = " AND ".join(["T.order_id = S.order_id"] + list(on_conditions))
+    matched_clause = "WHEN MATCHED THEN"
+    if "row_hash" in fields:
+        matched_clause = "WHEN MATCHED AND (S.row_hash IS NULL OR T.row_hash IS DISTINCT FROM S.row_hash) THEN"
+
+    return f"""
+        MERGE `{target_ref}` T
+        USING (
+          SELECT * EXCEPT(row_num) FROM (
+            SELECT *, ROW_NUMBER() OVER (
+              PARTITION BY order_id
+              ORDER BY updated_at DESC NULLS LAST
+            ) AS row_num
+            FROM ({source_query})
+          ) WHERE row_num = 1
+        ) S
+        ON {on_clause}
+        {matched_clause}
+          UPDATE SET
+            {update_clause}
+        WHEN NOT MATCHED THEN
+          INSERT ({insert_fields})
+          VALUES ({insert_values})
+        """
+
+
+def resolve_merge_fields(schema: List[bigquery.SchemaField],
+                         target_schema: Optional[List[bigquery.SchemaField]] = None,
+                         staging_schema: Optional[List[bigquery.SchemaField]] = None) -> List[bigquery.SchemaField]:
+    """
+    取 schema 中同時存在於目標表與 staging 表的欄位（依 schema 順序；未提供的表不過濾）
+
+    Raises:
+        ValueError: 共同欄位不含 order_id 時
+    """
+    target_names = {f.name for f in target_schema} if target_schema else None
+    staging_names = {f.name for f in staging_schema} if staging_schema else None
+    fields = [
+        f for f in schema
+        if f.name not in STAGING_FIELDS
+        and (target_names is None or f.name in target_names)
+        and (staging_names is None or f.name in staging_names)
+    ]
+    if "order_id" not in {f.name for f in fields}:
+        raise ValueError("MERGE 欄位必須包含 order_id")
+    return fields
+
+
+def select_prune_fields(field_types: Dict[str, str],
+                        partition_field: Optional[str],
+                        cluster_fields: Sequence[str]) -> List[Tuple[str, bool]]:
+    """
+    選出 MERGE 可用來裁切目標表的分區/叢集欄位
+
+    只接受 IMMUTABLE_PRUNE_FIELDS 中的欄位；其他欄位仍可作為目標表的分區/叢集，但不用於裁切（記錄警告）。
+
+    Args:
+        field_types: MERGE 欄位名稱 → BigQuery 型別
+        partition_field: 目標表的分區欄位（目標表確實以此分區時才提供）
+        cluster_fields: 目標表的叢集欄位
+
+    Returns:
+        List[(欄位, 批次內須無空值)]：分區欄位在批次內有空值時不裁切；叢集欄位忽略空值
+    """
+    candidates = [(partition_field, True)] if partition_field else []
+    candidates.extend((f, False) for f in cluster_fields if f != partition_field)
+    selected = []
+    for field, require_all in candidates:
+        if field_types.get(field) not in _PRUNE_TYPES:
+            continue
+        if field not in IMMUTABLE_PRUNE_FIELDS:
+            if field not in _warned_prune_fields:
+                _warned_prune_fields.add(field)
+                logging.warning(
+                    f"{field} 的值可能隨更新改變，MERGE 不以此欄位裁切"
+                    f"（僅 {', '.join(IMMUTABLE_PRUNE_FIELDS)} 可裁切，避免重複插入）"
+                )
+            continue
+        selected.append((field, require_all))
+    return selected
+
+
+def _prune_block(staging_ref: str,
+                 field_types: Dict[str, str],
+                 partition_field: Optional[str],
+                 cluster_fields: Sequence[str]) -> List[str]:
+    """
+    產生計算裁切條件的腳本（欄位與規則同 BigQueryUploader._build_prune_filter，見 select_prune_fields）
+    """
+    prune_fields = select_prune_fields(field_types, partition_field, cluster_fields)
+
+    lines = ["  DECLARE prune_filter STRING DEFAULT '';"]
+    for i, (field, _) in enumerate(prune_fields):
+        field_type = "INT64" if field_types[field] == "INTEGER" else field_types[field]
+        lines.append(f"  DECLARE prune_min_{i} {field_type};")
+        lines.append(f"  DECLARE prune_max_{i} {field_type};")
+        lines.append(f"  DECLARE prune_nulls_{i} INT64;")
+    for i, (field, require_all) in enumerate(prune_fields):
+        lines.append(
+            f"  SET (prune_min_{i}, prune_max_{i}, prune_nulls_{i}) = ("
+            f"SELECT AS STRUCT MIN({field}), MAX({field}), COUNTIF({field} IS NULL) "
+            f"FROM `{staging_ref}` WHERE batch_id = p_batch_id);"
+        )
+        condition = f"prune_min_{i} IS NOT NULL"
+        if require_all:
+            condition += f" AND prune_nulls_{i} = 0"
+        lines.append(f"  IF {condition} THEN")
+        lines.append(
+            f"    SET prune_filter = CONCAT(prune_filter, FORMAT(' AND T.{field} BETWEEN %T AND %T', "
+            f"prune_min_{i}, prune_max_{i}));"
+        )
+        lines.append("  END IF;")
+    return lines
+
+
+def build_merge_procedure(procedure_ref: str,
+                          target_ref: str,
+                          staging_ref: str,
+                          fields: List[bigquery.SchemaField],
+                          partition_field: Optional[str] = None,
+                          cluster_fields: Sequence[str] = (),
+                          audit_table_ref: Optional[str] = None) -> str:
+    """
+    產生 CREATE OR REPLACE PROCEDURE 語句（參數 p_batch_id）
+
+    Args:
+        procedure_ref: 程序完整名稱（project.dataset.procedure）
+        target_ref: 目標表完整名稱
+        staging_ref: staging 表完整名稱
+        fields: MERGE 的欄位（resolve_merge_fields 的結果）
+        partition_field: 目標表的分區欄位（目標表確實以此分區時才提供；不在 IMMUTABLE_PRUNE_FIELDS 者不裁切）
+        cluster_fields: 目標表的叢集欄位（同上）
+        audit_table_ref: 審計表完整名稱（batch_id, target_table, rows_merged, processed_at）；None 不寫入
+
+    Returns:
+        str: 程序定義（OPTIONS 的描述含內容指紋）
+    """
+    field_names = [f.name for f in fields]
+    field_types = {f.name: f.field_type for f in fields}
+    merge = build_merge_statement(
+        target_ref,
+        f"SELECT * EXCEPT({', '.join(STAGING_FIELDS)}) FROM `{staging_ref}` WHERE batch_id = @batch_id",
+        field_names,
+    )
+    # ON 條件之後接上動態裁切條件
+    head, tail = merge.split("\n        WHEN MATCHED", 1)
+
+    lines = ["BEGIN", "  DECLARE rows_merged INT64 DEFAULT 0;"]
+    lines.extend(_prune_block(staging_ref, field_types, partition_field, cluster_fields))
+    lines.append(f'  EXECUTE IMMEDIATE CONCAT("""{head}""", prune_filter, """\n        WHEN MATCHED{tail}""")')
+    lines.append("    USING p_batch_id AS batch_id;")
+    lines.append("  SET rows_merged = @@row_count;")
+    if audit_table_ref:
+        target_table = target_ref.split(".")[-1]
+        lines.extend([
+            "  BEGIN",
+            f"    INSERT INTO `{audit_table_ref}` (batch_id, target_table, rows_merged, processed_at)",
+            f"    VALUES (p_batch_id, '{target_table}', rows_merged, CURRENT_TIMESTAMP());",
+            "  EXCEPTION WHEN ERROR THEN",
+            "    SELECT CONCAT('審計紀錄寫入失敗: ', @@error.message) AS audit_warning;",
+            "  END;",
+        ])
+    lines.append(f"  DELETE FROM `{staging_ref}` WHERE batch_id = p_batch_id;")
+    lines.append("END")
+    body = "\n".join(lines)
+
+    fingerprint = hashlib.sha256(f"{procedure_ref}\n{body}".encode("utf-8")).hexdigest()[:16]
+    return (
+        f"CREATE OR REPLACE PROCEDURE `{procedure_ref}`(p_batch_id STRING)\n"
+        f"OPTIONS(description=\"staging → {target_ref} MERGE（由 merge_procedure 產生，{_FINGERPRINT_PREFIX}{fingerprint}）\")\n"
+        f"{body};\n"
+    )
+
+
+def procedure_fingerprint(definition_or_description: Optional[str]) -> Optional[str]:
+    """從程序定義或描述取出內容指紋（無指紋時回傳 None）"""
+    if not definition_or_description or _FINGERPRINT_PREFIX not in definition_or_description:
+        return None
+    start = definition_or_description.index(_FINGERPRINT_PREFIX) + len(_FINGERPRINT_PREFIX)
+    return definition_or_description[start:start + 16]
+
+
+def deploy_merge_procedure(client: Any, procedure_ref: str, definition: str) -> bool:
+    """
+    部署程序；既有程序的指紋相同時略過
+
+    Args:
+        client: BigQuery 客戶端
+        procedure_ref: 程序完整名稱
+        definition: build_merge_procedure 產生的定義
+
+    Returns:
+        bool: 有重新建立時為 True
+    """
+    fingerprint = procedure_fingerprint(definition)
+    try:
+        routine = client.get_routine(procedure_ref)
+        if procedure_fingerprint(routine.description) == fingerprint:
+            logging.info(f"預儲程序 {procedure_ref} 已是最新（{fingerprint}）")
+            return False
+    except NotFound:
+        pass
+
+    job = client.query(definition)
+    job.result()
+    logging.info(f"預儲程序 {procedure_ref} 已部署（{fingerprint}）")
+    return True
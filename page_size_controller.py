@@ -0,0 +1,290 @@
+# -*- coding: utf-8 -*-
+"""
+Ragic 分頁大小自動調整模組
+依每頁實測延遲與回應大小，為每張表調整 limit，使單頁延遲落在 ragic_timeout 之下的目標區間，
+並將學到的 limit 依表單持久化，讓下次執行直接從最佳值開始。
+
+持久化位置：
+- BigQueryPageSizeStore：與 sheet_sync_state 同資料集的 ragic_page_size_state 表
+  （Cloud Functions 執行個體回收後仍保留，建議使用）
+- JsonFilePageSizeStore：本機 JSON 檔（適用本機或長駐執行）
+"""
+
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional, Callable
+
+
+class JsonFilePageSizeStore:
+    """以本機 JSON 檔保存每表 limit"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def __str__(self) -> str:
+        return self.path
+
+    def load(self) -> Dict[str, Dict[str, Any]]:
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        return state if isinstance(state, dict) else {}
+
+    def save(self, state: Dict[str, Dict[str, Any]]) -> None:
+        state_dir = os.path.dirname(self.path)
+        if state_dir:
+            os.makedirs(state_dir, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+class BigQueryPageSizeStore:
+    """
+    以 BigQuery 表保存每表 limit（sheet_id, page_limit, latency_s, payload_bytes, updated_at）
+
+    表不存在時首次儲存會建立（見 sql/create_ragic_page_size_state_table.sql）；
+    客戶端延遲到第一次讀寫才建立，未啟用分頁大小調整時不連線。
+    """
+
+    def __init__(self, client_factory: Callable[[], Any], table_ref: str):
+        """
+        Args:
+            client_factory: 回傳 BigQuery 客戶端的函數
+            table_ref: 完整表名（project.dataset.table）
+        """
+        self.client_factory = client_factory
+        self.table_ref = table_ref
+
+    def __str__(self) -> str:
+        return self.table_ref
+
+    def load(self) -> Dict[str, Dict[str, Any]]:
+        from google.cloud.exceptions import NotFound
+
+        client = self.client_factory()
+        query = f"SELECT sheet_id, page_limit, latency_s, payload_bytes, updated_at FROM `{self.table_ref}`"
+        try:
+            rows = client.query(query).result()
+        except NotFound:
+            return {}
+        state: Dict[str, Dict[str, Any]] = {}
+        for row in rows:
+            entry: Dict[str, Any] = {'limit': row.page_limit}
+            if row.latency_s is not None:
+                entry['latency_s'] = row.latency_s
+            if row.payload_bytes is not None:
+                entry['payload_bytes'] = row.payload_bytes
+            if row.updated_at is not None:
+                entry['updated_at'] = row.updated_at.isoformat()
+            state[row.sheet_id] = entry
+        return state
+
+    def save(self, state: Dict[str, Dict[str, Any]]) -> None:
+        from google.cloud import bigquery
+
+        client = self.client_factory()
+        rows = [
+            bigquery.StructQueryParameter(
+                None,
+                bigquery.ScalarQueryParameter('sheet_id', 'STRING', sheet_id),
+                bigquery.ScalarQueryParameter('page_limit', 'INT64', int(entry['limit'])),
+                bigquery.ScalarQueryParameter('latency_s', 'FLOAT64', entry.get('latency_s')),
+                bigquery.ScalarQueryParameter('payload_bytes', 'INT64', entry.get('payload_bytes')),
+            )
+            for sheet_id, entry in state.items()
+        ]
+        if not rows:
+            return
+        query = f"""
+        CREATE TABLE IF NOT EXISTS `{self.table_ref}` (
+            sheet_id STRING NOT NULL,
+            page_limit INT64 NOT NULL,
+            latency_s FLOAT64,
+            payload_bytes INT64,
+            updated_at TIMESTAMP
+        );
+        MERGE `{self.table_ref}` AS T
+        USING (SELECT *, CURRENT_TIMESTAMP() AS updated_at FROM UNNEST(@rows)) AS S
+        ON T.sheet_id = S.sheet_id
+        WHEN MATCHED THEN
+            UPDATE SET page_limit = S.page_limit, latency_s = S.latency_s,
+                payload_bytes = S.payload_bytes, updated_at = S.updated_at
+        WHEN NOT MATCHED THEN
+            INSERT (sheet_id, page_limit, latency_s, payload_bytes, updated_at)
+            VALUES (S.sheet_id, S.page_limit, S.latency_s, S.payload_bytes, S.updated_at);
+        """
+        job_config = bigquery.QueryJobConfig(query_parameters=[bigquery.ArrayQueryParameter('rows', 'STRUCT', rows)])
+        client.query(query, job_config=job_config).result()
+
+
+class AdaptivePageSizeController:
+    """
+    每表分頁大小控制器（執行緒安全）
+
+    - 延遲低於目標區間下緣且頁面為滿頁：放大 limit
+    - 延遲高於目標區間上緣、回應過大或逾時：縮小 limit
+    - 單次調整幅度限制在 0.5x ~ 2x，並夾在 [min_limit, max_limit]
+    """
+
+    def __init__(
+        self,
+        timeout: float = 30,
+        target_low_ratio: float = 0.2,
+        target_high_ratio: float = 0.4,
+        min_limit: int = 200,
+        max_limit: int = 5000,
+        max_payload_bytes: int = 32 * 1024 * 1024,
+        state_file: Optional[str] = None,
+        state_store: Optional[Any] = None
+    ):
+        """
+        初始化分頁大小控制器
+
+        Args:
+            timeout: Ragic 請求逾時秒數（ragic_timeout）
+            target_low_ratio: 目標延遲區間下緣（timeout 的比例）
+            target_high_ratio: 目標延遲區間上緣（timeout 的比例）
+            min_limit: limit 下限
+            max_limit: limit 上限
+            max_payload_bytes: 單頁回應大小上限（位元組）
+            state_file: 持久化 JSON 檔路徑（未提供 state_store 時使用），None 表示不持久化
+            state_store: 持久化儲存（具 load() / save(state)，例如 BigQueryPageSizeStore）
+        """
+        self.target_low = float(timeout) * target_low_ratio
+        self.target_high = float(timeout) * target_high_ratio
+        self.min_limit = int(min_limit)
+        self.max_limit = int(max_limit)
+        self.max_payload_bytes = int(max_payload_bytes)
+        self.state_store = state_store or (JsonFilePageSizeStore(state_file) if state_file else None)
+        self._state: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._loaded = False
+
+    def _clamp(self, limit: float) -> int:
+        return int(max(self.min_limit, min(self.max_limit, limit)))
+
+    def _ensure_loaded(self) -> None:
+        """首次取用時從持久化儲存載入每表已學到的 limit（載入失敗時從預設值開始）"""
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            self._loaded = True
+            if not self.state_store:
+                return
+            try:
+                state = self.state_store.load()
+                self._state.update({k: v for k, v in state.items() if isinstance(v, dict) and v.get('limit')})
+                logging.info(f"已載入 {len(self._state)} 張表的分頁大小設定（{self.state_store}）")
+            except Exception as e:
+                logging.warning(f"載入分頁大小設定失敗（{self.state_store}）: {e}")
+
+    def save(self) -> None:
+        """將每表 limit 寫回持久化儲存（僅在有變動時寫入）"""
+        if not self.state_store or not self._dirty:
+            return
+        try:
+            with self._lock:
+                snapshot = {k: dict(v) for k, v in self._state.items()}
+                self._dirty = False
+            self.state_store.save(snapshot)
+            logging.info(f"已儲存 {len(snapshot)} 張表的分頁大小設定（{self.state_store}）")
+        except Exception as e:
+            logging.warning(f"儲存分頁大小設定失敗（{self.state_store}）: {e}")
+
+    def get_limit(self, sheet_id: str, default: int) -> int:
+        """
+        取得表單目前的 limit（已學到者優先，否則使用 default）
+
+        Args:
+            sheet_id: 表單 ID
+            default: 尚無學習紀錄時的 limit
+
+        Returns:
+            int: 分頁大小
+        """
+        self._ensure_loaded()
+        with self._lock:
+            entry = self._state.get(sheet_id)
+        if entry:
+            return self._clamp(entry['limit'])
+        return self._clamp(default)
+
+    def _set_limit(self, sheet_id: str, limit: int, **stats: Any) -> None:
+        self._ensure_loaded()
+        with self._lock:
+            entry = self._state.setdefault(sheet_id, {})
+            entry.update(stats)
+            entry['limit'] = limit
+            entry['updated_at'] = datetime.now(timezone.utc).isoformat()
+            self._dirty = True
+
+    def record(self, sheet_id: str, limit: int, latency_s: float, payload_bytes: int, records: int) -> int:
+        """
+        記錄一頁的實測結果並回傳下一頁建議的 limit
+
+        Args:
+            sheet_id: 表單 ID
+            limit: 本頁請求的 limit
+            latency_s: 本頁延遲（秒）
+            payload_bytes: 本頁回應大小（位元組）
+            records: 本頁實際筆數
+
+        Returns:
+            int: 調整後的 limit
+        """
+        new_limit = limit
+        target_mid = (self.target_low + self.target_high) / 2
+        if records > 0 and latency_s > 0:
+            if latency_s > self.target_high:
+                # 太慢：依每筆延遲縮至目標中點
+                new_limit = limit * max(0.5, target_mid / latency_s)
+            elif latency_s < self.target_low and records >= limit:
+                # 夠快且為滿頁：依每筆延遲放大至目標中點
+                new_limit = limit * min(2.0, target_mid / latency_s)
+            # 回應大小上限
+            bytes_per_record = payload_bytes / records
+            if bytes_per_record > 0:
+                new_limit = min(new_limit, self.max_payload_bytes / bytes_per_record)
+        new_limit = self._clamp(new_limit)
+
+        if new_limit != limit:
+            logging.info(f"[{sheet_id}] 分頁大小調整 {limit} → {new_limit}（延遲 {latency_s:.2f}s，{payload_bytes} bytes，{records} 筆）")
+        self._set_limit(sheet_id, new_limit, latency_s=round(latency_s, 3), payload_bytes=payload_bytes)
+        return new_limit
+
+    def record_timeout(self, sheet_id: str, limit: int) -> int:
+        """
+        記錄逾時：limit 減半
+
+        Returns:
+            int: 調整後的 limit
+        """
+        new_limit = self._clamp(limit // 2)
+        logging.warning(f"[{sheet_id}] 分頁逾時，分頁大小調整 {limit} → {new_limit}")
+        self._set_limit(sheet_id, new_limit)
+        return new_limit
+
+
+def create_page_size_controller(timeout: float = 30, state_file: Optional[str] = None, state_store: Optional[Any] = None, **kwargs) -> AdaptivePageSizeController:
+    """
+    建立分頁大小控制器的工廠函數
+
+    Args:
+        timeout: Ragic 請求逾時秒數
+        state_file: 持久化 JSON 檔路徑（未提供 state_store 時使用）
+        state_store: 持久化儲存（例如 BigQueryPageSizeStore）
+        **kwargs: 其他控制器參數
+
+    Returns:
+        AdaptivePageSizeController: 控制器實例
+    """
+    return AdaptivePageSizeController(timeout=timeout, state_file=state_file, state_store=state_store, **kwargs)
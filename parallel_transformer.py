@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+多行程平行轉換模組
+
+將大量 Ragic 記錄切成多個區塊，交由 ProcessPoolExecutor 的子行程各自以相同設定的 DataTransformer 轉換，
+再依原始順序合併轉換結果、invalid_records、failure_counts 與 unknown_field_counts。
+記錄索引（錯誤訊息與 invalid_records 的 index）維持為整批資料中的位置，結果與單一行程轉換相同。
+"""
+
+import logging
+import math
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+# 子行程內的轉換器（由 initializer 建立，同一子行程處理多個區塊時共用）
+_worker_transformer = None
+
+# 每個區塊的最小筆數（過小的區塊序列化成本高於轉換本身）
+MIN_CHUNK_SIZE = 1000
+
+
+def _init_worker(init_kwargs: Dict[str, Any]) -> None:
+    """子行程初始化：建立與主行程相同設定的轉換器"""
+    global _worker_transformer
+    from data_transformer import DataTransformer
+    _worker_transformer = DataTransformer(**init_kwargs)
+
+
+def _transform_chunk(args: Tuple[List[Any], int]) -> Tuple[List[Optional[Dict[str, Any]]], List[Dict[str, Any]], Dict[str, int], Dict[str, int], int]:
+    """
+    在子行程中轉換一個區塊
+
+    Args:
+        args: (區塊記錄, 區塊第一筆在整批資料中的索引)
+
+    Returns:
+        Tuple[轉換結果（失敗為 None）, invalid_records, failure_counts, unknown_field_counts, unknown_fields_count]
+    """
+    records, start_index = args
+    t = _worker_transformer
+    t.invalid_records = []
+    t.failure_counts = {}
+    t.unknown_field_counts = {}
+    t.unknown_fields_count = 0
+    results = t._transform_records(records, start_index)
+    return results, t.invalid_records, t.failure_counts, t.unknown_field_counts, t.unknown_fields_count
+
+
+def transform_in_process_pool(transformer: Any, records: List[Any], workers: int) -> List[Optional[Dict[str, Any]]]:
+    """
+    以多行程平行轉換記錄，並將統計合併回 transformer
+
+    Args:
+        transformer: 主行程的 DataTransformer（提供子行程的初始化參數並接收合併後的統計）
+        records: Ragic 原始記錄
+        workers: 子行程數
+
+    Returns:
+        List[Optional[Dict]]: 與輸入等長，轉換失敗或無效的位置為 None
+    """
+    chunk_size = max(MIN_CHUNK_SIZE, math.ceil(len(records) / (workers * 4)))
+    chunks = [(records[start:start + chunk_size], start) for start in range(0, len(records), chunk_size)]
+    workers = min(workers, len(chunks))
+
+    start_time = time.time()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(transformer._get_init_kwargs(),)) as pool:
+        chunk_results = list(pool.map(_transform_chunk, chunks))
+
+    # 全部區塊完成後才合併（任一區塊失敗時由呼叫端改用單一行程，不會重複計數）
+    results: List[Optional[Dict[str, Any]]] = []
+    for chunk_rows, invalid_records, failure_counts, unknown_field_counts, unknown_fields_count in chunk_results:
+        results.extend(chunk_rows)
+        transformer.invalid_records.extend(invalid_records)
+        for key, count in failure_counts.items():
+            transformer.failure_counts[key] = transformer.failure_counts.get(key, 0) + count
+        for key, count in unknown_field_counts.items():
+            transformer.unknown_field_counts[key] = transformer.unknown_field_counts.get(key, 0) + count
+        transformer.unknown_fields_count += unknown_fields_count
+
+    logging.info(f"[transform_data] 平行轉換 {len(records)} 筆（{workers} 個行程，{len(chunks)} 個區塊），耗時 {time.time() - start_time:.2f} 秒")
+    return results
@@ -2,17 +2,23 @@
 """Ragic API 資料獲取模組"""
 
 import requests
+from requests.adapters import HTTPAdapter
 import logging
 import time
-from typing import List, Dict, Any, Optional
-from datetime import datetime, timezone, timedelta
-from data_transformer import TAIPEI_TZ # For robust timezone handling
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import List, Dict, Any, Optional, Tuple, Iterator, Deque
+from datetime import datetime
+from temporal_parser import parse_timestamp
+from rate_limiter import TokenBucketRateLimiter, parse_retry_after
+from page_size_controller import AdaptivePageSizeController
+from ragic_paging import IncrementalPagePlanner, ModifiedDescPlanner, StartOffsetLocator, _IncrementalPageFilter
 
 
 class RagicClient:
     """Ragic API 客戶端"""
 
-    def __init__(self, api_key: str, account: str, timeout: int = 30, max_retries: int = 3):
+    def __init__(self, api_key: str, account: str, timeout: int = 30, max_retries: int = 3, pool_maxsize: int = 10, rate_limiter: Optional[TokenBucketRateLimiter] = None):
         """
         初始化 Ragic 客戶端
 
@@ -21,6 +27,8 @@ class RagicClient:
             account: Ragic 帳戶名稱
             timeout: 請求逾時時間（秒）
             max_retries: API 請求失敗時的最大重試次數
+            pool_maxsize: 連線池大小（需不小於預抓的同時請求數）
+            rate_limiter: 共用的速率限制器（None 時建立預設 token bucket）
         """
         if not api_key or not account:
             raise ValueError("API Key 或 Account 不可為空")
@@ -31,69 +39,140 @@ class RagicClient:
 
         self.session = requests.Session()
         self.session.headers['Authorization'] = f'Basic {api_key}'
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(10, int(pool_maxsize)))
+        self.session.mount('https://', adapter)
+        self.rate_limiter = rate_limiter or TokenBucketRateLimiter()
 
-    def fetch_data(self, sheet_id: str, last_sync_time: Optional[str] = None, limit: int = 1000, max_pages: Optional[int] = None, where_field: Optional[str] = None) -> List[Dict[str, Any]]:
+    def _request(self, url: str, params: Optional[Dict[str, Any]] = None) -> requests.Response:
         """
-        從 Ragic API 取得資料（自動處理分頁和重試）
+        經速率限制器發出 GET，並負責所有重試（共用 max_retries 次的額度）：
+        - 429（或帶 Retry-After 的 503）依伺服端指示暫停所有呼叫端後重試
+        - 逾時 / 連線錯誤以指數退避重試，額度用盡時拋出最後一次的例外
+
+        Returns:
+            requests.Response: 最後一次的回應（狀態碼由呼叫端檢查）；
+            round_trip_seconds 為該次 HTTP 往返時間（不含速率限制與重試等待）
+        """
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.acquire()
+            try:
+                t0 = time.monotonic()
+                response = self.session.get(url, params=params, timeout=self.timeout)
+                response.round_trip_seconds = time.monotonic() - t0
+            except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+                if attempt == self.max_retries:
+                    raise
+                logging.warning(f"Ragic 請求失敗（{url}）：{e}，{2 ** attempt} 秒後重試（第 {attempt + 1} 次）")
+                time.sleep(2 ** attempt)
+                continue
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            throttled = response.status_code == 429 or (response.status_code == 503 and retry_after is not None)
+            if not throttled or attempt == self.max_retries:
+                return response
+            delay = retry_after if retry_after is not None else float(2 ** attempt)
+            logging.warning(f"Ragic 回應 {response.status_code}（{url}），{delay:.1f} 秒後重試（第 {attempt + 1} 次）")
+            self.rate_limiter.penalize(delay)
+        return response
+
+    def iter_pages(
+        self,
+        sheet_id: str,
+        last_sync_time: Optional[str] = None,
+        limit: int = 1000,
+        max_pages: Optional[int] = None,
+        where_field: Optional[str] = None,
+        offset: int = 0
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """
+        逐頁產出 Ragic 原始資料（自動處理分頁和重試），僅在需要下一頁時才發出請求
 
         Args:
             sheet_id: 表單 ID（例如：'forms8/5'）
             last_sync_time: 最後同步時間，Ragic 格式 (yyyy/MM/dd HH:mm:ss)
             limit: 每頁資料筆數，預設 1000
+            max_pages: 最多頁數（None 表示不限）
+            where_field: 伺服端 where 使用的欄位，預設 _ragicModified
+            offset: 起始 offset（續傳用）
 
-        Returns:
-            List[Dict]: 資料列表
+        Yields:
+            List[Dict]: 每頁的資料列表（不含空頁）
         """
-        all_data = []
-        offset = 0
         pages = 0
+        total = 0
         url = f'{self.base_url}/{sheet_id}'
 
         while True:
             if max_pages is not None and pages >= max_pages:
-                break
+                return
             params = {'api': '', 'v': 3, 'limit': limit, 'offset': offset}
             if last_sync_time:
                 field = where_field or '_ragicModified'
                 params['where'] = f'{field},gt,{last_sync_time}'
 
-            # 重試機制
-            for retry in range(self.max_retries + 1):
-                try:
-                    response = self.session.get(url, params=params, timeout=self.timeout)
-                    response.raise_for_status()
+            # 重試由 _request 處理
+            try:
+                response = self._request(url, params=params)
+                response.raise_for_status()
+                result = response.json()
+            except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+                raise Exception(f"API 請求失敗（已重試 {self.max_retries} 次）: {e}")
+            except requests.exceptions.HTTPError as e:
+                if e.response.status_code == 401:
+                    raise Exception("API 認證失敗")
+                elif e.response.status_code == 404:
+                    raise Exception(f"找不到表單: {sheet_id}")
+                raise Exception(f"HTTP 錯誤 ({e.response.status_code})")
+
+            # Ragic API 直接回傳資料物件，需轉換為列表
+            if isinstance(result, dict):
+                data = list(result.values()) if result else []
+            else:
+                data = []
+            if not data:
+                return
 
-                    result = response.json()
+            total += len(data)
+            logging.info(f"取得 {len(data)} 筆，總計 {total} 筆")
+            yield data
 
-                    # Ragic API 直接回傳資料物件，需轉換為列表
-                    if isinstance(result, dict):
-                        data = list(result.values()) if result else []
-                    else:
-                        data = []
-                    if not data:
-                        return all_data
+            if len(data) < limit:
+                return
 
-                    all_data.extend(data)
-                    logging.info(f"取得 {len(data)} 筆，總計 {len(all_data)} 筆")
+            pages += 1
+            offset += limit
 
-                    if len(data) < limit:
-                        return all_data
+    def iter_records(self, sheet_id: str, since_dt: Optional[datetime] = None, **kwargs) -> Iterator[Dict[str, Any]]:
+        """
+        逐筆產出資料：提供 since_dt 時走本地過濾增量（iter_pages_since），否則走 iter_pages
 
-                    pages += 1
-                    offset += limit
-                    time.sleep(0.5)  # 避免 API 限流
-                    break
+        Args:
+            sheet_id: 表單 ID
+            since_dt: 本地過濾的起始時間（UTC）；None 表示不做本地過濾
+            **kwargs: 轉交給對應分頁產生器的參數
+        """
+        if since_dt is not None:
+            pages = self.iter_pages_since(sheet_id, since_dt, **kwargs)
+        else:
+            pages = self.iter_pages(sheet_id, **kwargs)
+        for page in pages:
+            yield from page
 
-                except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
-                    if retry == self.max_retries:
-                        raise Exception(f"API 請求失敗（已重試 {self.max_retries} 次）: {e}")
-                    time.sleep(2 ** retry)
-                except requests.exceptions.HTTPError as e:
-                    if e.response.status_code == 401:
-                        raise Exception("API 認證失敗")
-                    elif e.response.status_code == 404:
-                        raise Exception(f"找不到表單: {sheet_id}")
-                    raise Exception(f"HTTP 錯誤 ({e.response.status_code})")
+    def fetch_data(self, sheet_id: str, last_sync_time: Optional[str] = None, limit: int = 1000, max_pages: Optional[int] = None, where_field: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        從 Ragic API 取得資料（自動處理分頁和重試）
+
+        Args:
+            sheet_id: 表單 ID（例如：'forms8/5'）
+            last_sync_time: 最後同步時間，Ragic 格式 (yyyy/MM/dd HH:mm:ss)
+            limit: 每頁資料筆數，預設 1000
+
+        Returns:
+            List[Dict]: 資料列表
+        """
+        all_data: List[Dict[str, Any]] = []
+        for page in self.iter_pages(sheet_id, last_sync_time=last_sync_time, limit=limit, max_pages=max_pages, where_field=where_field):
+            all_data.extend(page)
+        return all_data
 
     def close(self):
         """關閉連線"""
@@ -104,7 +183,7 @@ class RagicClient:
         不要求 200，常見 401/403/404 也代表網路與主機可達。
         """
         try:
-            resp = self.session.get(self.base_url, timeout=self.timeout)
+            resp = self._request(self.base_url)
             logging.info(f"Ragic ping {self.base_url} -> {resp.status_code}")
             return resp.status_code in (200, 301, 302, 401, 403, 404)
         except Exception as e:
@@ -112,50 +191,25 @@ class RagicClient:
             return False
 
     # ---- 新增：無 where 單頁掃描 + 本地過濾增量（以最後修改欄位） ----
-    _DT_PATTERNS = [
-        '%Y/%m/%d %H:%M:%S',
-        '%Y-%m-%d %H:%M:%S',
-        '%Y/%m/%d',
-        '%Y-%m-%d',
-    ]
-
     def _parse_dt(self, value: Any) -> Optional[datetime]:
-        if not value:
-            return None
-        s = str(value).strip()
-        dt_naive: Optional[datetime] = None
-
-        try:
-            # Try ISO format first, including timezone-aware
-            if 'T' in s:
-                dt_parsed = datetime.fromisoformat(s.replace('Z', '+00:00'))
-                if dt_parsed.tzinfo is None: # If naive ISO
-                    dt_naive = dt_parsed
-                else: # If already timezone-aware, convert to UTC
-                    return dt_parsed.astimezone(timezone.utc)
-        except Exception:
-            pass
-
-        # Try common patterns
-        for p in self._DT_PATTERNS:
-            try:
-                dt_naive = datetime.strptime(s, p)
-                break
-            except Exception:
-                continue
+        """解析最後修改時間為 UTC（無時區者視為台北時間），共用 temporal_parser 的快取解析器"""
+        return parse_timestamp(value)
 
-        if dt_naive is None:
-            return None # Could not parse
+    def _get_page_once(self, url: str, params: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], float, int]:
+        """
+        抓取單頁原始資料（重試由 _request 處理），失敗則拋出例外。
 
-        # If parsed datetime is naive, assume Taipei and convert to UTC
-        if dt_naive.tzinfo is None:
-            dt_localized = dt_naive.replace(tzinfo=TAIPEI_TZ)
-            return dt_localized.astimezone(timezone.utc)
-        else:
-            # Should not happen if fromisoformat handled it, but as a safeguard
-            return dt_naive.astimezone(timezone.utc)
+        Returns:
+            Tuple[資料列表, HTTP 往返秒數, 回應位元組數]
+        """
+        r = self._request(url, params=params)
+        r.raise_for_status()
+        result = r.json()
+        elapsed = r.round_trip_seconds
+        data = list(result.values()) if isinstance(result, dict) else []
+        return data, elapsed, len(r.content or b'')
 
-    def fetch_since_local_paged(
+    def iter_pages_since(
         self,
         sheet_id: str,
         since_dt: datetime,
@@ -163,13 +217,34 @@ class RagicClient:
         until_dt: Optional[datetime] = None,
         limit: int = 1000,
         max_pages: int = 50,
-        no_new_data_pages_threshold: int = 2 # 連續無新資料頁面閾值
-    ) -> List[Dict[str, Any]]:
+        no_new_data_pages_threshold: int = 2, # 連續無新資料頁面閾值
+        prefetch_pages: int = 1, # 同時在途的分頁請求數（1 = 逐頁抓取）
+        page_size_controller: Optional[AdaptivePageSizeController] = None, # 分頁大小自動調整（None = 固定 limit）
+        pagination: str = 'offset', # 'offset' 或 'keyset'（以最後 _ragicId 續抓）
+        strategy: str = 'ragic_id_asc', # 'ragic_id_asc' 或 'modified_desc'（依最後修改欄位遞減掃描）
+        start_offset: int = 0, # 起始 offset（_ragicId 遞增掃描）
+        locate_field: Optional[str] = None # 以此欄位二分搜尋起始 offset（需隨 _ragicId 大致遞增，例如建立日期）
+    ) -> Iterator[List[Dict[str, Any]]]:
         """
+        逐頁產出本地過濾後的增量資料（每頁僅含符合時間窗的記錄，可能為空列表）。
+
         不使用 where，改以本地過濾增量且有頁面延伸規則：
         - 逐頁抓取，僅以 max_pages 與「不足一頁」為停止條件（避免因排序差異提早停止）。
         - 若整頁皆無法解析日期，為避免無限迴圈，只抓第一頁即停止。
         - 引入 no_new_data_pages_threshold，實現智慧提前停止。
+        - prefetch_pages > 1 時，以共用 session 同時預抓多個 offset，
+          結果仍依 offset 順序處理，停止規則與逐頁模式相同（多抓的頁面直接丟棄）。
+        - 提供 page_size_controller 時，每頁 limit 由控制器依實測延遲/大小決定
+          （limit 參數作為尚無學習紀錄時的初始值），offset 依實際請求的 limit 累加。
+        - pagination='keyset' 時，第二頁起改以 where=_ragicId,gt,<上一頁最後 _ragicId> 續抓（offset 固定為 0），
+          深頁延遲不隨 offset 增加，且抓取期間新增記錄不會造成漏抓/重複；
+          若伺服端未套用該 where（回傳 _ragicId 未大於水位的記錄），自動退回 offset 分頁。
+          keyset 模式下每頁依賴上一頁結果，因此不預抓。
+        - strategy='modified_desc' 時改依最後修改欄位遞減排序，抓到最舊記錄早於 since_dt 的頁面即停止
+          （見 _iter_pages_modified_desc）；伺服端未依該欄位排序時自動退回 _ragicId 遞增掃描。
+        - 提供 locate_field 時，先以 locate_start_offset 二分搜尋起始 offset（再往前退一頁作為緩衝），
+          _ragicId 遞增掃描從該處開始，而非 offset 0。注意：建立時間早於該處、但之後才被修改的舊記錄不會被掃到，
+          僅適用於舊記錄修改可忽略的表。
         """
         # 詳細 logging 診斷
         logging.info(f"[fetch_since_local_paged] 開始抓取 {sheet_id}")
@@ -178,96 +253,177 @@ class RagicClient:
             logging.info(f"[fetch_since_local_paged] until_dt={until_dt.isoformat()}")
         logging.info(f"[fetch_since_local_paged] 日期欄位: {last_modified_field_names}")
 
-        collected: List[Dict[str, Any]] = []
-        offset = 0
-        pages = 0
-        url = f'{self.base_url}/{sheet_id}'
-        consecutive_no_new_data_pages = 0 # 連續無新資料頁面計數
+        if strategy == 'modified_desc':
+            honored = yield from self._iter_pages_modified_desc(sheet_id, since_dt, last_modified_field_names, until_dt, limit, max_pages)
+            if honored:
+                return
+            logging.warning(f"[fetch_since_local_paged] {sheet_id} 無法依修改時間遞減掃描，退回 _ragicId 遞增掃描")
 
-        while pages < max_pages:
-            pages += 1
-            params = {'api': '', 'v': 3, 'limit': limit, 'offset': offset}
-            # 強制使用 _ragicId 進行遞增排序
-            params['orderBy'] = '_ragicId,asc'
+        if locate_field:
+            start_offset = max(int(start_offset or 0), self.locate_start_offset(sheet_id, since_dt, locate_field, slack=limit))
 
-            try:
-                r = self.session.get(url, params=params, timeout=self.timeout)
-                r.raise_for_status()
-                result = r.json()
-            except requests.exceptions.ReadTimeout:
-                # 單次快速重試一次
+        url = f'{self.base_url}/{sheet_id}'
+        page_filter = _IncrementalPageFilter(
+            parse_dt=self._parse_dt,
+            since_dt=since_dt,
+            until_dt=until_dt,
+            last_modified_field_names=last_modified_field_names,
+            no_new_data_pages_threshold=no_new_data_pages_threshold,
+        )
+        planner = IncrementalPagePlanner(
+            sheet_id,
+            page_filter,
+            limit=limit,
+            max_pages=max_pages,
+            prefetch_pages=prefetch_pages,
+            page_size_controller=page_size_controller,
+            pagination=pagination,
+            start_offset=start_offset,
+        )
+
+        executor = ThreadPoolExecutor(max_workers=planner.prefetch) if planner.prefetch > 1 else None
+        # 依 offset 順序排隊的 (params, future)；逐頁模式 future 為 None
+        queue: Deque[Tuple[Dict[str, Any], Optional[Future]]] = deque()
+        try:
+            while planner.has_more():
+                # 補滿在途請求（不超過 max_pages）
+                while planner.can_submit(len(queue)):
+                    params = planner.next_params()
+                    fut = executor.submit(self._get_page_once, url, params) if executor is not None else None
+                    queue.append((params, fut))
+                params, fut = queue.popleft()
                 try:
-                    r = self.session.get(url, params=params, timeout=self.timeout)
-                    r.raise_for_status()
-                    result = r.json()
+                    data, elapsed, payload_bytes = fut.result() if fut is not None else self._get_page_once(url, params)
+                except requests.exceptions.ReadTimeout as e:
+                    planner.on_timeout(params)
+                    logging.warning(f"Ragic 讀取逾時（offset={params['offset']}, limit={params['limit']}）：{e}")
+                    break
                 except Exception as e:
-                    logging.warning(f"Ragic 讀取逾時（offset={offset}, limit={limit}）：{e}")
+                    logging.warning(f"Ragic 讀取失敗（offset={params['offset']}, limit={params['limit']}）：{e}")
                     break
-            except Exception as e:
-                logging.warning(f"Ragic 讀取失敗（offset={offset}, limit={limit}）：{e}")
-                break
-            data = list(result.values()) if isinstance(result, dict) else []
-            logging.info(f"[fetch_since_local_paged] 第 {pages} 頁：API 返回 {len(data)} 筆資料")
-            if not data:
-                logging.info(f"[fetch_since_local_paged] 第 {pages} 頁無資料，停止")
-                break
 
-            any_parsed = False
-            page_new_data_count = 0 # 記錄本頁符合原始 since_dt 的新資料筆數
-            first_rec_dt = None
-            last_rec_dt = None
-
-            for rec in data:
-                # 嘗試多個可能的「最後修改」欄位名稱
-                dt = None
-                for name in last_modified_field_names:
-                    if name in rec:
-                        dt = self._parse_dt(rec.get(name))
-                        if dt:
-                            any_parsed = True
-                            if first_rec_dt is None:
-                                first_rec_dt = dt
-                            last_rec_dt = dt
-                            break
-
-                # 比較時使用原始的 since_dt (UTC)
-                if dt and until_dt and dt > until_dt:
-                    # 超過上界，不納入
-                    pass
-                elif dt and dt >= since_dt:  # 比較原始 since_dt，允許相等時間（MERGE 會去重）
-                    collected.append(rec)
-                    page_new_data_count += 1
-                # else: 資料比原始 since_dt 舊，不處理
-
-            # 詳細記錄每頁處理結果
-            if first_rec_dt:
-                logging.info(f"[fetch_since_local_paged] 第 {pages} 頁日期範圍: {first_rec_dt.isoformat()} ~ {last_rec_dt.isoformat()}")
-            logging.info(f"[fetch_since_local_paged] 第 {pages} 頁符合原始 since_dt 條件: {page_new_data_count} 筆")
-
-            # 智慧提前停止邏輯
-            # 由於現在是按 _ragicId 遞增排序，如果一頁中沒有任何新資料，
-            # 則可以合理推斷後續頁面也不會有新資料，因此可以提前停止。
-            if page_new_data_count == 0:
-                consecutive_no_new_data_pages += 1
-                logging.info(f"[fetch_since_local_paged] 連續無新資料頁面計數: {consecutive_no_new_data_pages}")
-            else:
-                consecutive_no_new_data_pages = 0
+                kept, stop = planner.on_page(params, data, elapsed, payload_bytes)
+                if kept is None:
+                    continue
+                yield kept
+                if stop:
+                    break
+        finally:
+            if executor is not None:
+                for _, fut in queue:
+                    fut.cancel()
+                executor.shutdown(wait=False, cancel_futures=True)
 
-            if consecutive_no_new_data_pages >= no_new_data_pages_threshold:
-                logging.info(f"[fetch_since_local_paged] 連續 {no_new_data_pages_threshold} 頁無新資料，提前停止抓取")
-                break
+        logging.info(f"[fetch_since_local_paged] 完成抓取：共 {planner.pages} 頁，保留 {planner.kept_total} 筆資料")
 
-            if len(data) < limit:
-                logging.info(f"[fetch_since_local_paged] 第 {pages} 頁資料不足一頁 ({len(data)} < {limit})，停止")
+    def locate_start_offset(self, sheet_id: str, since_dt: datetime, field_name: str, slack: int = 0, max_probes: int = 64) -> int:
+        """
+        以單筆請求二分搜尋第一筆 field_name 不早於 since_dt 的 offset（規則見 ragic_paging.StartOffsetLocator）
+
+        探測失敗時回傳 0（從頭掃描）。
+
+        Args:
+            sheet_id: 表單 ID
+            since_dt: 起始時間（UTC）
+            field_name: 建立時間欄位名稱
+            slack: 往前保留的緩衝筆數
+            max_probes: 最大探測次數
+
+        Returns:
+            int: 起始 offset
+        """
+        url = f'{self.base_url}/{sheet_id}'
+        locator = StartOffsetLocator(self._parse_dt, since_dt, field_name, max_probes=max_probes)
+        try:
+            offset = locator.next_offset()
+            while offset is not None:
+                data, _, _ = self._get_page_once(url, locator.probe_params(offset))
+                locator.feed(offset, data)
+                offset = locator.next_offset()
+        except Exception as e:
+            logging.warning(f"[locate_start_offset] {sheet_id} 探測失敗，改由 offset 0 開始：{e}")
+            return 0
+
+        start = locator.start_offset(slack)
+        logging.info(f"[locate_start_offset] {sheet_id} 以 {field_name} 定位起始 offset={start}（{locator.probes} 次探測）")
+        return start
+
+    def _iter_pages_modified_desc(
+        self,
+        sheet_id: str,
+        since_dt: datetime,
+        last_modified_field_names: List[str],
+        until_dt: Optional[datetime],
+        limit: int,
+        max_pages: int
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """
+        依最後修改欄位遞減排序逐頁掃描（orderBy=<欄位>,desc），抓到最舊記錄早於 since_dt 的頁面即停止，
+        一般排程增量只需 1～2 頁，與表單大小無關（規劃見 ragic_paging.ModifiedDescPlanner）。
+
+        以 generator 回傳值表示結果：True 表示完成；False 表示伺服端未依該欄位遞減排序，
+        呼叫端應退回 _ragicId 遞增掃描。頁面先暫存、確認排序後才產出，
+        退回時不會留下已抓的部分頁面（避免 INSERT 路徑重複寫入）。
+        """
+        url = f'{self.base_url}/{sheet_id}'
+        planner = ModifiedDescPlanner(self._parse_dt, since_dt, until_dt, last_modified_field_names, limit, max_pages)
+        if not planner.usable():
+            return False
+        pages: List[List[Dict[str, Any]]] = []
+        while planner.has_more():
+            params = planner.next_params()
+            try:
+                data, _, _ = self._get_page_once(url, params)
+            except Exception as e:
+                logging.warning(f"Ragic 讀取失敗（offset={params['offset']}, limit={limit}）：{e}")
                 break
-            if not any_parsed:
-                # 當頁皆無法解析日期，避免無限抓取
-                logging.warning(f"[fetch_since_local_paged] 第 {pages} 頁無法解析任何日期，停止")
+            kept, stop, ordered = planner.on_page(data, sheet_id)
+            if not ordered:
+                if pages:
+                    logging.info(f"[fetch_modified_desc] {sheet_id} 捨棄已抓取的 {len(pages)} 頁")
+                return False
+            if kept:
+                pages.append(kept)
+            if stop:
                 break
+        logging.info(f"[fetch_modified_desc] {sheet_id} 完成抓取：共 {planner.pages} 頁，保留 {planner.kept_total} 筆資料")
+        yield from pages
+        return True
 
-            offset += limit
-
-        logging.info(f"[fetch_since_local_paged] 完成抓取：共 {pages} 頁，保留 {len(collected)} 筆資料")
+    def fetch_since_local_paged(
+        self,
+        sheet_id: str,
+        since_dt: datetime,
+        last_modified_field_names: List[str],
+        until_dt: Optional[datetime] = None,
+        limit: int = 1000,
+        max_pages: int = 50,
+        no_new_data_pages_threshold: int = 2,
+        prefetch_pages: int = 1,
+        page_size_controller: Optional[AdaptivePageSizeController] = None,
+        pagination: str = 'offset',
+        strategy: str = 'ragic_id_asc',
+        start_offset: int = 0,
+        locate_field: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """本地過濾增量抓取，回傳所有符合的記錄（iter_pages_since 的列表包裝）。"""
+        collected: List[Dict[str, Any]] = []
+        for kept in self.iter_pages_since(
+            sheet_id,
+            since_dt,
+            last_modified_field_names,
+            until_dt=until_dt,
+            limit=limit,
+            max_pages=max_pages,
+            no_new_data_pages_threshold=no_new_data_pages_threshold,
+            prefetch_pages=prefetch_pages,
+            page_size_controller=page_size_controller,
+            pagination=pagination,
+            strategy=strategy,
+            start_offset=start_offset,
+            locate_field=locate_field
+        ):
+            collected.extend(kept)
         return collected
 
     def fetch_first_page(self, sheet_id: str, limit: int = 1000) -> List[Dict[str, Any]]:
@@ -275,7 +431,7 @@ class RagicClient:
         """
         url = f'{self.base_url}/{sheet_id}'
         params = {'api': '', 'v': 3, 'limit': limit, 'offset': 0}
-        r = self.session.get(url, params=params, timeout=self.timeout)
+        r = self._request(url, params=params)
         r.raise_for_status()
         result = r.json()
         data = list(result.values()) if isinstance(result, dict) else []
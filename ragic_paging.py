@@ -0,0 +1,416 @@
+# -*- coding: utf-8 -*-
+"""
+Ragic 分頁規劃模組（與傳輸層無關）
+
+RagicClient（requests）與 AsyncRagicClient（httpx）共用的分頁規劃與逐頁過濾：
+- IncrementalPagePlanner：_ragicId 遞增掃描的 offset/limit 配置、keyset 水位與退回 offset、分頁大小回饋、停止判斷
+- ModifiedDescPlanner：依最後修改欄位遞減掃描的請求參數、排序欄位選定與停止判斷
+- StartOffsetLocator：以單筆探測二分搜尋增量起始 offset
+
+規劃器只產生請求參數並消化回應資料，實際的請求、重試與預抓由各客戶端負責。
+"""
+
+import logging
+from typing import List, Dict, Any, Optional, Callable, Tuple
+from datetime import datetime
+
+from page_size_controller import AdaptivePageSizeController
+
+
+def _record_ragic_id(record: Dict[str, Any]) -> Optional[int]:
+    """取得記錄的 _ragicId（無法解析時回傳 None）"""
+    try:
+        return int(record.get('_ragicId'))
+    except (TypeError, ValueError):
+        return None
+
+
+class _IncrementalPageFilter:
+    """
+    fetch_since_local_paged 的逐頁過濾與停止判斷
+
+    頁面必須依 offset 順序餵入；feed() 回傳（本頁保留的資料, 是否停止）。
+    """
+
+    def __init__(
+        self,
+        parse_dt: Callable[[Any], Optional[datetime]],
+        since_dt: datetime,
+        until_dt: Optional[datetime],
+        last_modified_field_names: List[str],
+        no_new_data_pages_threshold: int = 2
+    ):
+        self.parse_dt = parse_dt
+        self.since_dt = since_dt
+        self.until_dt = until_dt
+        self.last_modified_field_names = last_modified_field_names
+        self.no_new_data_pages_threshold = no_new_data_pages_threshold
+        self.pages = 0
+        self.consecutive_no_new_data_pages = 0 # 連續無新資料頁面計數
+
+    def feed(self, data: List[Dict[str, Any]], limit: int) -> Tuple[List[Dict[str, Any]], bool]:
+        self.pages += 1
+        pages = self.pages
+        logging.info(f"[fetch_since_local_paged] 第 {pages} 頁：API 返回 {len(data)} 筆資料")
+        if not data:
+            logging.info(f"[fetch_since_local_paged] 第 {pages} 頁無資料，停止")
+            return [], True
+
+        kept: List[Dict[str, Any]] = []
+        any_parsed = False
+        page_new_data_count = 0 # 記錄本頁符合原始 since_dt 的新資料筆數
+        first_rec_dt = None
+        last_rec_dt = None
+
+        for rec in data:
+            # 嘗試多個可能的「最後修改」欄位名稱
+            dt = None
+            for name in self.last_modified_field_names:
+                if name in rec:
+                    dt = self.parse_dt(rec.get(name))
+                    if dt:
+                        any_parsed = True
+                        if first_rec_dt is None:
+                            first_rec_dt = dt
+                        last_rec_dt = dt
+                        break
+
+            # 比較時使用原始的 since_dt (UTC)
+            if dt and self.until_dt and dt > self.until_dt:
+                # 超過上界，不納入
+                pass
+            elif dt and dt >= self.since_dt:  # 比較原始 since_dt，允許相等時間（MERGE 會去重）
+                kept.append(rec)
+                page_new_data_count += 1
+            # else: 資料比原始 since_dt 舊，不處理
+
+        # 詳細記錄每頁處理結果
+        if first_rec_dt:
+            logging.info(f"[fetch_since_local_paged] 第 {pages} 頁日期範圍: {first_rec_dt.isoformat()} ~ {last_rec_dt.isoformat()}")
+        logging.info(f"[fetch_since_local_paged] 第 {pages} 頁符合原始 since_dt 條件: {page_new_data_count} 筆")
+
+        # 智慧提前停止邏輯
+        # 由於現在是按 _ragicId 遞增排序，如果一頁中沒有任何新資料，
+        # 則可以合理推斷後續頁面也不會有新資料，因此可以提前停止。
+        if page_new_data_count == 0:
+            self.consecutive_no_new_data_pages += 1
+            logging.info(f"[fetch_since_local_paged] 連續無新資料頁面計數: {self.consecutive_no_new_data_pages}")
+        else:
+            self.consecutive_no_new_data_pages = 0
+
+        if self.consecutive_no_new_data_pages >= self.no_new_data_pages_threshold:
+            logging.info(f"[fetch_since_local_paged] 連續 {self.no_new_data_pages_threshold} 頁無新資料，提前停止抓取")
+            return kept, True
+
+        if len(data) < limit:
+            logging.info(f"[fetch_since_local_paged] 第 {pages} 頁資料不足一頁 ({len(data)} < {limit})，停止")
+            return kept, True
+        if not any_parsed:
+            # 當頁皆無法解析日期，避免無限抓取
+            logging.warning(f"[fetch_since_local_paged] 第 {pages} 頁無法解析任何日期，停止")
+            return kept, True
+
+        return kept, False
+
+class _ModifiedDescPageFilter:
+    """
+    依最後修改欄位遞減排序掃描時的逐頁過濾與停止判斷
+
+    feed() 回傳（本頁保留的資料, 是否停止, 排序是否符合遞減）；
+    排序不符時呼叫端應捨棄此策略，退回 _ragicId 遞增掃描。
+    """
+
+    def __init__(
+        self,
+        parse_dt: Callable[[Any], Optional[datetime]],
+        since_dt: datetime,
+        until_dt: Optional[datetime],
+        order_field: str
+    ):
+        self.parse_dt = parse_dt
+        self.since_dt = since_dt
+        self.until_dt = until_dt
+        self.order_field = order_field
+        self.pages = 0
+        self.prev_dt: Optional[datetime] = None # 上一筆（含前頁）的修改時間
+
+    def feed(self, data: List[Dict[str, Any]], limit: int) -> Tuple[List[Dict[str, Any]], bool, bool]:
+        self.pages += 1
+        pages = self.pages
+        logging.info(f"[fetch_modified_desc] 第 {pages} 頁：API 返回 {len(data)} 筆資料")
+        if not data:
+            return [], True, True
+
+        kept: List[Dict[str, Any]] = []
+        oldest_dt = None
+        for rec in data:
+            dt = self.parse_dt(rec.get(self.order_field))
+            if dt is None:
+                # 空白修改時間不參與排序判斷，也不納入
+                continue
+            if self.prev_dt is not None and dt > self.prev_dt:
+                logging.warning(f"[fetch_modified_desc] 第 {pages} 頁未依 {self.order_field} 遞減排序（{dt.isoformat()} > {self.prev_dt.isoformat()}）")
+                return kept, True, False
+            self.prev_dt = dt
+            oldest_dt = dt
+            if self.until_dt and dt > self.until_dt:
+                continue
+            if dt >= self.since_dt:
+                kept.append(rec)
+
+        if oldest_dt is None:
+            logging.warning(f"[fetch_modified_desc] 第 {pages} 頁無法解析任何 {self.order_field}")
+            return kept, True, False
+
+        logging.info(f"[fetch_modified_desc] 第 {pages} 頁最舊 {oldest_dt.isoformat()}，符合條件 {len(kept)} 筆")
+        if oldest_dt < self.since_dt:
+            logging.info(f"[fetch_modified_desc] 第 {pages} 頁已早於 since_dt，停止")
+            return kept, True, True
+        if len(data) < limit:
+            logging.info(f"[fetch_modified_desc] 第 {pages} 頁資料不足一頁 ({len(data)} < {limit})，停止")
+            return kept, True, True
+        return kept, False, True
+
+
+def _pick_order_field(data: List[Dict[str, Any]], last_modified_field_names: List[str]) -> Optional[str]:
+    """在頁面資料中找出第一個存在的最後修改欄位名稱"""
+    for name in last_modified_field_names:
+        if any(name in rec for rec in data):
+            return name
+    return None
+
+
+class IncrementalPagePlanner:
+    """
+    _ragicId 遞增掃描的分頁規劃
+
+    呼叫端流程：以 can_submit() 判斷可否再送出請求，next_params() 取得下一頁參數（依 offset 順序配置），
+    回應依送出順序交給 on_page()；逾時交給 on_timeout()。
+    on_page() 回傳 (None, False) 表示本頁因 keyset 退回 offset 而捨棄，呼叫端繼續迴圈即可。
+    """
+
+    def __init__(
+        self,
+        sheet_id: str,
+        page_filter: _IncrementalPageFilter,
+        limit: int,
+        max_pages: int,
+        prefetch_pages: int = 1,
+        page_size_controller: Optional[AdaptivePageSizeController] = None,
+        pagination: str = 'offset',
+        start_offset: int = 0
+    ):
+        """
+        Args:
+            sheet_id: 表單 ID（分頁大小控制器以此區分）
+            page_filter: 逐頁過濾器
+            limit: 每頁筆數（有控制器時為尚無學習紀錄時的初始值）
+            max_pages: 最多處理頁數
+            prefetch_pages: 同時在途的分頁請求數（keyset 模式固定為 1）
+            page_size_controller: 分頁大小自動調整（None = 固定 limit）
+            pagination: 'offset' 或 'keyset'
+            start_offset: 起始 offset
+        """
+        self.sheet_id = sheet_id
+        self.page_filter = page_filter
+        self.limit = limit
+        self.max_pages = max_pages
+        self.page_size_controller = page_size_controller
+        self.keyset = pagination == 'keyset'
+        self.prefetch = max(1, int(prefetch_pages or 1))
+        if self.keyset:
+            # keyset 模式下每頁依賴上一頁結果，因此不預抓
+            logging.info("[fetch_since_local_paged] keyset 分頁：以最後 _ragicId 續抓")
+            self.prefetch = 1
+        if self.prefetch > 1:
+            logging.info(f"[fetch_since_local_paged] 預抓模式：同時 {self.prefetch} 個分頁請求")
+
+        self.next_offset = int(start_offset or 0)
+        self.raw_seen = self.next_offset # 已處理的原始筆數（keyset 退回 offset 時的起點）
+        self.watermark: Optional[int] = None # keyset 水位：已處理的最大 _ragicId
+        self.submitted = 0
+        self.pages = 0
+        self.kept_total = 0
+
+    def has_more(self) -> bool:
+        """是否還能處理下一頁"""
+        return self.pages < self.max_pages
+
+    def can_submit(self, in_flight: int) -> bool:
+        """在途請求數為 in_flight 時可否再送出一頁"""
+        return self.submitted < self.max_pages and in_flight < self.prefetch
+
+    def next_params(self) -> Dict[str, Any]:
+        """依序配置下一頁的 offset/limit；強制使用 _ragicId 進行遞增排序"""
+        page_limit = self.page_size_controller.get_limit(self.sheet_id, self.limit) if self.page_size_controller else self.limit
+        params = {'api': '', 'v': 3, 'limit': page_limit, 'offset': self.next_offset, 'orderBy': '_ragicId,asc'}
+        if self.keyset and self.watermark is not None:
+            params['offset'] = 0
+            params['where'] = f'_ragicId,gt,{self.watermark}'
+        else:
+            self.next_offset += page_limit
+        self.submitted += 1
+        return params
+
+    def on_timeout(self, params: Dict[str, Any]) -> None:
+        """讀取逾時：回饋給分頁大小控制器"""
+        if self.page_size_controller:
+            self.page_size_controller.record_timeout(self.sheet_id, params['limit'])
+
+    def on_page(
+        self,
+        params: Dict[str, Any],
+        data: List[Dict[str, Any]],
+        elapsed: float,
+        payload_bytes: int
+    ) -> Tuple[Optional[List[Dict[str, Any]]], bool]:
+        """
+        處理一頁回應
+
+        Returns:
+            Tuple[本頁保留的資料（None 表示本頁捨棄、須重新請求）, 是否停止]
+        """
+        page_limit = params['limit']
+        if self.page_size_controller:
+            self.page_size_controller.record(self.sheet_id, page_limit, elapsed, payload_bytes, len(data))
+        if self.keyset:
+            ids = [_record_ragic_id(rec) for rec in data]
+            if 'where' in params and any(i is None or i <= self.watermark for i in ids):
+                # 伺服端未套用 keyset where：捨棄本頁，自 raw_seen 改用 offset 分頁
+                logging.warning(f"[fetch_since_local_paged] {self.sheet_id} 不支援 keyset 分頁，退回 offset 分頁（offset={self.raw_seen}）")
+                self.keyset = False
+                self.next_offset = self.raw_seen
+                self.submitted -= 1
+                return None, False
+            if ids and all(i is not None for i in ids):
+                self.watermark = max(ids)
+            elif data:
+                logging.warning(f"[fetch_since_local_paged] {self.sheet_id} 記錄缺少 _ragicId，退回 offset 分頁")
+                self.keyset = False
+                self.next_offset = self.raw_seen + len(data)
+        self.raw_seen += len(data)
+        self.pages += 1
+        kept, stop = self.page_filter.feed(data, page_limit)
+        self.kept_total += len(kept)
+        return kept, stop
+
+
+class ModifiedDescPlanner:
+    """
+    依最後修改欄位遞減排序掃描的分頁規劃（orderBy=<欄位>,desc）
+
+    排序欄位先取 last_modified_field_names 的第一個；第一頁資料中不存在該欄位時，改用實際存在的欄位重抓第一頁。
+    on_page() 回傳（本頁保留的資料, 是否停止, 是否可用此策略）；不可用時呼叫端應退回 _ragicId 遞增掃描。
+    """
+
+    def __init__(
+        self,
+        parse_dt: Callable[[Any], Optional[datetime]],
+        since_dt: datetime,
+        until_dt: Optional[datetime],
+        last_modified_field_names: List[str],
+        limit: int,
+        max_pages: int
+    ):
+        self.parse_dt = parse_dt
+        self.since_dt = since_dt
+        self.until_dt = until_dt
+        self.last_modified_field_names = last_modified_field_names
+        self.limit = limit
+        self.max_pages = max_pages
+        self.order_field = last_modified_field_names[0] if last_modified_field_names else None
+        self.page_filter = _ModifiedDescPageFilter(parse_dt, since_dt, until_dt, self.order_field) if self.order_field else None
+        self.offset = 0
+        self.pages = 0
+        self.kept_total = 0
+        self.repicked = False
+
+    def usable(self) -> bool:
+        """是否有可用的排序欄位"""
+        return self.order_field is not None
+
+    def has_more(self) -> bool:
+        return self.pages < self.max_pages
+
+    def next_params(self) -> Dict[str, Any]:
+        return {'api': '', 'v': 3, 'limit': self.limit, 'offset': self.offset, 'orderBy': f'{self.order_field},desc'}
+
+    def on_page(self, data: List[Dict[str, Any]], sheet_id: str = '') -> Tuple[List[Dict[str, Any]], bool, bool]:
+        if self.pages == 0 and data and not self.repicked:
+            picked = _pick_order_field(data, self.last_modified_field_names)
+            if picked is None:
+                return [], True, False
+            if picked != self.order_field:
+                # 第一個欄位名稱不存在於此表，改用實際存在的欄位重新排序（重抓第一頁）
+                logging.info(f"[fetch_modified_desc] {sheet_id} 改以 {picked} 排序")
+                self.order_field = picked
+                self.repicked = True
+                self.page_filter = _ModifiedDescPageFilter(self.parse_dt, self.since_dt, self.until_dt, picked)
+                return [], False, True
+        self.pages += 1
+        self.offset += self.limit
+        kept, stop, ordered = self.page_filter.feed(data, self.limit)
+        if ordered:
+            self.kept_total += len(kept)
+        return kept, stop, ordered
+
+
+class StartOffsetLocator:
+    """
+    以單筆請求（limit=1，_ragicId 遞增）二分搜尋第一筆 field_name 不早於 since_dt 的 offset
+
+    適用於 field_name 隨 _ragicId 大致遞增的表（例如建立日期）：先倍增找出上界，再於區間內二分，
+    約 2*log2(n) 次探測。無法解析日期的探測點視為「不早於 since_dt」，結果只會偏早不會偏晚。
+    呼叫端流程：next_offset() 取得探測點（None 表示結束），以 probe_params() 請求後將資料交給 feed()，
+    最後以 start_offset() 取得結果。
+    """
+
+    def __init__(self, parse_dt: Callable[[Any], Optional[datetime]], since_dt: datetime, field_name: str, max_probes: int = 64):
+        self.parse_dt = parse_dt
+        self.since_dt = since_dt
+        self.field_name = field_name
+        self.max_probes = max_probes
+        self.probes = 0
+        self.lo: Optional[int] = None # 已知早於 since_dt 的 offset；None 表示尚未確認 offset 0
+        self.hi = 0 # 待確認的上界
+        self.expanding = True
+        self.done = False
+
+    @staticmethod
+    def probe_params(offset: int) -> Dict[str, Any]:
+        return {'api': '', 'v': 3, 'limit': 1, 'offset': offset, 'orderBy': '_ragicId,asc'}
+
+    def next_offset(self) -> Optional[int]:
+        if self.done or self.probes >= self.max_probes:
+            return None
+        if self.lo is None or self.expanding:
+            return self.hi
+        if self.hi - self.lo > 1:
+            return (self.lo + self.hi) // 2
+        return None
+
+    def feed(self, offset: int, data: List[Dict[str, Any]]) -> None:
+        """餵入 offset 處的探測結果（超出資料範圍時 data 為空）"""
+        self.probes += 1
+        dt = self.parse_dt(data[0].get(self.field_name)) if data else None
+        before = dt is not None and dt < self.since_dt
+        if self.lo is None:
+            if before:
+                self.lo, self.hi = 0, 1
+            else:
+                self.done = True
+        elif self.expanding:
+            if before:
+                self.lo, self.hi = self.hi, self.hi * 2
+            else:
+                self.expanding = False
+        elif before:
+            self.lo = offset
+        else:
+            self.hi = offset
+
+    def start_offset(self, slack: int = 0) -> int:
+        """起始 offset（再往前退 slack 筆以吸收非嚴格遞增的誤差）"""
+        if self.lo is None:
+            return 0
+        return max(0, self.lo + 1 - max(0, int(slack)))
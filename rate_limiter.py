@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+Ragic API 速率限制模組
+以 token bucket 控制每秒請求數（含突發量），取代固定的 time.sleep 間隔；
+同步（多執行緒）與非同步呼叫端可共用同一個實例，並支援 429 / Retry-After 退避。
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+
+class TokenBucketRateLimiter:
+    """
+    Token bucket 速率限制器（執行緒安全）
+
+    - 以 rate_per_second 的速度補充 token，最多累積 burst 個
+    - 每個請求前呼叫 acquire()（或 acquire_async()）取得一個 token
+    - 收到 429 / Retry-After 時呼叫 penalize()，在指定時間內暫停所有呼叫端
+    """
+
+    def __init__(self, rate_per_second: float = 2.0, burst: int = 2):
+        """
+        初始化速率限制器
+
+        Args:
+            rate_per_second: 每秒允許的請求數（<= 0 表示不限速）
+            burst: 允許的突發請求數（bucket 容量）
+        """
+        self.rate_per_second = float(rate_per_second)
+        self.burst = max(1, int(burst))
+        self._tokens = float(self.burst)
+        self._last_refill = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """嘗試取得一個 token；成功回傳 0，否則回傳建議等待秒數。"""
+        with self._lock:
+            now = time.monotonic()
+            if now < self._blocked_until:
+                return self._blocked_until - now
+            if self.rate_per_second <= 0:
+                return 0.0
+            elapsed = now - self._last_refill
+            self._tokens = min(float(self.burst), self._tokens + elapsed * self.rate_per_second)
+            self._last_refill = now
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                return 0.0
+            return (1.0 - self._tokens) / self.rate_per_second
+
+    def acquire(self) -> float:
+        """
+        阻塞直到取得一個 token
+
+        Returns:
+            float: 實際等待秒數
+        """
+        waited = 0.0
+        while True:
+            wait = self._reserve()
+            if wait <= 0:
+                return waited
+            time.sleep(wait)
+            waited += wait
+
+    async def acquire_async(self) -> float:
+        """acquire() 的非同步版本（等待期間讓出 event loop）"""
+        waited = 0.0
+        while True:
+            wait = self._reserve()
+            if wait <= 0:
+                return waited
+            await asyncio.sleep(wait)
+            waited += wait
+
+    def penalize(self, delay_seconds: float) -> None:
+        """
+        伺服端要求降速（429 / Retry-After）：在 delay_seconds 內暫停所有呼叫端，並清空 bucket
+
+        Args:
+            delay_seconds: 暫停秒數
+        """
+        if delay_seconds <= 0:
+            return
+        with self._lock:
+            until = time.monotonic() + delay_seconds
+            if until > self._blocked_until:
+                self._blocked_until = until
+            self._tokens = 0.0
+            self._last_refill = until
+        logging.warning(f"Ragic 要求降速，暫停 {delay_seconds:.1f} 秒")
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    解析 Retry-After 標頭（秒數或 HTTP 日期），無法解析時回傳 None
+
+    Args:
+        value: Retry-After 標頭值
+
+    Returns:
+        Optional[float]: 需等待的秒數
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def create_rate_limiter(rate_per_second: float = 2.0, burst: int = 2) -> TokenBucketRateLimiter:
+    """
+    建立速率限制器的工廠函數
+
+    Args:
+        rate_per_second: 每秒允許的請求數（<= 0 表示不限速）
+        burst: 允許的突發請求數
+
+    Returns:
+        TokenBucketRateLimiter: 速率限制器實例
+    """
+    return TokenBucketRateLimiter(rate_per_second=rate_per_second, burst=burst)
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+Cloud Function 冷啟動匯入時間基準測試
+
+以 `python -X importtime -c "import main"` 在全新的子行程中量測匯入 main.py 的時間，
+列出累計耗時最高的模組，並可將結果附加到 JSON Lines 歷史檔以追蹤冷啟動時間的變化。
+
+用法：
+    python scripts/benchmark_import_time.py [--module main] [--repeat 5] [--top 15]
+        [--history scripts/import_time_history.jsonl] [--max-ms 800]
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# import time:    self [us] | cumulative | imported package
+_IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)\s*$")
+
+
+def measure(module: str) -> Tuple[float, Dict[str, int]]:
+    """
+    在新的子行程中匯入模組一次
+
+    Returns:
+        Tuple[總匯入時間（毫秒）, 模組 → 累計耗時（微秒）]
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT_DIR,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise Exception(f"匯入 {module} 失敗: {proc.stderr.strip().splitlines()[-1:]}")
+
+    cumulative: Dict[str, int] = {}
+    total_us = 0
+    for line in proc.stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        _, cum_us, indent, name = match.groups()
+        cumulative[name] = int(cum_us)
+        if name == module and len(indent) == 1:
+            total_us = int(cum_us)
+    return total_us / 1000, cumulative
+
+
+def git_revision() -> Optional[str]:
+    """目前的 git commit（無法取得時回傳 None）"""
+    try:
+        proc = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, capture_output=True, text=True)
+        return proc.stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Cloud Function 冷啟動匯入時間基準測試")
+    parser.add_argument("--module", default="main", help="要量測的模組")
+    parser.add_argument("--repeat", type=int, default=5, help="重複次數（取中位數）")
+    parser.add_argument("--top", type=int, default=15, help="列出累計耗時最高的模組數")
+    parser.add_argument("--history", help="附加結果的 JSON Lines 歷史檔")
+    parser.add_argument("--max-ms", type=float, help="匯入時間上限（毫秒），超過時回傳非零結束碼")
+    args = parser.parse_args()
+
+    totals: List[float] = []
+    samples: List[Dict[str, int]] = []
+    for _ in range(args.repeat):
+        total_ms, cumulative = measure(args.module)
+        totals.append(total_ms)
+        samples.append(cumulative)
+
+    median_ms = statistics.median(totals)
+    # 以中位數那次的明細列出耗時最高的模組
+    detail = samples[totals.index(sorted(totals)[len(totals) // 2])]
+    print(f"匯入 {args.module}：中位數 {median_ms:.1f} ms（最小 {min(totals):.1f} ms，最大 {max(totals):.1f} ms，{args.repeat} 次）")
+    print(f"{'累計(ms)':>10}  模組")
+    top = sorted(detail.items(), key=lambda item: item[1], reverse=True)[:args.top]
+    for name, cum_us in top:
+        print(f"{cum_us / 1000:10.1f}  {name}")
+
+    if args.history:
+        entry = {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "revision": git_revision(),
+            "python": sys.version.split()[0],
+            "module": args.module,
+            "median_ms": round(median_ms, 1),
+            "min_ms": round(min(totals), 1),
+            "top": {name: round(cum_us / 1000, 1) for name, cum_us in top},
+        }
+        with open(args.history, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        print(f"已寫入 {args.history}")
+
+    if args.max_ms is not None and median_ms > args.max_ms:
+        print(f"匯入時間 {median_ms:.1f} ms 超過上限 {args.max_ms:.1f} ms")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
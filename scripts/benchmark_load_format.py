@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+BigQuery 載入檔格式微基準測試
+
+以模擬的銷售總表（sheet 99）轉換結果，比較 load_table_from_json 的換行分隔 JSON（datetime 先轉為
+ISO 字串）與 load_serializer 產生的 Parquet（需 pyarrow）、Avro（需 fastavro）的序列化時間與位元組數，
+並將 Parquet、Avro 讀回確認內容一致。
+
+用法：
+    python scripts/benchmark_load_format.py [--records 20000] [--sheet 99] [--repeat 3]
+"""
+
+import argparse
+import io
+import json
+import logging
+import os
+import sys
+import time
+from datetime import date, datetime
+from typing import Any, Callable, Dict, List
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+for path in (ROOT_DIR, SCRIPTS_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from data_transformer import BIGQUERY_SCHEMA, DataTransformer  # noqa: E402
+from load_serializer import HAS_FASTAVRO, HAS_PYARROW, serialize_avro, serialize_parquet  # noqa: E402
+from benchmark_transform_plan import build_records  # noqa: E402
+
+
+def serialize_json(rows: List[Dict[str, Any]]) -> bytes:
+    """與 Client.load_table_from_json 相同的序列化方式（只保留 schema 欄位，datetime 轉為 ISO 字串）"""
+    allowed = {f.name for f in BIGQUERY_SCHEMA}
+    lines = []
+    for row in rows:
+        item = {k: (v.isoformat() if isinstance(v, (datetime, date)) else v) for k, v in row.items() if k in allowed}
+        lines.append(json.dumps(item, ensure_ascii=False))
+    return "\n".join(lines).encode()
+
+
+def bench(name: str, fn: Callable[[], bytes], rows: int, repeat: int) -> None:
+    best = float("inf")
+    size = 0
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        size = len(fn())
+        best = min(best, time.perf_counter() - t0)
+    print(f"{name:<8} {best:8.3f} s  ({rows / best:,.0f} 筆/秒)  {size:>12,} bytes  ({size / rows:,.0f} bytes/筆)")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="BigQuery 載入檔格式微基準測試")
+    parser.add_argument("--records", type=int, default=20000, help="模擬記錄筆數")
+    parser.add_argument("--sheet", default="99", help="表單代碼")
+    parser.add_argument("--repeat", type=int, default=3, help="重複次數（取最快）")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    transformer = DataTransformer(sheet_code=args.sheet)
+    rows = transformer.transform_data(build_records(transformer, args.records))
+    schema = BIGQUERY_SCHEMA
+
+    if HAS_PYARROW:
+        import pyarrow.parquet as pq
+        table = pq.read_table(io.BytesIO(serialize_parquet(rows[:2000], schema)))
+        # DATE 欄位讀回為 date，轉回轉換器輸出的 "YYYY-MM-DD" 字串後比對
+        actual = [
+            {k: (v.isoformat() if type(v) is date else v) for k, v in row.items()}
+            for row in table.to_pylist()
+        ]
+        expected = [{f.name: row.get(f.name) for f in schema} for row in rows[:2000]]
+        if actual != expected:
+            print("Parquet 讀回結果不一致")
+            return 1
+        print(f"Parquet 讀回一致（{len(rows)} 筆，{len(schema)} 個欄位）")
+
+    if HAS_FASTAVRO:
+        import fastavro
+        actual = [
+            {k: (v.isoformat() if type(v) is date else v) for k, v in row.items()}
+            for row in fastavro.reader(io.BytesIO(serialize_avro(rows[:2000], schema)))
+        ]
+        expected = [{f.name: row.get(f.name) for f in schema} for row in rows[:2000]]
+        if actual != expected:
+            print("Avro 讀回結果不一致")
+            return 1
+        print(f"Avro 讀回一致（{len(rows)} 筆，{len(schema)} 個欄位）")
+
+    bench("json", lambda: serialize_json(rows), len(rows), args.repeat)
+    if HAS_PYARROW:
+        bench("parquet", lambda: serialize_parquet(rows, schema), len(rows), args.repeat)
+    else:
+        print("未安裝 pyarrow，略過 Parquet")
+    if HAS_FASTAVRO:
+        bench("avro", lambda: serialize_avro(rows, schema), len(rows), args.repeat)
+    else:
+        print("未安裝 fastavro，略過 Avro")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""
+temporal_parser 微基準測試
+
+比較原本逐一嘗試 strptime + zoneinfo 的解析方式與 temporal_parser（正規表示式快速路徑 +
+固定 +08:00 + LRU 快取），並確認兩者結果一致。
+
+用法：
+    python scripts/benchmark_temporal_parser.py [--records 50000] [--unique 5000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, List, Optional
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from temporal_parser import TAIPEI_TZ, parse_timestamp, parse_date, clear_cache  # noqa: E402
+
+_LEGACY_TIMESTAMP_FORMATS = [
+    "%Y-%m-%d %H:%M:%S",
+    "%Y/%m/%d %H:%M:%S",
+    "%Y-%m-%d %H:%M",
+    "%Y/%m/%d %H:%M",
+    "%Y-%m-%d",
+    "%Y/%m/%d",
+]
+
+_LEGACY_DATE_FORMATS = [
+    "%Y-%m-%d",
+    "%Y/%m/%d",
+    "%Y%m%d",
+    "%Y-%m-%d %H:%M:%S",
+    "%Y/%m/%d %H:%M:%S",
+    "%Y-%m-%d %H:%M",
+    "%Y/%m/%d %H:%M",
+]
+
+
+def legacy_parse_timestamp(value: Any) -> Optional[datetime]:
+    """原 DataTransformer._normalize_timestamp 的解析流程（失敗回傳 None）"""
+    if not value:
+        return None
+    v = str(value).strip()
+    dt_naive = None
+    for fmt in _LEGACY_TIMESTAMP_FORMATS:
+        try:
+            dt_naive = datetime.strptime(v, fmt)
+            break
+        except ValueError:
+            continue
+    if dt_naive is None and v.isdigit() and len(v) == 14:
+        try:
+            dt_naive = datetime.strptime(v, "%Y%m%d%H%M%S")
+        except ValueError:
+            pass
+    if dt_naive is None:
+        try:
+            dt_parsed = datetime.fromisoformat(v.replace("Z", "+00:00"))
+            if dt_parsed.tzinfo is not None:
+                return dt_parsed.astimezone(timezone.utc)
+            dt_naive = dt_parsed
+        except ValueError:
+            return None
+    return dt_naive.replace(tzinfo=TAIPEI_TZ).astimezone(timezone.utc)
+
+
+def legacy_parse_date(value: str) -> Optional[str]:
+    """原 DataTransformer._normalize_date 的解析流程（不含月/日推斷）"""
+    for fmt in _LEGACY_DATE_FORMATS:
+        try:
+            return datetime.strptime(value.strip(), fmt).strftime("%Y-%m-%d")
+        except ValueError:
+            continue
+    return None
+
+
+def build_values(records: int, unique: int) -> List[str]:
+    """產生模擬 Ragic 時間欄位的字串（含重複值與少量特殊格式）"""
+    rnd = random.Random(42)
+    base = datetime(2024, 1, 1)
+    pool = []
+    for i in range(unique):
+        dt = base + timedelta(seconds=rnd.randint(0, 86400 * 600))
+        kind = i % 10
+        if kind < 6:
+            pool.append(dt.strftime("%Y/%m/%d %H:%M:%S"))
+        elif kind < 8:
+            pool.append(dt.strftime("%Y/%m/%d"))
+        elif kind == 8:
+            pool.append(dt.strftime("%Y-%m-%dT%H:%M:%S"))
+        else:
+            pool.append(dt.strftime("%Y%m%d%H%M%S"))
+    pool.extend(["1975/06/01 12:00:00", "不指定", "2025/13/40", "2025/1/5 3:04"])
+    return [rnd.choice(pool) for _ in range(records)]
+
+
+def bench(name: str, fn: Callable[[str], Any], values: List[str]) -> float:
+    t0 = time.perf_counter()
+    for v in values:
+        fn(v)
+    elapsed = time.perf_counter() - t0
+    print(f"{name:<32} {elapsed:8.3f} s  ({len(values) / elapsed:,.0f} 筆/秒)")
+    return elapsed
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="temporal_parser 微基準測試")
+    parser.add_argument("--records", type=int, default=50000, help="解析筆數")
+    parser.add_argument("--unique", type=int, default=5000, help="不重複時間值數量")
+    args = parser.parse_args()
+
+    values = build_values(args.records, args.unique)
+
+    mismatches = [v for v in set(values) if legacy_parse_timestamp(v) != parse_timestamp(v)]
+    mismatches += [v for v in set(values) if legacy_parse_date(v) != parse_date(v)]
+    if mismatches:
+        print(f"結果不一致：{mismatches[:10]}")
+        return 1
+    print(f"結果一致（{len(set(values))} 種輸入）")
+
+    clear_cache()
+    legacy_ts = bench("legacy timestamp", legacy_parse_timestamp, values)
+    new_ts = bench("temporal_parser timestamp", parse_timestamp, values)
+    clear_cache()
+    legacy_d = bench("legacy date", legacy_parse_date, values)
+    new_d = bench("temporal_parser date", parse_date, values)
+    print(f"timestamp 加速 {legacy_ts / new_ts:.1f}x，date 加速 {legacy_d / new_d:.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
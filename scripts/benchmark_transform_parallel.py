@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+多行程平行轉換微基準測試
+
+以 benchmark_transform_plan 的模擬資料，比較單一行程轉換與 transform_in_process_pool（含啟動行程池、
+序列化區塊與合併結果的成本）在不同筆數下的耗時，用來決定 TRANSFORM_PARALLEL_MIN_ROWS 的門檻。
+行程數不受本機 CPU 核心數限制，核心數少於行程數時的結果僅供參考。
+另列出主行程序列化記錄與反序列化結果的耗時：這部分無法平行化，若已高於單一行程轉換，
+行程池在任何筆數與核心數下都不會勝出。
+
+用法：
+    python scripts/benchmark_transform_parallel.py [--records 20000,100000] [--workers 4] [--sheet 99] [--repeat 3]
+"""
+
+import argparse
+import logging
+import os
+import pickle
+import sys
+import time
+from typing import Any, Dict, List
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+if SCRIPTS_DIR not in sys.path:
+    sys.path.insert(0, SCRIPTS_DIR)
+
+from benchmark_transform_plan import build_records  # noqa: E402
+from data_transformer import DataTransformer  # noqa: E402
+from parallel_transformer import transform_in_process_pool  # noqa: E402
+
+
+def run_inline(sheet: str, records: List[Dict[str, Any]], repeat: int) -> float:
+    """單一行程轉換，取 repeat 次中最快的一次"""
+    best = float("inf")
+    for _ in range(repeat):
+        transformer = DataTransformer(sheet_code=sheet)
+        t0 = time.perf_counter()
+        transformer._transform_records(records)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def run_pool(sheet: str, records: List[Dict[str, Any]], workers: int, repeat: int) -> float:
+    """多行程轉換（每次重新建立行程池），取 repeat 次中最快的一次"""
+    best = float("inf")
+    for _ in range(repeat):
+        transformer = DataTransformer(sheet_code=sheet)
+        t0 = time.perf_counter()
+        transform_in_process_pool(transformer, records, workers)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def run_serialization(sheet: str, records: List[Dict[str, Any]]) -> float:
+    """主行程端的序列化成本：pickle 原始記錄 + unpickle 轉換結果"""
+    rows = DataTransformer(sheet_code=sheet)._transform_records(records)
+    payload = pickle.dumps(rows, pickle.HIGHEST_PROTOCOL)
+    t0 = time.perf_counter()
+    pickle.dumps(records, pickle.HIGHEST_PROTOCOL)
+    pickle.loads(payload)
+    return time.perf_counter() - t0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="多行程平行轉換微基準測試")
+    parser.add_argument("--records", default="5000,20000,50000,100000", help="以逗號分隔的模擬記錄筆數")
+    parser.add_argument("--workers", type=int, default=4, help="子行程數")
+    parser.add_argument("--sheet", default="99", help="表單代碼")
+    parser.add_argument("--repeat", type=int, default=3, help="重複次數（取最快）")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    sizes = sorted(int(size) for size in args.records.split(","))
+    all_records = build_records(DataTransformer(sheet_code=args.sheet), sizes[-1])
+
+    sample = all_records[:3000]
+    inline_rows = DataTransformer(sheet_code=args.sheet)._transform_records(sample)
+    pool_rows = transform_in_process_pool(DataTransformer(sheet_code=args.sheet), sample, args.workers)
+    if inline_rows != pool_rows:
+        print("結果不一致")
+        return 1
+    print(f"結果一致（sheet {args.sheet}，{args.workers} 個行程，本機 {os.cpu_count()} 個 CPU 核心）")
+
+    print(f"{'筆數':>8}  {'單一行程':>10}  {'行程池':>10}  {'主行程序列化':>10}  {'比值':>6}")
+    crossover = None
+    for size in sizes:
+        records = all_records[:size]
+        t_inline = run_inline(args.sheet, records, args.repeat)
+        t_pool = run_pool(args.sheet, records, args.workers, args.repeat)
+        t_serial = run_serialization(args.sheet, records)
+        print(f"{size:>8}  {t_inline:>8.3f} s  {t_pool:>8.3f} s  {t_serial:>10.3f} s  {t_inline / t_pool:>5.2f}x")
+        if crossover is None and t_pool < t_inline:
+            crossover = size
+    if crossover is None:
+        print("行程池在所有測試筆數下皆未勝過單一行程")
+    else:
+        print(f"行程池自 {crossover} 筆起勝過單一行程")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
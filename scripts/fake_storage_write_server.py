@@ -0,0 +1,293 @@
+# -*- coding: utf-8 -*-
+"""
+本機假 BigQuery Storage Write 服務
+
+以 gRPC 實作 BigQueryWrite 的 CreateWriteStream / AppendRows / FinalizeWriteStream /
+BatchCommitWriteStreams / GetWriteStream，將寫入的列依 writer_schema 解碼後保存在記憶體，
+供 storage_writer 與 BigQueryUploader 的 storage_write 模式在本機驗證（需 google-cloud-bigquery-storage）。
+
+用法：
+    python scripts/fake_storage_write_server.py [--port 50051]     # 啟動服務，搭配 BIGQUERY_STORAGE_WRITE_ENDPOINT=localhost:50051
+    python scripts/fake_storage_write_server.py --self-test        # 啟動服務並以 committed/pending stream（含多個請求）寫入後逐筆比對，
+                                                                   # 並以缺少 row_hash 的 staging 表驗證 storage_write 上傳
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+import uuid
+from concurrent import futures
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, List
+
+import grpc
+from google.protobuf import json_format, timestamp_pb2
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from storage_writer import HAS_STORAGE_WRITE, build_message_class  # noqa: E402
+
+if HAS_STORAGE_WRITE:
+    from google.cloud.bigquery_storage_v1 import types  # noqa: E402
+
+SERVICE_NAME = "google.cloud.bigquery.storage.v1.BigQueryWrite"
+
+
+class FakeBigQueryWrite:
+    """記憶體內的 Storage Write 服務"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # stream 名稱 → {"table", "type", "rows", "finalized"}
+        self.streams: Dict[str, Dict[str, Any]] = {}
+        # 資料表路徑 → 已可見（committed）的列
+        self.tables: Dict[str, List[Dict[str, Any]]] = {}
+
+    def _now(self) -> timestamp_pb2.Timestamp:
+        ts = timestamp_pb2.Timestamp()
+        ts.FromDatetime(datetime.now(timezone.utc).replace(tzinfo=None))
+        return ts
+
+    def create_write_stream(self, request: Any, context: Any) -> Any:
+        name = f"{request.parent}/streams/{uuid.uuid4().hex}"
+        with self.lock:
+            self.streams[name] = {"table": request.parent, "type": request.write_stream.type_, "rows": [], "finalized": False}
+            self.tables.setdefault(request.parent, [])
+        return types.WriteStream(name=name, type_=request.write_stream.type_, create_time=self._now())
+
+    def append_rows(self, request_iterator: Any, context: Any) -> Any:
+        stream_name = None
+        message_class = None
+        for request in request_iterator:
+            stream_name = request.write_stream or stream_name
+            if request.proto_rows.writer_schema.proto_descriptor.name:
+                message_class = build_message_class(request.proto_rows.writer_schema.proto_descriptor)
+            with self.lock:
+                stream = self.streams.get(stream_name)
+                if stream is None or stream["finalized"] or message_class is None:
+                    yield types.AppendRowsResponse(error={"code": 9, "message": f"stream 不可寫入: {stream_name}"})
+                    continue
+                offset = len(stream["rows"])
+                if "offset" in request and request.offset != offset:
+                    # 與正式服務相同：指定的 offset 須等於 stream 目前的列數
+                    yield types.AppendRowsResponse(
+                        error={"code": 11, "message": f"offset {request.offset} 不符，stream 目前 {offset} 列"})
+                    continue
+                rows = [
+                    json_format.MessageToDict(message_class.FromString(raw), preserving_proto_field_name=True)
+                    for raw in request.proto_rows.rows.serialized_rows
+                ]
+                stream["rows"].extend(rows)
+                if stream["type"] == types.WriteStream.Type.COMMITTED:
+                    self.tables[stream["table"]].extend(rows)
+            yield types.AppendRowsResponse(append_result={"offset": offset}, write_stream=stream_name)
+
+    def finalize_write_stream(self, request: Any, context: Any) -> Any:
+        with self.lock:
+            stream = self.streams[request.name]
+            stream["finalized"] = True
+            return types.FinalizeWriteStreamResponse(row_count=len(stream["rows"]))
+
+    def batch_commit_write_streams(self, request: Any, context: Any) -> Any:
+        errors = []
+        with self.lock:
+            for name in request.write_streams:
+                stream = self.streams.get(name)
+                if stream is None or not stream["finalized"]:
+                    errors.append(types.StorageError(entity=name, error_message="stream 未 finalize"))
+                    continue
+                self.tables[stream["table"]].extend(stream["rows"])
+        if errors:
+            return types.BatchCommitWriteStreamsResponse(stream_errors=errors)
+        return types.BatchCommitWriteStreamsResponse(commit_time=self._now())
+
+    def get_write_stream(self, request: Any, context: Any) -> Any:
+        with self.lock:
+            stream = self.streams[request.name]
+            return types.WriteStream(name=request.name, type_=stream["type"])
+
+    def handler(self) -> grpc.GenericRpcHandler:
+        def unary(fn: Any, request_type: Any, response_type: Any) -> grpc.RpcMethodHandler:
+            return grpc.unary_unary_rpc_method_handler(
+                fn, request_deserializer=request_type.deserialize, response_serializer=response_type.serialize
+            )
+
+        return grpc.method_handlers_generic_handler(SERVICE_NAME, {
+            "CreateWriteStream": unary(self.create_write_stream, types.CreateWriteStreamRequest, types.WriteStream),
+            "AppendRows": grpc.stream_stream_rpc_method_handler(
+                self.append_rows,
+                request_deserializer=types.AppendRowsRequest.deserialize,
+                response_serializer=types.AppendRowsResponse.serialize,
+            ),
+            "FinalizeWriteStream": unary(self.finalize_write_stream, types.FinalizeWriteStreamRequest, types.FinalizeWriteStreamResponse),
+            "BatchCommitWriteStreams": unary(self.batch_commit_write_streams, types.BatchCommitWriteStreamsRequest, types.BatchCommitWriteStreamsResponse),
+            "GetWriteStream": unary(self.get_write_stream, types.GetWriteStreamRequest, types.WriteStream),
+        })
+
+
+def start_server(port: int) -> Any:
+    """啟動假服務，回傳 (grpc server, FakeBigQueryWrite, 實際 port)"""
+    service = FakeBigQueryWrite()
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=4))
+    server.add_generic_rpc_handlers((service.handler(),))
+    bound_port = server.add_insecure_port(f"localhost:{port}")
+    server.start()
+    return server, service, bound_port
+
+
+def _decode_row(row: Dict[str, Any], schema: List[Any]) -> Dict[str, Any]:
+    """將假服務保存的列（MessageToDict 結果）依 schema 還原為 Python 值；未寫入的欄位為 None"""
+    decoded: Dict[str, Any] = {}
+    for field in schema:
+        value = row.get(field.name)
+        if value is None:
+            decoded[field.name] = None
+        elif field.field_type == "INTEGER":
+            decoded[field.name] = int(value)
+        elif field.field_type == "DATE":
+            decoded[field.name] = (date(1970, 1, 1) + timedelta(days=int(value))).isoformat()
+        elif field.field_type == "TIMESTAMP":
+            decoded[field.name] = datetime(1970, 1, 1, tzinfo=timezone.utc) + timedelta(microseconds=int(value))
+        else:
+            decoded[field.name] = value
+    return decoded
+
+
+class _FakeBigQueryClient:
+    """BigQueryUploader 的 staging 流程所需的最小 BigQuery 客戶端（資料表只保存中繼資料，查詢立即完成）"""
+
+    class _Job:
+        errors = None
+
+        def result(self) -> None:
+            return None
+
+    def __init__(self, tables: Dict[str, Any]):
+        self.tables = tables
+        self.queries: List[str] = []
+
+    def get_dataset(self, dataset_ref: str) -> Any:
+        return dataset_ref
+
+    def get_table(self, table_ref: str) -> Any:
+        from google.cloud.exceptions import NotFound
+        if table_ref not in self.tables:
+            raise NotFound(f"Not found: Table {table_ref}")
+        return self.tables[table_ref]
+
+    def create_table(self, table: Any) -> Any:
+        self.tables[f"{table.project}.{table.dataset_id}.{table.table_id}"] = table
+        return table
+
+    def update_table(self, table: Any, fields: List[str]) -> Any:
+        return self.create_table(table)
+
+    def query(self, sql: str, job_config: Any = None) -> Any:
+        self.queries.append(sql)
+        return self._Job()
+
+
+def _staging_row_hash_test(port: int, service: FakeBigQueryWrite) -> bool:
+    """既有 staging 表沒有 row_hash 時，storage_write 上傳須先補上欄位，雜湊才會寫入 staging"""
+    from google.cloud import bigquery
+    from bigquery_uploader import BigQueryUploader
+    from data_transformer import compute_row_hash
+
+    staging_ref = "fake-project.ragic_backup.ragic_data_staging"
+    old_schema = [bigquery.SchemaField("order_id", "STRING"), bigquery.SchemaField("updated_at", "TIMESTAMP"),
+                  bigquery.SchemaField("batch_id", "STRING"), bigquery.SchemaField("ingested_at", "TIMESTAMP")]
+    bq = _FakeBigQueryClient({staging_ref: bigquery.Table(staging_ref, schema=old_schema)})
+    uploader = BigQueryUploader("fake-project", client=bq, include_row_hash=True,
+                                storage_write_endpoint=f"localhost:{port}", storage_write_stream="committed")
+    rows = [{"order_id": f"SO{i:05d}", "updated_at": datetime(2024, 1, 2, tzinfo=timezone.utc)} for i in range(10)]
+    for row in rows:
+        row["row_hash"] = compute_row_hash(row)
+    uploader.upload_data(rows, "ragic_backup", "ragic_data", upload_mode="storage_write")
+
+    staging_fields = [f.name for f in bq.tables[staging_ref].schema]
+    received = service.tables.get("projects/fake-project/datasets/ragic_backup/tables/ragic_data_staging", [])
+    hashes = [row.get("row_hash") for row in received]
+    if "row_hash" not in staging_fields or hashes != [row["row_hash"] for row in rows]:
+        print(f"staging_row_hash: staging 欄位 {staging_fields}，收到的雜湊 {hashes[:2]}… 不一致")
+        return False
+    print(f"staging_row_hash: 既有 staging 表已補上 row_hash，{len(received)} 筆雜湊寫入一致")
+    return True
+
+
+def self_test() -> int:
+    """
+    以 committed、pending stream 及多個請求（小請求上限）各寫入一批，
+    依 schema 還原假服務收到的列並與原始記錄逐筆比對；再以缺少 row_hash 的既有 staging 表
+    執行 BigQueryUploader 的 storage_write 上傳，確認欄位補上且雜湊寫入
+    """
+    from google.cloud import bigquery
+    from storage_writer import StorageWriteAppender, create_write_client
+
+    server, service, port = start_server(0)
+    try:
+        schema = [
+            bigquery.SchemaField("order_id", "STRING"),
+            bigquery.SchemaField("quantity", "INTEGER"),
+            bigquery.SchemaField("gross_revenue", "FLOAT"),
+            bigquery.SchemaField("is_invoice_issued", "BOOLEAN"),
+            bigquery.SchemaField("order_date", "DATE"),
+            bigquery.SchemaField("created_at", "TIMESTAMP"),
+        ]
+        rows = [
+            {"order_id": f"SO{i:05d}", "quantity": i % 7, "gross_revenue": None if i % 5 == 0 else i * 1.5,
+             "is_invoice_issued": i % 2 == 0, "order_date": "2024-01-02" if i % 11 else None,
+             "created_at": datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc) + timedelta(seconds=i),
+             "_ragicId": i}
+            for i in range(2500)
+        ]
+        expected = [{f.name: row.get(f.name) for f in schema} for row in rows]
+        client = create_write_client(f"localhost:{port}")
+        cases = (("committed", "committed", None), ("pending", "pending", None), ("pending_chunked", "pending", 16 * 1024))
+        for table, stream_type, max_request_bytes in cases:
+            kwargs = {"max_request_bytes": max_request_bytes} if max_request_bytes else {}
+            appender = StorageWriteAppender(client, "fake-project", "ragic_backup", table, schema, stream_type, **kwargs)
+            result = appender.append(rows)
+            received = service.tables[f"projects/fake-project/datasets/ragic_backup/tables/{table}"]
+            actual = [_decode_row(row, schema) for row in received]
+            if actual != expected:
+                mismatch = next((i for i, (a, e) in enumerate(zip(actual, expected)) if a != e), min(len(actual), len(expected)))
+                print(f"{table}: 收到 {len(received)} 筆，第 {mismatch} 筆起內容不一致")
+                return 1
+            print(f"{table}: 寫入 {result['rows']} 筆（{result['requests']} 個請求）逐筆一致")
+        return 0 if _staging_row_hash_test(port, service) else 1
+    finally:
+        server.stop(None)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="本機假 BigQuery Storage Write 服務")
+    parser.add_argument("--port", type=int, default=50051, help="監聽埠")
+    parser.add_argument("--self-test", action="store_true", help="執行自我測試後結束")
+    args = parser.parse_args()
+
+    if not HAS_STORAGE_WRITE:
+        print("未安裝 google-cloud-bigquery-storage")
+        return 1
+    if args.self_test:
+        return self_test()
+
+    server, service, port = start_server(args.port)
+    print(f"假 Storage Write 服務已啟動: localhost:{port}（Ctrl+C 結束）")
+    try:
+        while True:
+            time.sleep(5)
+            with service.lock:
+                summary = {table: len(rows) for table, rows in service.tables.items()}
+            if summary:
+                print(f"已寫入: {summary}")
+    except KeyboardInterrupt:
+        server.stop(None)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+MERGE 預儲程序產生與部署工具
+
+依 BIGQUERY_SCHEMA（--row-hash 時附加 row_hash）產生 sp_upsert_ragic_data；指定 --live 時再以目標表與 staging 表的實際欄位過濾，
+--deploy 時部署到 BigQuery（程序內容未變更則略過）。未指定專案時輸出含 ${PROJECT_ID} 等參數的範本。
+
+用法：
+    python scripts/generate_merge_sp.py > sql/create_merge_sp.sql          # 產生範本
+    python scripts/generate_merge_sp.py --project my-proj --dataset erp_backup --table ragic_data \\
+        [--partition-field created_at] [--cluster-fields order_id] [--row-hash] [--live] [--deploy]
+"""
+
+import argparse
+import logging
+import os
+import sys
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from data_transformer import get_bigquery_schema  # noqa: E402
+from merge_procedure import (  # noqa: E402
+    DEFAULT_PROCEDURE_NAME, build_merge_procedure, deploy_merge_procedure, resolve_merge_fields
+)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="MERGE 預儲程序產生與部署工具")
+    parser.add_argument("--project", default="${PROJECT_ID}", help="GCP 專案 ID")
+    parser.add_argument("--dataset", default="${DATASET_ID}", help="資料集 ID")
+    parser.add_argument("--table", default="${TARGET_TABLE}", help="目標表 ID")
+    parser.add_argument("--staging-table", help="staging 表 ID（預設為 <table>_staging）")
+    parser.add_argument("--procedure", default=DEFAULT_PROCEDURE_NAME, help="程序名稱")
+    parser.add_argument("--partition-field", help="目標表的分區欄位（批次範圍裁切）")
+    parser.add_argument("--cluster-fields", default="", help="目標表的叢集欄位（逗號分隔）")
+    parser.add_argument("--no-audit", action="store_true", help="不寫入 ragic_ingest_audit 審計表")
+    parser.add_argument("--row-hash", action="store_true", help="含 row_hash 欄位（TRANSFORM_ROW_HASH=true 時）；雜湊相同的列不更新")
+    parser.add_argument("--live", action="store_true", help="以目標表與 staging 表的實際欄位過濾")
+    parser.add_argument("--deploy", action="store_true", help="部署至 BigQuery（隱含 --live）")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s", stream=sys.stderr)
+
+    staging_table = args.staging_table or f"{args.table}_staging"
+    target_ref = f"{args.project}.{args.dataset}.{args.table}"
+    staging_ref = f"{args.project}.{args.dataset}.{staging_table}"
+    procedure_ref = f"{args.project}.{args.dataset}.{args.procedure}"
+
+    client = None
+    target_schema = staging_schema = None
+    if args.live or args.deploy:
+        if args.project.startswith("${"):
+            print("--live / --deploy 需要指定 --project、--dataset、--table", file=sys.stderr)
+            return 1
+        from google.cloud import bigquery
+        client = bigquery.Client(project=args.project)
+        target_schema = list(client.get_table(target_ref).schema)
+        staging_schema = list(client.get_table(staging_ref).schema)
+
+    fields = resolve_merge_fields(get_bigquery_schema(args.row_hash), target_schema, staging_schema)
+    definition = build_merge_procedure(
+        procedure_ref, target_ref, staging_ref, fields,
+        partition_field=args.partition_field,
+        cluster_fields=[f.strip() for f in args.cluster_fields.split(",") if f.strip()],
+        audit_table_ref=None if args.no_audit else f"{args.project}.{args.dataset}.ragic_ingest_audit",
+    )
+
+    if args.deploy:
+        deploy_merge_procedure(client, procedure_ref, definition)
+    else:
+        print(definition)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
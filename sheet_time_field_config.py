@@ -6,7 +6,7 @@ Sheet 時間欄位配置模組
 參考文件：Manual_fetch_all_Ragic/data/20251021-213544/data_structure_reference.yaml
 """
 
-from typing import List, Dict
+from typing import List, Dict, Optional
 
 # Sheet 時間欄位配置
 # 格式：{sheet_code: [優先欄位1, 欄位2, ...]}
@@ -23,6 +23,18 @@ SHEET_TIME_FIELDS: Dict[str, List[str]] = {
     "99": ["最後修改日期", "訂單成立日期", "建立日期"],  # 優先使用「最後修改日期」
 }
 
+# 建立時間欄位配置（隨 _ragicId 大致遞增，可用於二分搜尋增量起始 offset）
+# 格式：{sheet_code: 欄位名稱}；未列出的表不使用定位器（例如僅有「最後修改時間」的表）
+SHEET_CREATION_TIME_FIELDS: Dict[str, str] = {
+    "10": "建檔日期",
+    "20": "建檔日期",
+    "40": "建檔日期",
+    "50": "建立日期",
+    "60": "建檔日期",
+    "70": "建檔日期",
+    "99": "建立日期",
+}
+
 # Sheet ID 對應（從 sheet_map.json）
 SHEET_ID_MAP: Dict[str, str] = {
     "10": "forms8/5",
@@ -63,6 +75,26 @@ def get_time_fields_for_sheet(sheet_code: str) -> List[str]:
     return SHEET_TIME_FIELDS.get(sheet_code, DEFAULT_TIME_FIELDS)
 
 
+def get_creation_time_field_for_sheet(sheet_code: str) -> Optional[str]:
+    """
+    獲取指定 Sheet 的建立時間欄位（用於二分搜尋增量起始 offset）
+
+    Args:
+        sheet_code: Sheet 代碼（例如：'10', '20', '99'）
+
+    Returns:
+        Optional[str]: 欄位名稱；未配置時回傳 None
+
+    Examples:
+        >>> get_creation_time_field_for_sheet("10")
+        '建檔日期'
+
+        >>> get_creation_time_field_for_sheet("30") is None
+        True
+    """
+    return SHEET_CREATION_TIME_FIELDS.get(sheet_code)
+
+
 def get_sheet_id(sheet_code: str) -> str:
     """
     獲取 Sheet ID
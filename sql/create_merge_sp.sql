@@ -1,47 +1,160 @@
 -- BigQuery 預儲程序（Stored Procedure）範本：staging → 目標 MERGE + 清理 + 審計
 -- 說明：
--- - 以 order_id 為鍵進行 Upsert
--- - 僅示意更新關鍵欄位，其他欄位請依 schema 擴充
--- - 需要先建立審計表（可選）：${DATASET_ID}.ragic_ingest_audit
+-- - 由 scripts/generate_merge_sp.py 依 BIGQUERY_SCHEMA 產生（請勿手動編輯，schema 變更後重新產生）
+-- - 只處理指定批次（p_batch_id），依 order_id 去重（取 updated_at 最新一筆）後 Upsert 全部欄位
+-- - 以 --row-hash 產生時 row_hash 相同的列不更新；指定 --partition-field / --cluster-fields 時依批次範圍裁切目標表
+-- - 審計表（可選）：${DATASET_ID}.ragic_ingest_audit，不存在時忽略
+-- - 設定 MERGE_SP_AUTO_DEPLOY=true 時，上傳器會依實際欄位自動產生並部署，無需手動執行本檔
 
 -- 參數替換：
 --   ${PROJECT_ID}   例：grefun-testing
 --   ${DATASET_ID}   例：erp_backup
 --   ${TARGET_TABLE} 例：ragic_data
 
-CREATE OR REPLACE PROCEDURE `${PROJECT_ID}.${DATASET_ID}.sp_upsert_ragic_data`(IN batch_id STRING)
+CREATE OR REPLACE PROCEDURE `${PROJECT_ID}.${DATASET_ID}.sp_upsert_ragic_data`(p_batch_id STRING)
+OPTIONS(description="staging → ${PROJECT_ID}.${DATASET_ID}.${TARGET_TABLE} MERGE（由 merge_procedure 產生，fingerprint=8bdda168493c81d9）")
 BEGIN
-  -- Upsert 資料
-  MERGE `${PROJECT_ID}.${DATASET_ID}.${TARGET_TABLE}` T
-  USING (
-    SELECT * FROM `${PROJECT_ID}.${DATASET_ID}.${TARGET_TABLE}_staging`
-    WHERE batch_id = batch_id
-  ) S
-  ON T.order_id = S.order_id
-  WHEN MATCHED THEN UPDATE SET
-    status = S.status,
-    export_status = S.export_status,
-    updated_at = S.updated_at,
-    updated_by = S.updated_by
-    -- TODO: 其餘欄位請依實際 schema 附加
-  WHEN NOT MATCHED THEN INSERT ROW;
-
-  -- 審計紀錄（可選）
+  DECLARE rows_merged INT64 DEFAULT 0;
+  DECLARE prune_filter STRING DEFAULT '';
+  EXECUTE IMMEDIATE CONCAT("""
+        MERGE `${PROJECT_ID}.${DATASET_ID}.${TARGET_TABLE}` T
+        USING (
+          SELECT * EXCEPT(row_num) FROM (
+            SELECT *, ROW_NUMBER() OVER (
+              PARTITION BY order_id
+              ORDER BY updated_at DESC NULLS LAST
+            ) AS row_num
+            FROM (SELECT * EXCEPT(batch_id, ingested_at) FROM `${PROJECT_ID}.${DATASET_ID}.${TARGET_TABLE}_staging` WHERE batch_id = @batch_id)
+          ) WHERE row_num = 1
+        ) S
+        ON T.order_id = S.order_id""", prune_filter, """
+        WHEN MATCHED THEN
+          UPDATE SET
+            T.sheet_code = S.sheet_code,
+            T.status = S.status,
+            T.export_status = S.export_status,
+            T.brand_name = S.brand_name,
+            T.brand_id = S.brand_id,
+            T.channel_name = S.channel_name,
+            T.channel_id = S.channel_id,
+            T.sales_model = S.sales_model,
+            T.payment_receiver = S.payment_receiver,
+            T.channel_type = S.channel_type,
+            T.channel_custom_attr_1 = S.channel_custom_attr_1,
+            T.channel_custom_attr_2 = S.channel_custom_attr_2,
+            T.payment_method_name = S.payment_method_name,
+            T.payment_method_id = S.payment_method_id,
+            T.payment_static_attr_1 = S.payment_static_attr_1,
+            T.payment_type = S.payment_type,
+            T.payment_dynamic_attr_1 = S.payment_dynamic_attr_1,
+            T.logistics_name = S.logistics_name,
+            T.logistics_id = S.logistics_id,
+            T.shipping_fee_income = S.shipping_fee_income,
+            T.logistics_provider = S.logistics_provider,
+            T.temperature_layer = S.temperature_layer,
+            T.shipping_point = S.shipping_point,
+            T.pickup_point = S.pickup_point,
+            T.shipping_fee_payment_method = S.shipping_fee_payment_method,
+            T.logistics_dynamic_attr_1 = S.logistics_dynamic_attr_1,
+            T.logistics_dynamic_attr_2 = S.logistics_dynamic_attr_2,
+            T.logistics_customer_name = S.logistics_customer_name,
+            T.logistics_customer_id = S.logistics_customer_id,
+            T.platform_order_id = S.platform_order_id,
+            T.logistics_order_id = S.logistics_order_id,
+            T.order_date = S.order_date,
+            T.order_msrp = S.order_msrp,
+            T.order_regular_price = S.order_regular_price,
+            T.gross_revenue = S.gross_revenue,
+            T.net_revenue = S.net_revenue,
+            T.recipient_name = S.recipient_name,
+            T.recipient_phone = S.recipient_phone,
+            T.postal_code = S.postal_code,
+            T.city = S.city,
+            T.district = S.district,
+            T.shipping_address = S.shipping_address,
+            T.order_notes = S.order_notes,
+            T.is_invoice_issued = S.is_invoice_issued,
+            T.is_invoice_donated = S.is_invoice_donated,
+            T.invoice_donation_code = S.invoice_donation_code,
+            T.invoice_carrier_type = S.invoice_carrier_type,
+            T.invoice_carrier_id = S.invoice_carrier_id,
+            T.cash_on_delivery_amount = S.cash_on_delivery_amount,
+            T.requested_delivery_date = S.requested_delivery_date,
+            T.requested_delivery_date_raw = S.requested_delivery_date_raw,
+            T.requested_delivery_time = S.requested_delivery_time,
+            T.mobile_phone = S.mobile_phone,
+            T.customer_name = S.customer_name,
+            T.customer_id = S.customer_id,
+            T.email = S.email,
+            T.birthday = S.birthday,
+            T.birthday_raw = S.birthday_raw,
+            T.full_address = S.full_address,
+            T.phone_number = S.phone_number,
+            T.customer_notes = S.customer_notes,
+            T.customer_static_attr_1 = S.customer_static_attr_1,
+            T.tax_id = S.tax_id,
+            T.invoice_recipient = S.invoice_recipient,
+            T.customer_static_custom_1 = S.customer_static_custom_1,
+            T.customer_static_custom_2 = S.customer_static_custom_2,
+            T.buyer_identity = S.buyer_identity,
+            T.birth_year = S.birth_year,
+            T.zodiac_sign = S.zodiac_sign,
+            T.customer_dynamic_custom_1 = S.customer_dynamic_custom_1,
+            T.customer_dynamic_custom_2 = S.customer_dynamic_custom_2,
+            T.sender_name = S.sender_name,
+            T.sender_phone = S.sender_phone,
+            T.sender_address = S.sender_address,
+            T.product_name = S.product_name,
+            T.product_id = S.product_id,
+            T.product_spec_official = S.product_spec_official,
+            T.product_content = S.product_content,
+            T.description = S.description,
+            T.tax_type = S.tax_type,
+            T.product_msrp = S.product_msrp,
+            T.product_regular_price = S.product_regular_price,
+            T.quantity = S.quantity,
+            T.product_msrp_subtotal = S.product_msrp_subtotal,
+            T.product_regular_price_subtotal = S.product_regular_price_subtotal,
+            T.product_structure = S.product_structure,
+            T.product_series = S.product_series,
+            T.product_dynamic_custom_1 = S.product_dynamic_custom_1,
+            T.product_dynamic_custom_2 = S.product_dynamic_custom_2,
+            T.channel_promo_1 = S.channel_promo_1,
+            T.channel_promo_2 = S.channel_promo_2,
+            T.channel_promo_3 = S.channel_promo_3,
+            T.channel_promo_4 = S.channel_promo_4,
+            T.channel_promo_5 = S.channel_promo_5,
+            T.created_at = S.created_at,
+            T.created_at_raw = S.created_at_raw,
+            T.created_by = S.created_by,
+            T.updated_at = S.updated_at,
+            T.updated_at_raw = S.updated_at_raw,
+            T.updated_by = S.updated_by,
+            T.sync_sales_report_update_time = S.sync_sales_report_update_time,
+            T.sync_sales_report_update_time_raw = S.sync_sales_report_update_time_raw,
+            T.sync_sales_report_cancellation_time = S.sync_sales_report_cancellation_time,
+            T.sync_sales_report_cancellation_time_raw = S.sync_sales_report_cancellation_time_raw,
+            T.sync_order_mgmt_cancellation_time = S.sync_order_mgmt_cancellation_time,
+            T.sync_order_mgmt_cancellation_time_raw = S.sync_order_mgmt_cancellation_time_raw,
+            T.last_modified_date = S.last_modified_date,
+            T.last_modified_date_raw = S.last_modified_date_raw,
+            T.last_modified_by = S.last_modified_by,
+            T.payment_update_execution_time = S.payment_update_execution_time,
+            T.payment_update_execution_time_raw = S.payment_update_execution_time_raw,
+            T.RAGIC_AUTOGEN_1622007913868 = S.RAGIC_AUTOGEN_1622007913868,
+            T.RAGIC_AUTOGEN_1622007913873 = S.RAGIC_AUTOGEN_1622007913873
+        WHEN NOT MATCHED THEN
+          INSERT (sheet_code, status, export_status, brand_name, brand_id, channel_name, channel_id, sales_model, payment_receiver, channel_type, channel_custom_attr_1, channel_custom_attr_2, payment_method_name, payment_method_id, payment_static_attr_1, payment_type, payment_dynamic_attr_1, logistics_name, logistics_id, shipping_fee_income, logistics_provider, temperature_layer, shipping_point, pickup_point, shipping_fee_payment_method, logistics_dynamic_attr_1, logistics_dynamic_attr_2, logistics_customer_name, logistics_customer_id, platform_order_id, logistics_order_id, order_id, order_date, order_msrp, order_regular_price, gross_revenue, net_revenue, recipient_name, recipient_phone, postal_code, city, district, shipping_address, order_notes, is_invoice_issued, is_invoice_donated, invoice_donation_code, invoice_carrier_type, invoice_carrier_id, cash_on_delivery_amount, requested_delivery_date, requested_delivery_date_raw, requested_delivery_time, mobile_phone, customer_name, customer_id, email, birthday, birthday_raw, full_address, phone_number, customer_notes, customer_static_attr_1, tax_id, invoice_recipient, customer_static_custom_1, customer_static_custom_2, buyer_identity, birth_year, zodiac_sign, customer_dynamic_custom_1, customer_dynamic_custom_2, sender_name, sender_phone, sender_address, product_name, product_id, product_spec_official, product_content, description, tax_type, product_msrp, product_regular_price, quantity, product_msrp_subtotal, product_regular_price_subtotal, product_structure, product_series, product_dynamic_custom_1, product_dynamic_custom_2, channel_promo_1, channel_promo_2, channel_promo_3, channel_promo_4, channel_promo_5, created_at, created_at_raw, created_by, updated_at, updated_at_raw, updated_by, sync_sales_report_update_time, sync_sales_report_update_time_raw, sync_sales_report_cancellation_time, sync_sales_report_cancellation_time_raw, sync_order_mgmt_cancellation_time, sync_order_mgmt_cancellation_time_raw, last_modified_date, last_modified_date_raw, last_modified_by, payment_update_execution_time, payment_update_execution_time_raw, RAGIC_AUTOGEN_1622007913868, RAGIC_AUTOGEN_1622007913873)
+          VALUES (S.sheet_code, S.status, S.export_status, S.brand_name, S.brand_id, S.channel_name, S.channel_id, S.sales_model, S.payment_receiver, S.channel_type, S.channel_custom_attr_1, S.channel_custom_attr_2, S.payment_method_name, S.payment_method_id, S.payment_static_attr_1, S.payment_type, S.payment_dynamic_attr_1, S.logistics_name, S.logistics_id, S.shipping_fee_income, S.logistics_provider, S.temperature_layer, S.shipping_point, S.pickup_point, S.shipping_fee_payment_method, S.logistics_dynamic_attr_1, S.logistics_dynamic_attr_2, S.logistics_customer_name, S.logistics_customer_id, S.platform_order_id, S.logistics_order_id, S.order_id, S.order_date, S.order_msrp, S.order_regular_price, S.gross_revenue, S.net_revenue, S.recipient_name, S.recipient_phone, S.postal_code, S.city, S.district, S.shipping_address, S.order_notes, S.is_invoice_issued, S.is_invoice_donated, S.invoice_donation_code, S.invoice_carrier_type, S.invoice_carrier_id, S.cash_on_delivery_amount, S.requested_delivery_date, S.requested_delivery_date_raw, S.requested_delivery_time, S.mobile_phone, S.customer_name, S.customer_id, S.email, S.birthday, S.birthday_raw, S.full_address, S.phone_number, S.customer_notes, S.customer_static_attr_1, S.tax_id, S.invoice_recipient, S.customer_static_custom_1, S.customer_static_custom_2, S.buyer_identity, S.birth_year, S.zodiac_sign, S.customer_dynamic_custom_1, S.customer_dynamic_custom_2, S.sender_name, S.sender_phone, S.sender_address, S.product_name, S.product_id, S.product_spec_official, S.product_content, S.description, S.tax_type, S.product_msrp, S.product_regular_price, S.quantity, S.product_msrp_subtotal, S.product_regular_price_subtotal, S.product_structure, S.product_series, S.product_dynamic_custom_1, S.product_dynamic_custom_2, S.channel_promo_1, S.channel_promo_2, S.channel_promo_3, S.channel_promo_4, S.channel_promo_5, S.created_at, S.created_at_raw, S.created_by, S.updated_at, S.updated_at_raw, S.updated_by, S.sync_sales_report_update_time, S.sync_sales_report_update_time_raw, S.sync_sales_report_cancellation_time, S.sync_sales_report_cancellation_time_raw, S.sync_order_mgmt_cancellation_time, S.sync_order_mgmt_cancellation_time_raw, S.last_modified_date, S.last_modified_date_raw, S.last_modified_by, S.payment_update_execution_time, S.payment_update_execution_time_raw, S.RAGIC_AUTOGEN_1622007913868, S.RAGIC_AUTOGEN_1622007913873)
+        """)
+    USING p_batch_id AS batch_id;
+  SET rows_merged = @@row_count;
   BEGIN
-    INSERT INTO `${PROJECT_ID}.${DATASET_ID}.ragic_ingest_audit`
-    (batch_id, target_table, rows_merged, processed_at)
-    SELECT
-      batch_id,
-      '${TARGET_TABLE}',
-      (SELECT COUNT(1) FROM `${PROJECT_ID}.${DATASET_ID}.${TARGET_TABLE}_staging` WHERE batch_id = batch_id),
-      CURRENT_TIMESTAMP();
+    INSERT INTO `${PROJECT_ID}.${DATASET_ID}.ragic_ingest_audit` (batch_id, target_table, rows_merged, processed_at)
+    VALUES (p_batch_id, '${TARGET_TABLE}', rows_merged, CURRENT_TIMESTAMP());
   EXCEPTION WHEN ERROR THEN
-    -- 若審計表不存在則忽略
+    SELECT CONCAT('審計紀錄寫入失敗: ', @@error.message) AS audit_warning;
   END;
-
-  -- 清理該批次 staging（可按策略保留）
-  DELETE FROM `${PROJECT_ID}.${DATASET_ID}.${TARGET_TABLE}_staging`
-  WHERE batch_id = batch_id;
+  DELETE FROM `${PROJECT_ID}.${DATASET_ID}.${TARGET_TABLE}_staging` WHERE batch_id = p_batch_id;
 END;
 
-
@@ -0,0 +1,10 @@
+CREATE TABLE IF NOT EXISTS `ragic_backup.ragic_page_size_state` (
+    sheet_id STRING NOT NULL OPTIONS(description="Ragic sheet path (e.g., 'forms8/5')"),
+    page_limit INT64 NOT NULL OPTIONS(description="Learned page size (limit) for this sheet"),
+    latency_s FLOAT64 OPTIONS(description="Round-trip latency of the last measured page (seconds)"),
+    payload_bytes INT64 OPTIONS(description="Response size of the last measured page (bytes)"),
+    updated_at TIMESTAMP OPTIONS(description="Timestamp when this record was last updated")
+)
+OPTIONS(
+    description="Stores the adaptive Ragic page size per sheet so it survives Cloud Functions instance recycling."
+);
@@ -0,0 +1,272 @@
+# -*- coding: utf-8 -*-
+"""
+BigQuery Storage Write API 寫入模組
+
+依 BigQuery schema 動態產生 protobuf 列格式，經 Storage Write API 的 committed 或 pending stream
+將記錄附加到資料表，不經載入工作排隊，適合頻繁的少量增量同步。
+
+- committed：附加成功即可查詢
+- pending：全部附加完成後 finalize + batch commit，整批原子性地可見（任一請求失敗則不留下資料）
+- 可指定 api_endpoint 連到本機的假 Storage Write 服務（見 scripts/fake_storage_write_server.py）
+
+型別對應：STRING → string、FLOAT → double、INTEGER → int64、BOOLEAN → bool、
+DATE → int32（epoch 起的天數）、TIMESTAMP → int64（epoch 起的微秒數，UTC）
+"""
+
+import hashlib
+import logging
+from datetime import date, datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from google.cloud import bigquery
+
+from load_serializer import _CONVERTERS, _to_string
+
+try:
+    from google.protobuf import descriptor_pb2, descriptor_pool, message_factory
+    from google.cloud import bigquery_storage_v1
+    from google.cloud.bigquery_storage_v1 import types as storage_types
+    HAS_STORAGE_WRITE = True
+except ImportError:
+    HAS_STORAGE_WRITE = False
+
+# 支援的 stream 類型
+STREAM_TYPES = ("committed", "pending")
+
+# 單一 AppendRowsRequest 的資料量上限（API 上限 10MB，保留表頭空間）
+MAX_REQUEST_BYTES = 9 * 1024 * 1024
+
+_EPOCH_DATE = date(1970, 1, 1)
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# BigQuery 欄位型別 → protobuf 欄位型別（不在表中的型別以字串寫入）
+_PROTO_TYPES: Dict[str, int] = {}
+if HAS_STORAGE_WRITE:
+    _FDP = descriptor_pb2.FieldDescriptorProto
+    _PROTO_TYPES = {
+        "STRING": _FDP.TYPE_STRING,
+        "FLOAT": _FDP.TYPE_DOUBLE,
+        "FLOAT64": _FDP.TYPE_DOUBLE,
+        "INTEGER": _FDP.TYPE_INT64,
+        "INT64": _FDP.TYPE_INT64,
+        "BOOLEAN": _FDP.TYPE_BOOL,
+        "BOOL": _FDP.TYPE_BOOL,
+        "DATE": _FDP.TYPE_INT32,
+        "TIMESTAMP": _FDP.TYPE_INT64,
+    }
+
+
+def build_proto_descriptor(schema: List[bigquery.SchemaField]) -> "descriptor_pb2.DescriptorProto":
+    """
+    依 BigQuery schema 產生 protobuf 訊息描述（proto2，欄位皆為 optional；欄位名稱即欄位名）
+
+    Args:
+        schema: BigQuery 架構
+
+    Returns:
+        descriptor_pb2.DescriptorProto: 列訊息描述
+    """
+    descriptor = descriptor_pb2.DescriptorProto(name="RagicRow")
+    for number, field in enumerate(schema, start=1):
+        descriptor.field.add(
+            name=field.name,
+            number=number,
+            type=_PROTO_TYPES.get(field.field_type, _FDP.TYPE_STRING),
+            label=_FDP.LABEL_REQUIRED if field.mode == "REQUIRED" else _FDP.LABEL_OPTIONAL,
+        )
+    return descriptor
+
+
+def build_message_class(descriptor: "descriptor_pb2.DescriptorProto") -> Any:
+    """由訊息描述建立 protobuf 訊息類別（每個 schema 使用獨立的 descriptor pool）"""
+    digest = hashlib.md5(descriptor.SerializeToString()).hexdigest()[:12]
+    file_proto = descriptor_pb2.FileDescriptorProto(
+        name=f"ragic_row_{digest}.proto",
+        package=f"ragic_backup_{digest}",
+        syntax="proto2",
+    )
+    file_proto.message_type.add().CopyFrom(descriptor)
+    pool = descriptor_pool.DescriptorPool()
+    pool.Add(file_proto)
+    return message_factory.GetMessageClass(pool.FindMessageTypeByName(f"ragic_backup_{digest}.{descriptor.name}"))
+
+
+def _proto_value(value: Any, field_type: str) -> Any:
+    """將記錄值轉為 protobuf 欄位值（DATE 為天數、TIMESTAMP 為微秒數）"""
+    value = _CONVERTERS.get(field_type, _to_string)(value)
+    if field_type == "DATE":
+        return (value - _EPOCH_DATE).days
+    if field_type == "TIMESTAMP":
+        delta = value - _EPOCH
+        return (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+    return value
+
+
+def serialize_proto_rows(rows: List[Dict[str, Any]],
+                         schema: List[bigquery.SchemaField],
+                         message_class: Any) -> List[bytes]:
+    """
+    將記錄序列化為 protobuf 列（只輸出 schema 中的欄位；None 與非字串欄位的空字串不寫入，即 NULL）
+
+    Args:
+        rows: 轉換後的記錄
+        schema: BigQuery 架構（需與 message_class 的描述一致）
+        message_class: build_message_class 產生的訊息類別
+
+    Returns:
+        List[bytes]: 序列化後的列
+    """
+    fields = [(f.name, f.field_type) for f in schema]
+    serialized: List[bytes] = []
+    for row in rows:
+        values = {}
+        for name, field_type in fields:
+            value = row.get(name)
+            if value is None or (value == "" and field_type != "STRING"):
+                continue
+            try:
+                values[name] = _proto_value(value, field_type)
+            except (TypeError, ValueError) as e:
+                raise ValueError(f"欄位 {name}（{field_type}）的值無法序列化: {value!r}（{e}）")
+        serialized.append(message_class(**values).SerializeToString())
+    return serialized
+
+
+def _chunk_rows(serialized_rows: List[bytes], max_bytes: int = MAX_REQUEST_BYTES) -> Iterator[Tuple[int, List[bytes]]]:
+    """依請求大小上限切分序列化後的列，回傳 (起始 offset, 列)"""
+    start = 0
+    chunk: List[bytes] = []
+    size = 0
+    for i, row in enumerate(serialized_rows):
+        if chunk and size + len(row) > max_bytes:
+            yield start, chunk
+            start, chunk, size = i, [], 0
+        chunk.append(row)
+        size += len(row)
+    if chunk:
+        yield start, chunk
+
+
+def create_write_client(api_endpoint: Optional[str] = None) -> Any:
+    """
+    建立 Storage Write API 客戶端
+
+    Args:
+        api_endpoint: 本機假服務位址（如 localhost:50051）；指定時以不加密、不認證的連線
+
+    Returns:
+        bigquery_storage_v1.BigQueryWriteClient
+    """
+    if not HAS_STORAGE_WRITE:
+        raise ImportError("需要安裝 google-cloud-bigquery-storage 與 protobuf 才能使用 Storage Write API")
+    if not api_endpoint:
+        return bigquery_storage_v1.BigQueryWriteClient()
+
+    import grpc
+    from google.cloud.bigquery_storage_v1.services.big_query_write.transports import BigQueryWriteGrpcTransport
+    # 傳入 channel 時 transport 不使用認證
+    transport = BigQueryWriteGrpcTransport(channel=grpc.insecure_channel(api_endpoint))
+    logging.info(f"Storage Write API 使用自訂端點: {api_endpoint}")
+    return bigquery_storage_v1.BigQueryWriteClient(transport=transport)
+
+
+class StorageWriteAppender:
+    """以 Storage Write API 附加記錄至單一資料表"""
+
+    def __init__(self,
+                 write_client: Any,
+                 project_id: str,
+                 dataset_id: str,
+                 table_id: str,
+                 schema: List[bigquery.SchemaField],
+                 stream_type: str = "pending",
+                 max_request_bytes: int = MAX_REQUEST_BYTES):
+        """
+        初始化附加器
+
+        Args:
+            write_client: BigQueryWriteClient（或相同介面的假客戶端）
+            project_id: GCP 專案 ID
+            dataset_id: 資料集 ID
+            table_id: 資料表 ID
+            schema: 目標表的 BigQuery 架構（列格式依此產生）
+            stream_type: committed 或 pending
+            max_request_bytes: 單一 AppendRowsRequest 的列資料上限（bytes）
+        """
+        if stream_type not in STREAM_TYPES:
+            raise ValueError(f"不支援的 stream 類型: {stream_type}（可用: {', '.join(STREAM_TYPES)}）")
+        self.write_client = write_client
+        self.table_path = f"projects/{project_id}/datasets/{dataset_id}/tables/{table_id}"
+        self.schema = schema
+        self.stream_type = stream_type
+        self.max_request_bytes = max_request_bytes
+        self.descriptor = build_proto_descriptor(schema)
+        self.message_class = build_message_class(self.descriptor)
+
+    def _requests(self, stream_name: str, serialized_rows: List[bytes]) -> Iterator[Any]:
+        """產生 AppendRowsRequest（writer_schema 只隨第一個請求送出）"""
+        for i, (offset, chunk) in enumerate(_chunk_rows(serialized_rows, self.max_request_bytes)):
+            proto_data = storage_types.AppendRowsRequest.ProtoData(
+                rows=storage_types.ProtoRows(serialized_rows=chunk)
+            )
+            if i == 0:
+                proto_data.writer_schema = storage_types.ProtoSchema(proto_descriptor=self.descriptor)
+            request = storage_types.AppendRowsRequest(offset=offset, proto_rows=proto_data)
+            if i == 0:
+                request.write_stream = stream_name
+            yield request
+
+    def append(self, rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        建立 stream、附加全部記錄並 finalize（pending 時再 batch commit）
+
+        Args:
+            rows: 轉換後的記錄
+
+        Returns:
+            Dict: 寫入結果（stream 名稱、列數、請求數、位元組數）
+
+        Raises:
+            Exception: 任一請求失敗或 commit 失敗時
+        """
+        serialized_rows = serialize_proto_rows(rows, self.schema, self.message_class)
+        stream_kind = (storage_types.WriteStream.Type.COMMITTED if self.stream_type == "committed"
+                       else storage_types.WriteStream.Type.PENDING)
+        stream = self.write_client.create_write_stream(
+            parent=self.table_path,
+            write_stream=storage_types.WriteStream(type_=stream_kind),
+        )
+
+        responses = self.write_client.append_rows(
+            requests=self._requests(stream.name, serialized_rows),
+            metadata=(("x-goog-request-params", f"write_stream={stream.name}"),),
+        )
+        request_count = 0
+        for response in responses:
+            request_count += 1
+            if response.error.code:
+                raise Exception(f"Storage Write 附加失敗: {response.error.message}")
+            if response.row_errors:
+                errors = [f"#{e.index}: {e.message}" for e in response.row_errors[:5]]
+                raise Exception(f"Storage Write 列錯誤: {'; '.join(errors)}")
+
+        finalized = self.write_client.finalize_write_stream(name=stream.name)
+        if finalized.row_count != len(serialized_rows):
+            raise Exception(f"Storage Write 列數不符: 已寫入 {finalized.row_count}，預期 {len(serialized_rows)}")
+
+        if self.stream_type == "pending":
+            commit = self.write_client.batch_commit_write_streams(
+                storage_types.BatchCommitWriteStreamsRequest(parent=self.table_path, write_streams=[stream.name])
+            )
+            if commit.stream_errors:
+                errors = [e.error_message for e in commit.stream_errors]
+                raise Exception(f"Storage Write commit 失敗: {'; '.join(errors)}")
+
+        total_bytes = sum(len(r) for r in serialized_rows)
+        logging.info(f"Storage Write（{self.stream_type}）寫入 {len(serialized_rows)} 筆，{request_count} 個請求，{total_bytes:,} bytes")
+        return {
+            "stream": stream.name,
+            "rows": len(serialized_rows),
+            "requests": request_count,
+            "bytes": total_bytes,
+        }
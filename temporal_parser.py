@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+日期時間解析模組（RagicClient 與 DataTransformer 共用）
+
+- 常見格式（YYYY/MM/DD、YYYY-MM-DD，可含 HH:MM 或 HH:MM:SS）以單一正規表示式快速解析，
+  其餘格式才退回逐一 strptime / fromisoformat，結果與原本的多格式嘗試一致。
+- Asia/Taipei 自 1980 年起無日光節約時間，固定 +08:00；僅更早的時間才透過 zoneinfo 換算。
+- 原始字串 → 結果以有界 LRU 快取，同一批資料中重複的時間值只解析一次。
+"""
+
+import re
+import zoneinfo
+from datetime import datetime, timezone, timedelta
+from functools import lru_cache
+from typing import Any, Optional
+
+TAIPEI_TZ = zoneinfo.ZoneInfo("Asia/Taipei")
+
+# Asia/Taipei 最後一次日光節約時間在 1979 年，此後固定 UTC+8
+_TAIPEI_FIXED_OFFSET = timedelta(hours=8)
+_TAIPEI_FIXED_SINCE_YEAR = 1980
+
+# 快取上限（每個項目為一組原始字串與解析結果）
+CACHE_SIZE = 65536
+
+# 常見無效字串直接視為不可解析
+INVALID_TEMPORAL_VALUES = {"不指定", "N/A", "NA", "-", "—", "null", "None", "ADDLINE"}
+
+# YYYY/MM/DD 或 YYYY-MM-DD（分隔符需一致），可選 HH:MM 或 HH:MM:SS；位數規則同 strptime
+_FAST_PATTERN = re.compile(
+    r'^(\d{4})([-/])(\d{1,2})\2(\d{1,2})(?: (\d{1,2}):(\d{1,2})(?::(\d{1,2}))?)?$'
+)
+
+_TIMESTAMP_FORMATS = [
+    "%Y-%m-%d %H:%M:%S",
+    "%Y/%m/%d %H:%M:%S",
+    "%Y-%m-%d %H:%M",
+    "%Y/%m/%d %H:%M",
+    "%Y-%m-%d",
+    "%Y/%m/%d",
+]
+
+_DATE_FORMATS = [
+    "%Y-%m-%d",
+    "%Y/%m/%d",
+    "%Y%m%d",
+    "%Y-%m-%d %H:%M:%S",
+    "%Y/%m/%d %H:%M:%S",
+    "%Y-%m-%d %H:%M",
+    "%Y/%m/%d %H:%M",
+]
+
+
+def _fast_match(s: str) -> Optional[datetime]:
+    """以正規表示式解析常見格式；不符或數值不合法時回傳 None"""
+    m = _FAST_PATTERN.match(s)
+    if not m:
+        return None
+    year, _, month, day, hour, minute, second = m.groups()
+    try:
+        return datetime(int(year), int(month), int(day), int(hour or 0), int(minute or 0), int(second or 0))
+    except ValueError:
+        return None
+
+
+def taipei_to_utc(dt_naive: datetime) -> datetime:
+    """
+    將 naive 的台北時間轉為 UTC（timezone-aware）
+
+    Args:
+        dt_naive: 無時區資訊的台北時間
+
+    Returns:
+        datetime: UTC 時間
+    """
+    if dt_naive.year >= _TAIPEI_FIXED_SINCE_YEAR:
+        return (dt_naive - _TAIPEI_FIXED_OFFSET).replace(tzinfo=timezone.utc)
+    return dt_naive.replace(tzinfo=TAIPEI_TZ).astimezone(timezone.utc)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _parse_timestamp_cached(s: str) -> Optional[datetime]:
+    if s in INVALID_TEMPORAL_VALUES:
+        return None
+
+    dt_naive = _fast_match(s)
+
+    if dt_naive is None:
+        for fmt in _TIMESTAMP_FORMATS:
+            try:
+                dt_naive = datetime.strptime(s, fmt)
+                break
+            except ValueError:
+                continue
+
+    # 支援 14 碼數字時間戳（YYYYMMDDHHMMSS）
+    if dt_naive is None and s.isdigit() and len(s) == 14:
+        try:
+            dt_naive = datetime.strptime(s, "%Y%m%d%H%M%S")
+        except ValueError:
+            pass
+
+    # ISO 格式（可帶時區）
+    if dt_naive is None:
+        try:
+            dt_parsed = datetime.fromisoformat(s.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+        if dt_parsed.tzinfo is not None:
+            return dt_parsed.astimezone(timezone.utc)
+        dt_naive = dt_parsed
+
+    return taipei_to_utc(dt_naive)
+
+
+def parse_timestamp(value: Any) -> Optional[datetime]:
+    """
+    解析日期時間為 UTC datetime（無時區資訊者視為 Asia/Taipei）
+
+    Args:
+        value: 原始值（非字串會先轉為字串）
+
+    Returns:
+        Optional[datetime]: UTC 時間；無法解析時回傳 None
+    """
+    if not value:
+        return None
+    return _parse_timestamp_cached(str(value).strip())
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _parse_date_cached(s: str) -> Optional[str]:
+    if s in INVALID_TEMPORAL_VALUES:
+        return None
+    dt = _fast_match(s)
+    if dt is not None:
+        return dt.strftime("%Y-%m-%d")
+    for fmt in _DATE_FORMATS:
+        try:
+            return datetime.strptime(s, fmt).strftime("%Y-%m-%d")
+        except ValueError:
+            continue
+    return None
+
+
+def parse_date(value: str) -> Optional[str]:
+    """
+    將常見日期格式正規化為 YYYY-MM-DD（不做時區換算）
+
+    Args:
+        value: 原始日期字串
+
+    Returns:
+        Optional[str]: YYYY-MM-DD；無法解析時回傳 None
+    """
+    if not value:
+        return None
+    return _parse_date_cached(str(value).strip())
+
+
+def clear_cache() -> None:
+    """清除解析快取"""
+    _parse_timestamp_cached.cache_clear()
+    _parse_date_cached.cache_clear()